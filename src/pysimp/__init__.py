@@ -0,0 +1,66 @@
+"""
+SIM-P core. Public names below are imported on first attribute access
+(PEP 562), so `import pysimp` stays cheap and only the layers a caller
+touches pay their numpy/pydantic/snakes import cost.
+"""
+from importlib import import_module
+
+TYPE_CHECKING = False  # same effect as typing.TYPE_CHECKING without importing typing
+
+_EXPORTS = {
+    # Domain entities
+    "NormativeTemplate": "pysimp.domain.entities.template",
+    "Step": "pysimp.domain.entities.step",
+    "Surgit": "pysimp.domain.entities.surgit",
+    "SurgicalTrace": "pysimp.domain.entities.trace",
+    "SurgitEvent": "pysimp.domain.entities.trace",
+    "SurgitType": "pysimp.domain.entities.trace",
+    "SimulationReport": "pysimp.domain.entities.report",
+    "LazySimulationReport": "pysimp.domain.entities.report",
+    # Domain services
+    "CohortAggregator": "pysimp.domain.services.cohort_aggregates",
+    "CompiledTemplate": "pysimp.domain.services.scoring_kernel",
+    "CounterfactualEngine": "pysimp.domain.services.counterfactual",
+    "ForwardSimulator": "pysimp.domain.services.forward_simulator",
+    "IncrementalCohortScorer": "pysimp.domain.services.incremental_rescoring",
+    "ForwardSimulationConfig": "pysimp.domain.services.forward_simulator",
+    "LayerECalibrator": "pysimp.domain.services.calibration",
+    # Application
+    "RunSimulation": "pysimp.application.use_cases.run_simulation",
+    "BudgetedBatchScorer": "pysimp.application.use_cases.batch_scoring",
+    "TraceRepository": "pysimp.application.interfaces.repository",
+    "ReportCache": "pysimp.application.interfaces.report_cache",
+    # Infrastructure
+    "SnakesLayerBAdapter": "pysimp.infrastructure.adapters.snakes_adapter",
+    "YamlTemplateLoader": "pysimp.infrastructure.persistence.yaml_loader",
+    "InMemoryTraceRepository": "pysimp.infrastructure.persistence.in_memory_repository",
+    "SQLiteTraceRepository": "pysimp.infrastructure.persistence.sqlite_repository",
+    "SegmentedTraceRepository": "pysimp.infrastructure.persistence.segmented_repository",
+    "CachingTraceRepository": "pysimp.infrastructure.persistence.caching_repository",
+    "IndexedTraceRepository": "pysimp.infrastructure.persistence.indexed_repository",
+    "TraceIndex": "pysimp.infrastructure.persistence.trace_index",
+    "SQLiteReportCache": "pysimp.infrastructure.persistence.sqlite_report_cache",
+    "ReportSerializer": "pysimp.infrastructure.persistence.report_serializer",
+}
+
+__all__ = sorted(_EXPORTS)
+
+if TYPE_CHECKING:
+    from pysimp.domain.entities.template import NormativeTemplate
+    from pysimp.domain.entities.trace import SurgicalTrace, SurgitEvent
+    from pysimp.domain.entities.report import SimulationReport
+    from pysimp.application.use_cases.run_simulation import RunSimulation
+    from pysimp.infrastructure.persistence.yaml_loader import YamlTemplateLoader
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'pysimp' has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
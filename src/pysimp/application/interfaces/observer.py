@@ -0,0 +1,38 @@
+
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from typing import ContextManager
+
+_NO_SPAN = nullcontext()
+
+
+class SimulationObserver(ABC):
+    """
+    Receives timing spans and counters from RunSimulation and the Layer B adapters.
+    Span names are dotted layer paths ("execute", "layer_b", "pass.actual", "pcp", ...);
+    counters are monotonic totals ("events_processed", "transitions_fired", ...).
+    """
+    @abstractmethod
+    def span(self, name: str) -> ContextManager:
+        """
+        Context manager timing one occurrence of name.
+        """
+        pass
+
+    @abstractmethod
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+
+class NullObserver(SimulationObserver):
+    """
+    Default observer: one shared nullcontext per span and no bookkeeping.
+    """
+    def span(self, name: str) -> ContextManager:
+        return _NO_SPAN
+
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+
+NULL_OBSERVER = NullObserver()
@@ -0,0 +1,16 @@
+
+from abc import ABC, abstractmethod
+from pysimp.domain.entities.report import SimulationReport
+from typing import Optional
+
+class ReportCache(ABC):
+    """
+    Store of finished reports keyed by RunSimulation.cache_key.
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[SimulationReport]:
+        pass
+
+    @abstractmethod
+    def put(self, key: str, report: SimulationReport) -> None:
+        pass
@@ -1,7 +1,9 @@
 
 from abc import ABC, abstractmethod
 from pysimp.domain.entities.trace import SurgicalTrace
-from typing import Optional
+from typing import Callable, Iterable, Iterator, List, Optional
+
+TraceFilter = Callable[[SurgicalTrace], bool]
 
 class TraceRepository(ABC):
     @abstractmethod
@@ -11,3 +13,31 @@ class TraceRepository(ABC):
     @abstractmethod
     def save_trace(self, trace: SurgicalTrace) -> None:
         pass
+
+    def trace_ids(self) -> List[str]:
+        """
+        Every stored procedure_id; needed by the default iter_traces.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot enumerate its traces")
+
+    def get_traces(self, trace_ids: Iterable[str]) -> List[Optional[SurgicalTrace]]:
+        """
+        Traces in the order of trace_ids (None where missing).
+        Backends override this with a single bulk fetch.
+        """
+        return [self.get_trace(trace_id) for trace_id in trace_ids]
+
+    def save_traces(self, traces: Iterable[SurgicalTrace]) -> None:
+        for trace in traces:
+            self.save_trace(trace)
+
+    def iter_traces(self, filter: Optional[TraceFilter] = None, batch_size: int = 1000) -> Iterator[SurgicalTrace]:
+        """
+        Streams stored traces (optionally only those where filter(trace) is true),
+        fetching batch_size at a time through get_traces.
+        """
+        trace_ids = self.trace_ids()
+        for lo in range(0, len(trace_ids), batch_size):
+            for trace in self.get_traces(trace_ids[lo:lo + batch_size]):
+                if trace is not None and (filter is None or filter(trace)):
+                    yield trace
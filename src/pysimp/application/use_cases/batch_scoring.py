@@ -0,0 +1,194 @@
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Iterable, Iterator, Optional
+
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.domain.entities.report import REPORT_DETAILS, SimulationReport
+from pysimp.domain.entities.trace import SurgicalTrace
+
+# Measured CPython footprints (tracemalloc, eager reports)
+REPORT_BASE_BYTES = 16_000
+SUMMARY_EVENT_BYTES = 700         # scoring passes, noise/deviation scratch per event
+TABLE_EVENT_BYTES = 700           # NoiseTable/CETable/StepTable rows
+TRACEABILITY_EVENT_BYTES = 500    # one TraceabilityEntry
+PROVENANCE_FLOAT_BYTES = 24       # per provenance_vector element: events^2 of them
+ATTRIBUTION_EVENT_BYTES = 300
+TRACE_EVENT_BYTES = 1_300         # parsed SurgitEvent incl. datetimes
+TRACE_BASE_BYTES = 1_000
+
+
+class MemoryBudgetExceeded(MemoryError):
+    pass
+
+
+def estimate_trace_bytes(n_events: int) -> int:
+    return TRACE_BASE_BYTES + TRACE_EVENT_BYTES * n_events
+
+
+def estimate_report_bytes(n_events: int, detail: str = "full", hierarchical_attribution: bool = False) -> int:
+    """
+    Approximate peak bytes of scoring one trace into a report of the given detail.
+    """
+    tables = REPORT_DETAILS[detail]
+    size = REPORT_BASE_BYTES + SUMMARY_EVENT_BYTES * n_events
+    if tables:
+        size += TABLE_EVENT_BYTES * n_events
+    if "Traceability" in tables:
+        size += TRACEABILITY_EVENT_BYTES * n_events + PROVENANCE_FLOAT_BYTES * n_events * n_events
+    if hierarchical_attribution:
+        size += ATTRIBUTION_EVENT_BYTES * n_events
+    return size
+
+
+def plan_detail(
+    n_events: int, max_bytes: int, detail: str = "full", downgrade: bool = True,
+    hierarchical_attribution: bool = False
+) -> str:
+    """
+    The richest detail, starting at `detail`, whose trace + report estimate
+    fits in max_bytes. Without downgrade, a trace that does not fit at
+    `detail` raises MemoryBudgetExceeded; with it, "summary" is the floor.
+    """
+    levels = list(REPORT_DETAILS)
+    for level in levels[levels.index(detail):]:
+        cost = estimate_trace_bytes(n_events) + estimate_report_bytes(n_events, level, hierarchical_attribution)
+        if cost <= max_bytes:
+            return level
+        if not downgrade:
+            raise MemoryBudgetExceeded(
+                f"Trace with {n_events} events needs ~{cost} bytes at detail '{detail}', budget is {max_bytes}"
+            )
+    return levels[-1]
+
+
+class MemoryBudget:
+    """
+    Counter of estimated in-flight bytes shared by producers and consumers.
+    A reservation is admitted when it fits or nothing else is in flight (so
+    one oversized item cannot deadlock the run); acquire blocks otherwise.
+    """
+
+    def __init__(self, max_bytes: int):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.peak = 0
+        self._cond = threading.Condition(threading.RLock())
+
+    def fits(self, n_bytes: int) -> bool:
+        return self.in_flight == 0 or self.in_flight + n_bytes <= self.max_bytes
+
+    def try_acquire(self, n_bytes: int) -> bool:
+        with self._cond:
+            if not self.fits(n_bytes):
+                return False
+            self.reserve(n_bytes)
+            return True
+
+    def acquire(self, n_bytes: int, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.fits(n_bytes), timeout):
+                return False
+            self.reserve(n_bytes)
+            return True
+
+    def reserve(self, n_bytes: int) -> None:
+        """
+        Unconditional reservation, for bytes that are already resident.
+        """
+        with self._cond:
+            self.in_flight += n_bytes
+            self.peak = max(self.peak, self.in_flight)
+
+    def release(self, n_bytes: int) -> None:
+        with self._cond:
+            self.in_flight -= n_bytes
+            self._cond.notify_all()
+
+
+@dataclass
+class ScoredTrace:
+    trace_id: str
+    report: Optional[SimulationReport]
+    detail: Optional[str]
+    error: Optional[str] = None
+
+    @property
+    def downgraded(self) -> bool:
+        return self.detail is not None and self.detail != "full"
+
+
+class BudgetedBatchScorer:
+    """
+    Streams reports for many trace_ids under a memory budget. Traces are
+    fetched from the simulation's repository in groups of fetch_size only
+    while the estimated bytes of buffered traces and the report being
+    consumed stay under max_bytes (the overshoot is at most one group).
+    A reservation is released when the consumer asks for the next item, so
+    callers must not accumulate the yielded reports. Traces too large for
+    the budget get a lower REPORT_DETAILS level (downgrade) or an error item.
+    """
+
+    def __init__(
+        self, simulation: RunSimulation, template: Any, max_bytes: int, detail: str = "full",
+        downgrade: bool = True, hierarchical_attribution: bool = False, lazy: bool = False,
+        fetch_size: int = 64
+    ):
+        if detail not in REPORT_DETAILS:
+            raise ValueError(f"Unknown report detail '{detail}'; expected one of {list(REPORT_DETAILS)}")
+        self.simulation = simulation
+        self.template = template
+        self.budget = MemoryBudget(max_bytes)
+        self.detail = detail
+        self.downgrade = downgrade
+        self.hierarchical_attribution = hierarchical_attribution
+        self.lazy = lazy
+        self.fetch_size = fetch_size
+
+    def _admit(self, trace_id: str, trace: Optional[SurgicalTrace]):
+        if trace is None:
+            return trace_id, None, None, 0, f"ValueError: Trace {trace_id} not found"
+        n_events = len(trace.events)
+        try:
+            detail = plan_detail(n_events, self.budget.max_bytes, self.detail, self.downgrade,
+                                 self.hierarchical_attribution)
+        except MemoryBudgetExceeded as exc:
+            return trace_id, None, None, 0, f"MemoryBudgetExceeded: {exc}"
+        cost = estimate_trace_bytes(n_events) + estimate_report_bytes(n_events, detail, self.hierarchical_attribution)
+        self.budget.reserve(cost)  # fetched already; intake stops once the budget is used up
+        return trace_id, trace, detail, cost, None
+
+    def score(self, trace_ids: Iterable[str]) -> Iterator[ScoredTrace]:
+        ids = iter(trace_ids)
+        buffer: deque = deque()
+        exhausted = False
+        repo = self.simulation.trace_repo
+        while True:
+            # Intake: fetch more only while the budget has room (always when idle)
+            while not exhausted and (not buffer or self.budget.in_flight < self.budget.max_bytes):
+                group = list(islice(ids, self.fetch_size))
+                if not group:
+                    exhausted = True
+                    break
+                buffer.extend(self._admit(t_id, trace) for t_id, trace in zip(group, repo.get_traces(group)))
+            if not buffer:
+                return
+            trace_id, trace, detail, cost, error = buffer.popleft()
+            report = None
+            if error is None:
+                try:
+                    report = self.simulation.execute_trace(
+                        trace, template=self.template, hierarchical_attribution=self.hierarchical_attribution,
+                        lazy=self.lazy, detail=detail
+                    )
+                except Exception as exc:
+                    error = f"{type(exc).__name__}: {exc}"
+            trace = None  # only the report stays resident while the consumer holds it
+            try:
+                yield ScoredTrace(trace_id, report, detail if error is None else None, error)
+            finally:
+                self.budget.release(cost)
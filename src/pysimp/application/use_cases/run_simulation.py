@@ -1,53 +1,144 @@
 
+import hashlib
+import orjson
+import threading
+from collections import OrderedDict
+from pysimp.application.interfaces.observer import NULL_OBSERVER, SimulationObserver
 from pysimp.application.interfaces.repository import TraceRepository
+from pysimp.application.interfaces.report_cache import ReportCache
 from pysimp.domain.entities.trace import SurgicalTrace
 from pysimp.domain.services.layer_a import LayerA
 from pysimp.domain.services.layer_d import LayerD
 from pysimp.domain.services.layer_e import LayerE
 from pysimp.domain.services.layer_b import LayerB
-from typing import List, Any, Optional, Dict
+import numpy as np
+from typing import List, Any, Optional, Dict, Tuple, NamedTuple
 
-from pysimp.domain.services.layer_c import LayerC
+from pysimp.domain.services.layer_c import LayerC, CompiledDynamics
+from pysimp.domain.services.score_gradient import ScoreGradient, ScoreGradientResult
+from pysimp.domain.services.attribution import SurgitAttributionGame
+from pysimp.domain.services.counterfactual import CounterfactualEngine
+from pysimp.domain.services.scoring_kernel import CompiledTemplate
 
 from pysimp.domain.entities.report import (
     SimulationReport, StepMetric, NoiseMetric, CEMetric, PCPMetric, 
-    TraceabilityEntry, ShapleyDecomposition
+    TraceabilityEntry, ShapleyDecomposition, StepAttribution, SurgitAttribution,
+    LazySimulationReport, REPORT_DETAILS
 )
 from pysimp.domain.entities.trace import SurgitType
 
+class StepRow(NamedTuple):
+    """
+    A.III.1 step row as computed by the engine (StepMetric before validation).
+    """
+    step_id: str
+    pi_t: float
+    delta_t: float
+    s_q_t: float
+    rho_t: float
+    w_t: float
+
 class RunSimulation:
-    def __init__(self, trace_repo: TraceRepository, layer_b_adapter: Optional[LayerB] = None):
+    # Exact Owen values while (steps - 1) + surgits-per-step stays within this many bits
+    EXACT_ATTRIBUTION_MAX_BITS = 16
+    # Part of every report cache key: bump whenever scoring output changes
+    ENGINE_VERSION = "sim-engine/1"
+    # Templates whose compiled dynamics / fingerprint are kept (least recently used dropped)
+    TEMPLATE_CACHE_SIZE = 16
+
+    def __init__(
+        self, trace_repo: TraceRepository, layer_b_adapter: Optional[LayerB] = None,
+        report_cache: Optional[ReportCache] = None, observer: Optional[SimulationObserver] = None
+    ):
         self.trace_repo = trace_repo
         self.layer_b = layer_b_adapter
-        
-    def _run_single_pass(self, trace_events, template, factor_mask=None) -> Dict[str, Any]:
+        self.report_cache = report_cache
+        self.observer = observer or NULL_OBSERVER
+        # id(template) -> (template, value); the template is held so its id cannot be reused
+        self._dynamics_cache: "OrderedDict[int, Tuple[Any, CompiledDynamics]]" = OrderedDict()
+        self._fingerprint_cache: "OrderedDict[int, Tuple[Any, str]]" = OrderedDict()
+        self._template_lock = threading.Lock()
+
+    def _per_template(self, cache: "OrderedDict[int, Tuple[Any, Any]]", template: Any, build) -> Any:
+        """
+        Bounded LRU lookup keyed by template identity (templates are unhashable models).
+        """
+        key = id(template)
+        with self._template_lock:
+            cached = cache.get(key)
+            if cached is None or cached[0] is not template:
+                cached = cache[key] = (template, build(template))
+                while len(cache) > self.TEMPLATE_CACHE_SIZE:
+                    cache.popitem(last=False)
+            cache.move_to_end(key)
+            return cached[1]
+
+    def _compiled_dynamics(self, template: Any) -> CompiledDynamics:
+        """
+        Layer C kernels are chosen once per template instance.
+        """
+        return self._per_template(
+            self._dynamics_cache, template, lambda t: LayerC.compile(t.dynamics_definition)
+        )
+
+    @staticmethod
+    def fingerprint(model: Any) -> str:
+        """
+        SHA-256 of a pydantic model's canonical JSON (sorted keys).
+        """
+        payload = orjson.dumps(model.model_dump(mode="json"), option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(payload).hexdigest()
+
+    def _template_fingerprint(self, template: Any) -> str:
+        return self._per_template(self._fingerprint_cache, template, self.fingerprint)
+
+    def cache_key(
+        self, trace: SurgicalTrace, template: Any, hierarchical_attribution: bool = False, detail: str = "full"
+    ) -> str:
+        """
+        Report cache key: trace content hash, template fingerprint, engine
+        version and the options that change the report.
+        """
+        parts = [
+            self.ENGINE_VERSION, self.fingerprint(trace), self._template_fingerprint(template),
+            f"layer_b={type(self.layer_b).__name__ if self.layer_b else ''}",
+            f"hierarchical={int(hierarchical_attribution)}"
+        ]
+        if detail != "full":
+            parts.append(f"detail={detail}")
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    def _run_single_pass(self, trace_events, template, factor_mask=None, materialize: bool = True) -> Dict[str, Any]:
         """
         Helper to run simulation logic with optional factor masking for Shapley.
         factor_mask: {'patient': bool, 'external': bool} - if False, treat noise as 1.0 (ideal).
         If both False, we get Ideal/Normative baseline (assuming intrinsic deviation is unavoidable baseline).
+        materialize: also build the Annex III table rows; otherwise only 'builders'
+        (table name -> callable) are returned and no row model is allocated.
         """
         # 1. Initialize Aggregators
         step_metrics = {} 
+        event_deviations = []
         cumulative_sigma_res = 1.0
-        z_state = LayerC.initialize_state()
-        traceability = []
+        # Layer C inputs per position (scored events and pauses)
+        position_deviation, position_n, position_e, position_pause = [], [], [], []
+        traced_events = []  # (trace index, step_id, position)
         
-        step_table = []
-        noise_table = []
-        ce_table = []
+        step_rows = []
+        noise_rows = []  # (step_id, n_t, e_t, pause_duration)
+        ce_rows = []     # (step_id, ce_type, timestamp)
 
         if not template: return {}
 
         for i, event in enumerate(trace_events):
              # A.I.3 Pauses
              if getattr(event, 'is_pause', False):
-                 decay = template.dynamics_definition.get('provenance_decay', 1.0)
-                 z_state.provenance_vector = LayerC.update_provenance(
-                     z_state.provenance_vector, 0.0, lambda h: h * decay
-                 )
-                 noise_table.append(NoiseMetric(
-                     step_id="PAUSE", n_t=1.0, e_t=1.0, 
-                     pause_duration=(event.timestamp_end - event.timestamp_start).total_seconds()
+                 position_deviation.append(0.0)
+                 position_n.append(1.0)
+                 position_e.append(1.0)
+                 position_pause.append(True)
+                 noise_rows.append((
+                     "PAUSE", 1.0, 1.0, (event.timestamp_end - event.timestamp_start).total_seconds()
                  ))
                  continue
 
@@ -90,25 +181,19 @@ class RunSimulation:
 
              delta_final = LayerA.apply_mitigation(delta_tot, sigma_effective)
              step_metrics[step_id]['deviations'].append(delta_final)
+             event_deviations.append((event.surgit_id, step_id, delta_final))
 
-             # Layer C: State
-             decay = template.dynamics_definition.get('provenance_decay', 1.0)
-             z_state = LayerC.transition_kernel(z_state, delta_final, n_t, e_t, decay_rate=decay)
-             
-             # Capture Traceability (A.III.2)
-             traceability.append(TraceabilityEntry(
-                 step_index=i, step_id=step_id, 
-                 clinical_state_burden=z_state.clinical_state.get('general_burden', 0.0),
-                 provenance_vector=list(z_state.provenance_vector)
-             ))
+             # Layer C: State (advanced in one compiled run when Traceability is built)
+             traced_events.append((i, step_id, len(position_deviation)))
+             position_deviation.append(delta_final)
+             position_n.append(n_t)
+             position_e.append(e_t)
+             position_pause.append(False)
              
              # Capture Metadata (A.III.1 Tables)
-             noise_table.append(NoiseMetric(step_id=step_id, n_t=n_t, e_t=e_t))
+             noise_rows.append((step_id, n_t, e_t, None))
              if event.surgit_type in [SurgitType.CE_SUBSTITUTION, SurgitType.CE_ADDITION]:
-                 ce_table.append(CEMetric(
-                     step_id=step_id, ce_type=event.surgit_type.value, 
-                     timestamp=event.timestamp_start.isoformat()
-                 ))
+                 ce_rows.append((step_id, event.surgit_type.value, event.timestamp_start))
 
         # 2. Aggregation (Layer D)
         step_entropies = []
@@ -122,10 +207,7 @@ class RunSimulation:
             delta_t = LayerD.calculate_step_deviation(pi_t)
             s_q_t = LayerD.calculate_step_entropy(pi_t, template.tsallis_q)
             
-            step_table.append(StepMetric(
-                step_id=s_id, m_t=0.0, pi_t=pi_t, delta_t=delta_t, 
-                s_q_t=s_q_t, rho_t=delta_t, w_t=w_t
-            ))
+            step_rows.append(StepRow(s_id, pi_t, delta_t, s_q_t, delta_t, w_t))
             
             step_entropies.append(s_q_t)
             rho_sim += w_t * delta_t # Approx rho using delta
@@ -135,87 +217,307 @@ class RunSimulation:
         alpha = template.weight_alpha
         beta = template.weight_beta
         global_score = LayerD.calculate_global_score(rho_sim, s_q_sim, alpha, beta)
+
+        def traceability() -> List[TraceabilityEntry]:
+            # Capture Traceability (A.III.2)
+            if not traced_events:
+                return []
+            dynamics = self._compiled_dynamics(template)
+            states = dynamics.run(position_deviation, position_n, position_e, position_pause)
+            deviations = np.asarray(position_deviation)
+            declared = len(dynamics.components) > 1
+            return [
+                TraceabilityEntry(
+                    step_index=i, step_id=step_id,
+                    clinical_state_burden=float(states[pos, 0]),
+                    provenance_vector=dynamics.provenance(deviations, pos).tolist(),
+                    clinical_state=dict(zip(dynamics.components, states[pos].tolist())) if declared else None
+                )
+                for i, step_id, pos in traced_events
+            ]
+
+        builders = {
+            "StepTable": lambda: [
+                StepMetric(step_id=r.step_id, m_t=0.0, pi_t=r.pi_t, delta_t=r.delta_t,
+                           s_q_t=r.s_q_t, rho_t=r.rho_t, w_t=r.w_t)
+                for r in step_rows
+            ],
+            "NoiseTable": lambda: [
+                NoiseMetric(step_id=s, n_t=n, e_t=e, pause_duration=p) for s, n, e, p in noise_rows
+            ],
+            "CETable": lambda: [
+                CEMetric(step_id=s, ce_type=c, timestamp=ts.isoformat()) for s, c, ts in ce_rows
+            ],
+            "Traceability": traceability,
+        }
         
-        return {
+        result = {
             "score": global_score,
             "rho": rho_sim,
             "entropy": s_q_sim,
-            "step_table": step_table,
-            "noise_table": noise_table,
-            "ce_table": ce_table,
-            "traceability": traceability
+            "step_rows": step_rows,
+            "builders": builders,
+            "event_deviations": event_deviations
         }
+        if materialize:
+            result.update(
+                step_table=builders["StepTable"](),
+                noise_table=builders["NoiseTable"](),
+                ce_table=builders["CETable"](),
+                traceability=builders["Traceability"]()
+            )
+        return result
 
-    def execute(self, trace_id: str, template: Any = None, q: float = 1.0) -> SimulationReport:
+    @staticmethod
+    def pcp_matrix(
+        scored: List[Tuple[float, float, List[Any]]], template: Any
+    ) -> Tuple[List[str], np.ndarray, np.ndarray]:
         """
-        Orchestrates the simulation and returns a formal Annex III Report.
+        Layer E over a cohort in one call.
+        scored: (Delta_SIM, S_q(SIM), step rows) per trace; Delta_SIM uses rho_SIM.
+        Step rows are StepMetric or StepRow (step_id, delta_t, rho_t are read).
+        Returns (complications, eta, P) with (traces x K) matrices.
         """
-        trace = self.trace_repo.get_trace(trace_id)
-        if not trace: raise ValueError(f"Trace {trace_id} not found")
+        complications, step_ids, coefficients = LayerE.pcp_coefficient_matrix(template)
+        column = {s: t for t, s in enumerate(step_ids)}
+        delta_sim = np.zeros(len(scored))
+        s_q_sim = np.zeros(len(scored))
+        delta_t = np.zeros((len(scored), len(step_ids)))
+        rho_t = np.zeros((len(scored), len(step_ids)))
+        for i, (rho, entropy, step_table) in enumerate(scored):
+            delta_sim[i], s_q_sim[i] = rho, entropy
+            for row in step_table:
+                if row.step_id in column:
+                    delta_t[i, column[row.step_id]] = row.delta_t
+                    rho_t[i, column[row.step_id]] = row.rho_t
+        eta, prob = LayerE.predict_pcp_matrix(coefficients, delta_sim, s_q_sim, delta_t, rho_t)
+        return complications, eta, prob
 
-        # A.I.4 Validation (Skipping detail for brevity, assumed checked or check here)
-        if template and self.layer_b:
-            if not self.layer_b.validate_structure(trace.events, template):
-                raise ValueError("Validation Failed (Handle gracefully in prod)") # Simplified
+    @staticmethod
+    def pcp_matrix_from_reports(
+        reports: List[SimulationReport], template: Any
+    ) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        pcp_matrix for already assembled reports (e.g. after re-calibration).
+        """
+        return RunSimulation.pcp_matrix(
+            [(r.GlobalMetrics['rho_SIM'], r.GlobalMetrics['S_q(SIM)'], r.StepTable) for r in reports],
+            template
+        )
 
-        # 1. Run Actual Simulation
-        actual_res = self._run_single_pass(trace.events, template)
-        
+    def _hierarchical_attribution(self, pass_res: Dict[str, Any], template: Any, seed: int = 0):
+        """
+        Owen attribution of Score_SIM across Step -> Surgit (exact when small,
+        otherwise seeded Monte Carlo). Returns (step table, surgit table).
+        """
+        game = SurgitAttributionGame(
+            pass_res['event_deviations'],
+            {row.step_id: row.w_t for row in pass_res['step_rows']},
+            template.tsallis_q, template.weight_alpha, template.weight_beta
+        )
+        if not game.groups:
+            return [], []
+
+        bits = len(game.groups) - 1 + max(len(m) for m in game.groups.values())
+        if bits <= self.EXACT_ATTRIBUTION_MAX_BITS:
+            surgit_phi, step_phi = LayerE.calculate_owen_values(game.groups, batch_value_function=game)
+            surgit_se = {s: None for s in surgit_phi}
+            step_se = {s: None for s in step_phi}
+        else:
+            surgit_est, step_est = LayerE.estimate_owen_values(
+                game.groups, batch_value_function=game, seed=seed, stratified=True
+            )
+            surgit_phi = {s: e.value for s, e in surgit_est.items()}
+            surgit_se = {s: e.std_error for s, e in surgit_est.items()}
+            step_phi = {s: e.value for s, e in step_est.items()}
+            step_se = {s: e.std_error for s, e in step_est.items()}
+        self.observer.count("coalitions_evaluated", game.evaluations)
+
+        step_table = [
+            StepAttribution(step_id=s, phi=step_phi[s], std_error=step_se[s]) for s in game.groups
+        ]
+        surgit_table = [
+            SurgitAttribution(step_id=step_id, surgit_id=s, phi=surgit_phi[s], std_error=surgit_se[s])
+            for step_id, members in game.groups.items() for s in members
+        ]
+        return step_table, surgit_table
+
+    def _noise_decomposition(self, events, template, actual_res: Dict[str, Any]) -> ShapleyDecomposition:
+        """
+        execute()'s steps 2-3: ideal and single-factor ablation passes around a
+        finished actual pass.
+        """
+        observer = self.observer
         # 2. Run Ideal Simulation (Baseline) for Decomposition
         # Ideal: No Patient Noise (n=1), No External Noise (e=1)
-        ideal_res = self._run_single_pass(trace.events, template, factor_mask={'patient': False, 'external': False})
+        with observer.span("pass.ideal"):
+            ideal_res = self._run_single_pass(events, template, factor_mask={'patient': False, 'external': False}, materialize=False)
         
         # 3. Parameter Isolation (Simplified Decomposition)
         # Phi_Internal/Intrinsic is covered in Ideal Score.
         # Decomposition: Global Score = Ideal + Phi_Pat + Phi_Ext
         
         # Run with ONLY Patient noise (External = 1)
-        pat_res = self._run_single_pass(trace.events, template, factor_mask={'patient': True, 'external': False})
+        with observer.span("pass.patient"):
+            pat_res = self._run_single_pass(events, template, factor_mask={'patient': True, 'external': False}, materialize=False)
         phi_patient = pat_res['score'] - ideal_res['score']
         
         # Run with ONLY External noise (Patient = 1)
-        ext_res = self._run_single_pass(trace.events, template, factor_mask={'patient': False, 'external': True})
+        with observer.span("pass.external"):
+            ext_res = self._run_single_pass(events, template, factor_mask={'patient': False, 'external': True}, materialize=False)
         phi_external = ext_res['score'] - ideal_res['score']
         
         # Phi Decision/Interaction: Residual difference (Total - (Ideal + Pat + Ext))
         # This captures interaction effects (synergy) or unaccounted factors assigned to 'Decision'
         phi_dec = actual_res['score'] - (ideal_res['score'] + phi_patient + phi_external)
-        
-        # 4. Layer E: PCP Calculation
-        pcp_table = []
-        if getattr(template, "calibration_coeffs", None):
-            # Simplified using global metrics
-            # E4 Linear Predictor
-            eta = LayerE.calculate_linear_predictor(
-                alpha_k=template.calibration_coeffs.get('alpha', 0.0),
-                beta_delta=template.calibration_coeffs.get('beta_delta', 0.0),
-                delta_sim=actual_res['rho'], # Using rho as proxy for Delta_SIM check defs
-                beta_s=template.calibration_coeffs.get('beta_s', 0.0),
-                s_q_sim=actual_res['entropy']
-            )
-            prob = LayerE.predict_pcp_probability(eta)
-            pcp_table.append(PCPMetric(complication_type="General", p_k_sim=prob, eta_k=eta))
-
-        # 5. Assemble Report
-        decomp = ShapleyDecomposition(
+        return ShapleyDecomposition(
             score_ideal=ideal_res['score'],
             phi_intrinsic=0.0, # Covered in Ideal? Or separate? Let's say Ideal Base
             phi_patient=phi_patient,
             phi_external=phi_external,
             phi_decision=phi_dec
         )
-        
-        return SimulationReport(
-            trace_id=trace_id,
-            GlobalMetrics={
-                "S_q(SIM)": actual_res['entropy'],
-                "rho_SIM": actual_res['rho'],
-                "Score_SIM": actual_res['score']
-            },
-            StepTable=actual_res['step_table'],
-            NoiseTable=actual_res['noise_table'],
-            CETable=actual_res['ce_table'],
-            PCPTable=pcp_table,
-            Traceability=actual_res['traceability'],
-            ShapleyDecomposition=decomp
+
+    def _assemble_report(
+        self, trace_id: str, template: Any, actual_res: Dict[str, Any], decomp: ShapleyDecomposition,
+        step_attr: Optional[List[StepAttribution]] = None, surgit_attr: Optional[List[SurgitAttribution]] = None,
+        lazy: bool = False, detail: str = "full"
+    ) -> SimulationReport:
+        """
+        execute()'s steps 4 and 6 on a finished (materialize=False) actual pass:
+        E4 PCP for every calibrated k, then the report and its detail-level tables.
+        """
+        observer = self.observer
+        # 4. Layer E: PCP Calculation (full E4 for every calibrated k)
+        pcp_table = []
+        if template and template.calibration_coefficients:
+            with observer.span("pcp"):
+                complications, eta, prob = self.pcp_matrix(
+                    [(actual_res['rho'], actual_res['entropy'], actual_res['step_rows'])], template
+                )
+                pcp_table = [
+                    PCPMetric(complication_type=k, p_k_sim=float(prob[0, j]), eta_k=float(eta[0, j]))
+                    for j, k in enumerate(complications)
+                ]
+
+        # 6. Assemble Report
+        with observer.span("report"):
+            values = dict(
+                trace_id=trace_id,
+                GlobalMetrics={
+                    "S_q(SIM)": float(actual_res['entropy']),
+                    "rho_SIM": float(actual_res['rho']),
+                    "Score_SIM": float(actual_res['score'])
+                },
+                PCPTable=pcp_table,
+                ShapleyDecomposition=decomp,
+                StepAttributionTable=step_attr,
+                SurgitAttributionTable=surgit_attr
+            )
+            kept = REPORT_DETAILS[detail]
+            builders = {
+                name: build if name in kept else list for name, build in actual_res['builders'].items()
+            }
+            if lazy:
+                return LazySimulationReport.from_builders(builders, **values)
+            return SimulationReport(**values, **{name: build() for name, build in builders.items()})
+
+    def execute(
+        self, trace_id: str, template: Any = None, q: float = 1.0,
+        hierarchical_attribution: bool = False, lazy: bool = False, detail: str = "full"
+    ) -> SimulationReport:
+        """
+        Orchestrates the simulation and returns a formal Annex III Report.
+        hierarchical_attribution: also fill the Step/Surgit Owen attribution tables.
+        lazy: return a LazySimulationReport whose Step/Noise/CE/Traceability
+        tables are only built when first read.
+        detail: REPORT_DETAILS level; tables it omits are left empty
+        ("tables" drops Traceability, "summary" every A.III.1/A.III.2 table).
+        With a report_cache, unchanged (trace, template, engine) inputs return
+        the stored report instead of being scored again.
+        Spans and counters go to self.observer.
+        """
+        with self.observer.span("execute"):
+            return self._execute(trace_id, None, template, hierarchical_attribution, lazy, detail)
+
+    def execute_trace(
+        self, trace: SurgicalTrace, template: Any = None,
+        hierarchical_attribution: bool = False, lazy: bool = False, detail: str = "full"
+    ) -> SimulationReport:
+        """
+        execute() for a trace the caller already holds (no repository read).
+        """
+        with self.observer.span("execute"):
+            return self._execute(trace.procedure_id, trace, template, hierarchical_attribution, lazy, detail)
+
+    def _execute(
+        self, trace_id: str, trace: Optional[SurgicalTrace], template: Any,
+        hierarchical_attribution: bool, lazy: bool, detail: str
+    ) -> SimulationReport:
+        observer = self.observer
+        if detail not in REPORT_DETAILS:
+            raise ValueError(f"Unknown report detail '{detail}'; expected one of {list(REPORT_DETAILS)}")
+        if trace is None:
+            trace = self.trace_repo.get_trace(trace_id)
+        if not trace: raise ValueError(f"Trace {trace_id} not found")
+
+        cache_key = None
+        if self.report_cache is not None and template:
+            cache_key = self.cache_key(trace, template, hierarchical_attribution, detail)
+            with observer.span("report_cache.get"):
+                cached = self.report_cache.get(cache_key)
+            if cached is not None:
+                observer.count("report_cache.hits")
+                return cached
+            observer.count("report_cache.misses")
+        observer.count("events_processed", len(trace.events))
+
+        # A.I.4 Validation (Skipping detail for brevity, assumed checked or check here)
+        if template and self.layer_b:
+            with observer.span("layer_b"):
+                valid = self.layer_b.validate_structure(trace.events, template)
+            if not valid:
+                raise ValueError("Validation Failed (Handle gracefully in prod)") # Simplified
+
+        # 1. Run Actual Simulation
+        with observer.span("pass.actual"):
+            actual_res = self._run_single_pass(trace.events, template, materialize=False)
+
+        # 2-3. Ideal baseline and noise-factor ablations
+        decomp = self._noise_decomposition(trace.events, template, actual_res)
+
+        # 5. Optional Step -> Surgit attribution
+        step_attr, surgit_attr = None, None
+        if hierarchical_attribution and template:
+            with observer.span("attribution"):
+                step_attr, surgit_attr = self._hierarchical_attribution(actual_res, template)
+
+        # 4, 6. PCP and report assembly
+        report = self._assemble_report(
+            trace_id, template, actual_res, decomp, step_attr, surgit_attr, lazy=lazy, detail=detail
         )
+        if cache_key is not None:
+            with observer.span("report_cache.put"):
+                self.report_cache.put(cache_key, report)
+        return report
+
+    def counterfactuals(self, trace_id: str, template: Any, stride: int = 32) -> CounterfactualEngine:
+        """
+        Checkpointed base scoring of a trace for what-if re-scoring:
+        engine.evaluate([RemoveEvent(37), OverrideNoise(40, n_t=1.0), ...])
+        re-scores only the suffix from the first edited position (no Layer B).
+        """
+        trace = self.trace_repo.get_trace(trace_id)
+        if not trace: raise ValueError(f"Trace {trace_id} not found")
+        return CounterfactualEngine(
+            trace.events, CompiledTemplate.from_template(template), self._compiled_dynamics(template), stride
+        )
+
+    def score_gradient(self, trace_id: str, template: Any) -> ScoreGradientResult:
+        """
+        Returns Score_SIM and its analytic gradient with respect to every surgit
+        parameter, step weight, q, alpha and beta (single forward/backward sweep).
+        """
+        trace = self.trace_repo.get_trace(trace_id)
+        if not trace: raise ValueError(f"Trace {trace_id} not found")
+        return ScoreGradient.compute(trace.events, template)
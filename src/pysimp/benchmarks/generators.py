@@ -0,0 +1,206 @@
+
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import yaml
+
+from pysimp.domain.entities.trace import SurgicalTrace, SurgitEvent
+from pysimp.domain.services.scoring_kernel import CompiledTemplate
+from pysimp.infrastructure.persistence.yaml_loader import YamlTemplateLoader
+
+COMPLICATIONS = ("Infection", "Bleeding")
+
+
+@dataclass(frozen=True)
+class TemplateSpec:
+    """
+    Shape of a synthetic normative template.
+    n_surgits: total surgits (= Layer B transitions).
+    surgits_per_step: step size; the last step takes the remainder.
+    concurrency: parallel branches inside each step. The first surgit of a
+        step forks into that many places, the middle surgits form branch
+        chains and the last surgit joins them (1 = a single sequential chain).
+    """
+    n_surgits: int = 10
+    surgits_per_step: int = 10
+    concurrency: int = 1
+    seed: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"s{self.n_surgits}-c{self.concurrency}"
+
+
+@dataclass(frozen=True)
+class _Block:
+    """
+    One step of the net: fork surgit, parallel branch chains, join surgit.
+    """
+    step_id: str
+    fork: str
+    branches: Tuple[Tuple[str, ...], ...]
+    join: Optional[str]
+
+
+def _blocks(spec: TemplateSpec) -> List[_Block]:
+    blocks, first = [], 0
+    n_steps = max(1, math.ceil(spec.n_surgits / spec.surgits_per_step))
+    for t in range(n_steps):
+        size = spec.surgits_per_step if t < n_steps - 1 else spec.n_surgits - first
+        ids = [f"S{first + k + 1}" for k in range(size)]
+        first += size
+        if size == 1:
+            blocks.append(_Block(f"P{t + 1}", ids[0], (), None))
+            continue
+        middle = ids[1:-1]
+        width = max(1, min(spec.concurrency, len(middle)))
+        branches = tuple(tuple(middle[b::width]) for b in range(width))
+        blocks.append(_Block(f"P{t + 1}", ids[0], branches, ids[-1]))
+    return blocks
+
+
+def template_document(spec: TemplateSpec) -> Dict[str, Any]:
+    """
+    YAML-ready template in the templates/apendicectomia.yaml layout.
+    """
+    rng = np.random.default_rng(spec.seed)
+    places: List[str] = ["p_0"]
+    transitions: List[Dict[str, Any]] = []
+    steps: Dict[str, Any] = {}
+    entry = "p_0"
+    for t, block in enumerate(_blocks(spec)):
+        exit_ = f"p_{t + 1}"
+        surgit_ids = [block.fork] + [s for branch in block.branches for s in branch] + ([block.join] if block.join else [])
+        if block.join is None:
+            transitions.append({"id": block.fork, "input": entry, "output": exit_})
+        else:
+            heads, tails = [], []
+            for b, branch in enumerate(block.branches):
+                place = f"p_{t + 1}_{b}_0"
+                places.append(place)
+                heads.append(place)
+                for k, s_id in enumerate(branch):
+                    nxt = f"p_{t + 1}_{b}_{k + 1}"
+                    places.append(nxt)
+                    transitions.append({"id": s_id, "input": place, "output": nxt})
+                    place = nxt
+                tails.append(place)
+            transitions.append({"id": block.fork, "input": entry, "output": heads})
+            transitions.append({"id": block.join, "input": tails, "output": exit_})
+        places.append(exit_)
+        steps[block.step_id] = {
+            "name": f"Step {t + 1}",
+            "weight_wt": round(float(rng.uniform(0.5, 1.5)), 3),
+            "surgits": {
+                s_id: {
+                    "name": f"Surgit {s_id}",
+                    "base_probability": round(float(rng.uniform(0.8, 0.99)), 4),
+                    "complexity_weight": round(float(rng.uniform(0.1, 0.5)), 3),
+                }
+                for s_id in surgit_ids
+            },
+        }
+        entry = exit_
+
+    return {
+        "procedure_type": f"Synthetic {spec.name}",
+        "version": "1.0.0",
+        "tsallis_q": 1.0,
+        "complication_set_k": list(COMPLICATIONS),
+        "calibration_coefficients": {
+            k: {
+                "alpha_k": 0.05, "beta_k_delta": 1.5, "beta_k_s": 1.0,
+                "gamma_k_t": {step: round(float(rng.uniform(0.1, 0.8)), 3) for step in steps},
+                "xi_k_t": {step: 0.01 for step in steps},
+            }
+            for k in COMPLICATIONS
+        },
+        "dynamics_definition": {
+            "state_components": ["fatigue", "instrument_wear"],
+            "decay_functions": {"fatigue": "exponential", "instrument_wear": "linear"},
+        },
+        "forbidden_states": [["p_0", entry]],
+        "steps": steps,
+        "structure_definition": {"places": places, "transitions": transitions, "initial_marking": "p_0"},
+    }
+
+
+def write_template(spec: TemplateSpec, path: Union[str, Path]) -> Path:
+    path = Path(path)
+    with open(path, "w") as f:
+        yaml.safe_dump(template_document(spec), f, sort_keys=False)
+    return path
+
+
+class SyntheticTemplate:
+    """
+    A generated template on disk plus a cohort generator for it. Cohorts are
+    valid firing sequences (each branch keeps its order, branches interleave
+    at random) sampled directly from the block structure, so generation stays
+    linear in the number of surgits where the dense CompiledPetriNet walk of
+    ForwardSimulator would not.
+    """
+
+    def __init__(self, spec: TemplateSpec, directory: Union[str, Path]):
+        self.spec = spec
+        self.path = write_template(spec, Path(directory) / f"template-{spec.name}.yaml")
+        self.template = YamlTemplateLoader.load(self.path)
+        self.kernel = CompiledTemplate.from_template(self.template)
+        self._blocks = _blocks(spec)
+
+    def sample_cohort(self, rng: np.random.Generator, n_traces: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (surgits, n_t, e_t) arrays of shape (n_traces, n_surgits); surgits are kernel indices.
+        """
+        columns = []
+        for block in self._blocks:
+            middle = [s for branch in block.branches for s in branch]
+            if len(block.branches) > 1:
+                # Sorted keys inside a branch keep its chain order; argsort over all
+                # keys then yields a uniformly random interleaving of the branches
+                keys = rng.random((n_traces, len(middle)))
+                start = 0
+                for branch in block.branches:
+                    keys[:, start:start + len(branch)] = np.sort(keys[:, start:start + len(branch)], axis=1)
+                    start += len(branch)
+                ids = self.kernel.surgit_index(middle)[np.argsort(keys, axis=1)]
+            else:
+                ids = np.broadcast_to(self.kernel.surgit_index(middle), (n_traces, len(middle)))
+            columns.append(np.broadcast_to(self.kernel.surgit_index([block.fork]), (n_traces, 1)))
+            columns.append(ids)
+            if block.join:
+                columns.append(np.broadcast_to(self.kernel.surgit_index([block.join]), (n_traces, 1)))
+        surgits = np.concatenate(columns, axis=1)
+        n_t = rng.uniform(1.0, 1.5, surgits.shape)
+        e_t = rng.uniform(1.0, 1.2, surgits.shape)
+        return surgits, n_t, e_t
+
+    def to_traces(self, cohort: Tuple[np.ndarray, np.ndarray, np.ndarray], first_index: int = 0) -> List[SurgicalTrace]:
+        surgits, n_t, e_t = cohort
+        start = datetime(2000, 1, 1)
+        step = timedelta(minutes=1)
+        names = self.kernel.surgit_ids
+        traces = []
+        for b in range(len(surgits)):
+            events = [
+                SurgitEvent(surgit_id=names[s], timestamp_start=start + k * step, timestamp_end=start + (k + 1) * step,
+                            n_t=n, e_t=e)
+                for k, (s, n, e) in enumerate(zip(surgits[b].tolist(), n_t[b].tolist(), e_t[b].tolist()))
+            ]
+            index = first_index + b
+            traces.append(SurgicalTrace(procedure_id=f"BENCH-{index:08d}", patient_id=f"BENCH-PAT-{index:08d}",
+                                        events=events))
+        return traces
+
+    def iter_cohort(self, n_traces: int, seed: int = 0, max_cells: int = 1 << 22) -> Iterator[Tuple[np.ndarray, ...]]:
+        """
+        Cohort arrays in batches of at most max_cells events.
+        """
+        rng = np.random.default_rng(seed)
+        batch = max(1, max_cells // max(1, self.spec.n_surgits))
+        for lo in range(0, n_traces, batch):
+            yield self.sample_cohort(rng, min(batch, n_traces - lo))
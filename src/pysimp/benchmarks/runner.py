@@ -0,0 +1,223 @@
+
+import platform
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import orjson
+
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.benchmarks.generators import SyntheticTemplate, TemplateSpec
+from pysimp.domain.services.layer_e import LayerE
+from pysimp.infrastructure.adapters.snakes_adapter import SnakesLayerBAdapter
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+from pysimp.infrastructure.persistence.yaml_loader import YamlTemplateLoader
+
+FORMAT = "pysimp.bench/1"
+# Timed separately, in pipeline order. cohort_kernel is the vectorized A/A'/D
+# scorer over the full cohort; the other per-trace layers run on a sample.
+LAYERS = ("yaml_load", "layer_b_replay", "single_pass", "shapley", "report", "cohort_kernel")
+# Players of the timed Shapley game: v(S) = Score_SIM with only the noise factors in S applied
+NOISE_FACTORS = ("patient", "external")
+
+
+@dataclass(frozen=True)
+class BenchmarkConfig:
+    """
+    Benchmark grid: every (surgits, concurrency) template is run against every cohort size.
+    trace_sample caps how many traces the per-trace layers (Layer B replay,
+    single pass, Shapley, report) time per case; cohort_kernel always scores
+    the whole cohort.
+    """
+    surgits: Tuple[int, ...] = (10, 100, 1000)
+    concurrency: Tuple[int, ...] = (1, 4)
+    cohorts: Tuple[int, ...] = (1, 1000, 100_000)
+    surgits_per_step: int = 10
+    trace_sample: int = 50
+    repeat: int = 3
+    seed: int = 0
+    layers: Tuple[str, ...] = LAYERS
+
+
+def timing_stats(samples: Iterable[float], items: Optional[int] = None) -> Dict[str, float]:
+    """
+    Summary of per-call wall times (seconds). items: work units covered by all
+    samples together (defaults to one per sample) for the throughput figure.
+    """
+    values = np.asarray(list(samples), dtype=float)
+    if not len(values):
+        return {"n": 0}
+    total = float(values.sum())
+    items = len(values) if items is None else items
+    return {
+        "n": int(len(values)),
+        "total_s": total,
+        "mean_s": float(values.mean()),
+        "p50_s": float(np.percentile(values, 50)),
+        "p95_s": float(np.percentile(values, 95)),
+        "min_s": float(values.min()),
+        "items_per_s": items / total if total > 0 else float("inf"),
+    }
+
+
+def _timed(function: Callable[[], Any]) -> Tuple[float, Any]:
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def _noise_shapley(simulation: RunSimulation, events: List[Any], template: Any) -> Dict[str, float]:
+    """
+    Exact Shapley values of the noise factors through LayerE.calculate_shapley_values;
+    every coalition is one ablated single pass.
+    """
+    def score(coalition: List[str]) -> float:
+        mask = {factor: factor in coalition for factor in NOISE_FACTORS}
+        return simulation._run_single_pass(events, template, factor_mask=mask, materialize=False)['score']
+
+    return LayerE.calculate_shapley_values(list(NOISE_FACTORS), score)
+
+
+def run_case(synthetic: SyntheticTemplate, n_traces: int, config: BenchmarkConfig) -> Dict[str, Any]:
+    layers = set(config.layers)
+    timings: Dict[str, Dict[str, float]] = {}
+    template = synthetic.template
+
+    if "yaml_load" in layers:
+        timings["yaml_load"] = timing_stats(
+            _timed(lambda: YamlTemplateLoader.load(synthetic.path))[0] for _ in range(config.repeat)
+        )
+
+    sample = min(n_traces, config.trace_sample)
+    traces = synthetic.to_traces(synthetic.sample_cohort(np.random.default_rng(config.seed), sample)) if sample else []
+    simulation = RunSimulation(InMemoryTraceRepository())
+
+    if "layer_b_replay" in layers:
+        adapter = SnakesLayerBAdapter()
+        samples = []
+        for trace in traces:
+            elapsed, valid = _timed(lambda: adapter.validate_structure(trace.events, template))
+            if not valid:
+                raise RuntimeError(f"Generated trace {trace.procedure_id} failed Layer B replay")
+            samples.append(elapsed)
+        timings["layer_b_replay"] = timing_stats(samples)
+
+    if layers & {"single_pass", "shapley", "report"}:
+        passes, ablations, reports = [], [], []
+        for trace in traces:
+            elapsed, res = _timed(lambda: simulation._run_single_pass(trace.events, template, materialize=False))
+            passes.append(elapsed)
+            if "shapley" in layers:
+                ablations.append(_timed(lambda: _noise_shapley(simulation, trace.events, template))[0])
+            if "report" in layers:
+                decomp = simulation._noise_decomposition(trace.events, template, res)
+                reports.append(_timed(
+                    lambda: simulation._assemble_report(trace.procedure_id, template, res, decomp)
+                )[0])
+        for name, samples in (("single_pass", passes), ("shapley", ablations), ("report", reports)):
+            if name in layers:
+                timings[name] = timing_stats(samples)
+
+    if "cohort_kernel" in layers:
+        samples = [
+            _timed(lambda: synthetic.kernel.score_cohort(*cohort))[0]
+            for cohort in synthetic.iter_cohort(n_traces, seed=config.seed)
+        ]
+        timings["cohort_kernel"] = timing_stats(samples, items=n_traces)
+
+    spec = synthetic.spec
+    return {
+        "case": f"{spec.name}-n{n_traces}",
+        "n_surgits": spec.n_surgits,
+        "concurrency": spec.concurrency,
+        "n_traces": n_traces,
+        "trace_sample": sample,
+        "layers": timings,
+    }
+
+
+def run_benchmarks(
+    config: BenchmarkConfig, directory: Union[str, Path, None] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Runs the whole grid and returns the JSON-ready result document.
+    Generated templates are written to directory (a temporary one if None).
+    """
+    unknown = set(config.layers) - set(LAYERS)
+    if unknown:
+        raise ValueError(f"Unknown benchmark layers {sorted(unknown)}; expected a subset of {LAYERS}")
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = Path(directory or scratch)
+        directory.mkdir(parents=True, exist_ok=True)
+        cases = []
+        for n_surgits in config.surgits:
+            for concurrency in config.concurrency:
+                spec = TemplateSpec(n_surgits, config.surgits_per_step, concurrency, config.seed)
+                synthetic = SyntheticTemplate(spec, directory)
+                for n_traces in config.cohorts:
+                    case = run_case(synthetic, n_traces, config)
+                    cases.append(case)
+                    if progress is not None:
+                        progress(case)
+    return {
+        "format": FORMAT,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+        },
+        "config": asdict(config),
+        "cases": cases,
+    }
+
+
+def save_results(results: Dict[str, Any], path: Union[str, Path]) -> None:
+    Path(path).write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+
+
+def load_results(path: Union[str, Path]) -> Dict[str, Any]:
+    results = orjson.loads(Path(path).read_bytes())
+    if results.get("format") != FORMAT:
+        raise ValueError(f"{path} is not a {FORMAT} benchmark result")
+    return results
+
+
+@dataclass(frozen=True)
+class Regression:
+    case: str
+    layer: str
+    baseline_s: float
+    current_s: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current_s / self.baseline_s
+
+
+def compare_results(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10,
+    metric: str = "mean_s", min_seconds: float = 1e-5
+) -> List[Regression]:
+    """
+    (case, layer) pairs present in both runs whose metric grew by more than
+    threshold (0.10 = 10 %). Layers faster than min_seconds in the baseline
+    are ignored as timer noise.
+    """
+    before = {case["case"]: case["layers"] for case in baseline["cases"]}
+    regressions = []
+    for case in current["cases"]:
+        for layer, stats in case["layers"].items():
+            old = before.get(case["case"], {}).get(layer, {}).get(metric)
+            new = stats.get(metric)
+            if old is None or new is None or old < min_seconds:
+                continue
+            if new > old * (1.0 + threshold):
+                regressions.append(Regression(case["case"], layer, old, new))
+    return regressions
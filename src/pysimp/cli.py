@@ -0,0 +1,359 @@
+"""
+`pysimp` command line.
+
+    pysimp score TRACES --template T.yaml --output reports.ndjson [--workers 4]
+        [--chunk-size 256] [--format ndjson|columnar] [--resume] [--validate]
+
+TRACES is an NDJSON file (one SurgicalTrace per line) or a directory of
+*.json (one trace each) and *.ndjson / *.jsonl files.
+
+    pysimp bench run --surgits 10 1000 --concurrency 1 4 --cohorts 1 100000 -o bench.json
+    pysimp bench compare baseline.json bench.json --threshold 0.1
+
+`bench compare` exits 1 when any layer regressed past the threshold.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import orjson
+
+SHAPLEY_COLUMNS = ("score_ideal", "phi_intrinsic", "phi_patient", "phi_external", "phi_decision")
+
+# Per-process scoring state: (template path, validate) -> (template, Layer B adapter)
+_WORKER_STATE: Dict[Tuple[str, bool], Any] = {}
+
+
+def iter_trace_lines(source: Path) -> Iterator[bytes]:
+    """
+    Raw JSON of every trace under source, in a stable order.
+    """
+    if source.is_dir():
+        for path in sorted(source.iterdir()):
+            if path.suffix == ".json":
+                yield path.read_bytes()
+            elif path.suffix in (".ndjson", ".jsonl"):
+                yield from iter_trace_lines(path)
+        return
+    with open(source, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def _scoring_state(template_path: str, validate: bool):
+    """
+    Template and Layer B adapter, loaded once per worker process.
+    """
+    state = _WORKER_STATE.get((template_path, validate))
+    if state is None:
+        from pysimp.infrastructure.persistence.yaml_loader import YamlTemplateLoader
+        layer_b = None
+        if validate:
+            from pysimp.infrastructure.adapters.snakes_adapter import SnakesLayerBAdapter
+            layer_b = SnakesLayerBAdapter()
+        state = _WORKER_STATE[(template_path, validate)] = (YamlTemplateLoader.load(template_path), layer_b)
+    return state
+
+
+def _summary_row(report: Any) -> Dict[str, Any]:
+    row: Dict[str, Any] = {"trace_id": report.trace_id, "error": None}
+    row.update(report.GlobalMetrics)
+    decomposition = report.ShapleyDecomposition
+    row.update((name, getattr(decomposition, name)) for name in SHAPLEY_COLUMNS)
+    row.update((f"pcp:{p.complication_type}", p.p_k_sim) for p in report.PCPTable)
+    return row
+
+
+def score_chunk(template_path: str, lines: List[bytes], output_format: str,
+                validate: bool = False, hierarchical_attribution: bool = False, detail: str = "full",
+                trace_budget: Optional[int] = None, downgrade: bool = False) -> List[Dict[str, Any]]:
+    """
+    Scores one chunk of raw trace JSON. ndjson rows carry the report at
+    `detail`, columnar rows only the summary columns. With trace_budget, each
+    trace is planned with plan_detail (downgraded reports are tagged with
+    report_detail). Failures become error rows.
+    """
+    from pysimp.application.use_cases.batch_scoring import plan_detail
+    from pysimp.application.use_cases.run_simulation import RunSimulation
+    from pysimp.domain.entities.trace import SurgicalTrace
+    from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+    template, layer_b = _scoring_state(template_path, validate)
+    repo = InMemoryTraceRepository()
+    simulation = RunSimulation(repo, layer_b_adapter=layer_b)
+    rows = []
+    for line in lines:
+        trace_id = None
+        try:
+            trace = SurgicalTrace.model_validate_json(line)
+            trace_id = trace.procedure_id
+            level = detail
+            if trace_budget is not None:
+                level = plan_detail(len(trace.events), trace_budget, detail, downgrade, hierarchical_attribution)
+            repo.save_trace(trace)
+            report = simulation.execute(
+                trace_id, template=template, hierarchical_attribution=hierarchical_attribution,
+                lazy=output_format == "columnar", detail=level
+            )
+            if output_format == "columnar":
+                rows.append(_summary_row(report))
+            else:
+                payload = report.model_dump(mode="json")
+                if level != detail:
+                    payload["report_detail"] = level
+                rows.append({"trace_id": trace_id, "report": payload})
+        except Exception as exc:
+            rows.append({"trace_id": trace_id, "error": f"{type(exc).__name__}: {exc}"})
+    return rows
+
+
+def _write(out, rows: List[Dict[str, Any]], output_format: str) -> None:
+    if output_format == "ndjson":
+        out.write(b"".join(orjson.dumps(row.get("report") or row) + b"\n" for row in rows))
+    else:
+        names: List[str] = []
+        for row in rows:
+            names.extend(k for k in row if k not in names)
+        out.write(orjson.dumps({name: [row.get(name) for row in rows] for name in names}) + b"\n")
+    out.flush()
+
+
+def completed_trace_ids(output: Path, output_format: str) -> Set[str]:
+    """
+    Trace IDs already present in output. A torn last line (interrupted
+    write) is truncated away so that appending resumes cleanly.
+    """
+    done: Set[str] = set()
+    if not output.exists():
+        return done
+    valid_size = 0
+    with open(output, "rb") as f:
+        for line in f:
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            valid_size += len(line)
+            if output_format == "ndjson":
+                done.add(record["trace_id"])
+            else:
+                done.update(record["trace_id"])
+    if valid_size < output.stat().st_size:
+        os.truncate(output, valid_size)
+    done.discard(None)
+    return done
+
+
+def _chunks(lines: Iterator[bytes], size: int, skip: Set[str]) -> Iterator[List[bytes]]:
+    chunk: List[bytes] = []
+    for line in lines:
+        if skip and orjson.loads(line).get("procedure_id") in skip:
+            continue
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _Progress:
+    def __init__(self, interval: float, stream=None):
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.start = self.last = time.perf_counter()
+        self.done = self.errors = 0
+
+    def update(self, rows: List[Dict[str, Any]], final: bool = False) -> None:
+        self.done += len(rows)
+        self.errors += sum(1 for r in rows if r.get("error"))
+        now = time.perf_counter()
+        if self.interval >= 0 and (final or now - self.last >= self.interval):
+            self.last = now
+            rate = self.done / max(now - self.start, 1e-9)
+            self.stream.write(f"{'done' if final else 'progress'}: {self.done} traces, "
+                              f"{self.errors} errors, {rate:.1f} traces/s\n")
+            self.stream.flush()
+
+
+def chunk_cost(lines: List[bytes], detail: str, trace_budget: int, downgrade: bool,
+               hierarchical_attribution: bool = False) -> int:
+    """
+    Estimated worker + parent bytes of a chunk until its rows are written.
+    Event counts come from the raw JSON (one "surgit_id" key per event).
+    """
+    from pysimp.application.use_cases.batch_scoring import (
+        MemoryBudgetExceeded, estimate_report_bytes, estimate_trace_bytes, plan_detail
+    )
+    cost = 0
+    for line in lines:
+        n_events = line.count(b'"surgit_id"')
+        try:
+            level = plan_detail(n_events, trace_budget, detail, downgrade, hierarchical_attribution)
+        except MemoryBudgetExceeded:
+            cost += len(line)  # becomes an error row
+            continue
+        cost += len(line) + estimate_trace_bytes(n_events) + estimate_report_bytes(
+            n_events, level, hierarchical_attribution
+        )
+    return cost
+
+
+def run_score(args: argparse.Namespace) -> int:
+    output = Path(args.output)
+    skip = completed_trace_ids(output, args.format) if args.resume else set()
+    progress = _Progress(-1 if args.quiet else args.progress_interval)
+    chunks = _chunks(iter_trace_lines(Path(args.traces)), args.chunk_size, skip)
+    detail = "summary" if args.format == "columnar" else args.detail
+    budget = trace_budget = None
+    if args.memory_budget:
+        from pysimp.application.use_cases.batch_scoring import MemoryBudget
+        budget = MemoryBudget(args.memory_budget)
+        # Every worker may hold its largest trace at once
+        trace_budget = args.memory_budget // max(1, args.workers)
+    options = (args.format, args.validate, args.hierarchical_attribution, detail, trace_budget, args.downgrade)
+
+    def cost_of(chunk: List[bytes]) -> int:
+        if budget is None:
+            return 0
+        return chunk_cost(chunk, detail, trace_budget, args.downgrade, args.hierarchical_attribution)
+
+    def finish(rows: List[Dict[str, Any]], cost: int) -> None:
+        _write(out, rows, args.format)
+        progress.update(rows)
+        if budget is not None:
+            budget.release(cost)
+
+    with open(output, "ab" if args.resume else "wb") as out:
+        if args.workers <= 1:
+            for chunk in chunks:
+                finish(score_chunk(str(args.template), chunk, *options), 0)
+        else:
+            # Intake waits while 2 chunks per worker or the memory budget are in flight;
+            # results are written (and their bytes released) in input order
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                pending: deque = deque()
+                for chunk in chunks:
+                    cost = cost_of(chunk)
+                    while pending and (len(pending) >= 2 * args.workers or (budget and not budget.fits(cost))):
+                        future, done_cost = pending.popleft()
+                        finish(future.result(), done_cost)
+                    if budget is not None:
+                        budget.reserve(cost)
+                    pending.append((pool.submit(score_chunk, str(args.template), chunk, *options), cost))
+                while pending:
+                    future, done_cost = pending.popleft()
+                    finish(future.result(), done_cost)
+    progress.update([], final=True)
+    if budget is not None and not args.quiet:
+        sys.stderr.write(f"peak estimated in-flight bytes: {budget.peak}\n")
+    return 1 if progress.errors and args.fail_on_error else 0
+
+
+def parse_bytes(value: str) -> int:
+    """
+    "512M", "2G", "1500000" -> bytes (binary multiples).
+    """
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def run_bench(args: argparse.Namespace) -> int:
+    from pysimp.benchmarks.runner import BenchmarkConfig, run_benchmarks, save_results
+    config = BenchmarkConfig(
+        surgits=tuple(args.surgits), concurrency=tuple(args.concurrency), cohorts=tuple(args.cohorts),
+        surgits_per_step=args.surgits_per_step, trace_sample=args.trace_sample, repeat=args.repeat,
+        seed=args.seed, **({"layers": tuple(args.layers)} if args.layers else {})
+    )
+
+    def progress(case):
+        if not args.quiet:
+            means = ", ".join(f"{name} {stats['mean_s'] * 1e3:.3f}ms" for name, stats in case["layers"].items() if stats["n"])
+            sys.stderr.write(f"{case['case']}: {means}\n")
+
+    save_results(run_benchmarks(config, progress=progress), args.output)
+    return 0
+
+
+def run_compare(args: argparse.Namespace) -> int:
+    from pysimp.benchmarks.runner import compare_results, load_results
+    regressions = compare_results(
+        load_results(args.baseline), load_results(args.current), args.threshold, args.metric, args.min_seconds
+    )
+    for r in regressions:
+        print(f"REGRESSION {r.case} {r.layer}: {r.baseline_s:.6f}s -> {r.current_s:.6f}s (x{r.ratio:.2f})")
+    if not regressions:
+        print(f"No regressions above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="pysimp", description="SIM-P Core command line tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    score = commands.add_parser("score", help="Score a directory or NDJSON file of traces against a template")
+    score.add_argument("traces", help="NDJSON file or directory of .json/.ndjson trace files")
+    score.add_argument("--template", "-t", required=True, help="Normative template YAML")
+    score.add_argument("--output", "-o", required=True, help="Output file (one JSON document per line)")
+    score.add_argument("--format", choices=("ndjson", "columnar"), default="ndjson",
+                       help="ndjson: one full report per line; columnar: summary columns per chunk")
+    score.add_argument("--workers", "-w", type=int, default=1, help="Worker processes")
+    score.add_argument("--chunk-size", type=int, default=256, help="Traces per work unit / columnar row group")
+    score.add_argument("--resume", action="store_true", help="Append to output, skipping traces already scored")
+    score.add_argument("--validate", action="store_true", help="Validate each trace against Layer B first")
+    score.add_argument("--hierarchical-attribution", action="store_true",
+                       help="Include Step/Surgit Owen attribution tables (ndjson)")
+    score.add_argument("--detail", choices=("full", "tables", "summary"), default="full",
+                       help="Report tables to keep (ndjson): tables drops Traceability, summary drops all")
+    score.add_argument("--memory-budget", type=parse_bytes, default=None,
+                       help="Estimated bytes of traces and reports in flight, e.g. 2G; throttles intake")
+    score.add_argument("--downgrade", action="store_true",
+                       help="Lower the report detail of traces too large for the budget instead of failing them")
+    score.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines")
+    score.add_argument("--quiet", "-q", action="store_true", help="No progress output")
+    score.add_argument("--fail-on-error", action="store_true", help="Exit 1 if any trace failed")
+    score.set_defaults(handler=run_score)
+
+    bench = commands.add_parser("bench", help="Layer-by-layer performance benchmarks").add_subparsers(
+        dest="bench_command", required=True
+    )
+    run = bench.add_parser("run", help="Run the benchmark grid and write a JSON result")
+    run.add_argument("--surgits", type=int, nargs="+", default=[10, 100, 1000], help="Template sizes")
+    run.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="Parallel branches per step")
+    run.add_argument("--cohorts", type=int, nargs="+", default=[1, 1000, 100_000], help="Cohort sizes")
+    run.add_argument("--surgits-per-step", type=int, default=10)
+    run.add_argument("--trace-sample", type=int, default=50, help="Traces timed by the per-trace layers")
+    run.add_argument("--repeat", type=int, default=3, help="YAML load repetitions")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--layers", nargs="+", help="Subset of layers to time (default: all)")
+    run.add_argument("--output", "-o", required=True, help="Result JSON file")
+    run.add_argument("--quiet", "-q", action="store_true")
+    run.set_defaults(handler=run_bench)
+
+    compare = bench.add_parser("compare", help="Fail when a layer regressed against a baseline result")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown (0.10 = 10%%)")
+    compare.add_argument("--metric", default="mean_s", choices=("mean_s", "p50_s", "p95_s", "min_s", "total_s"))
+    compare.add_argument("--min-seconds", type=float, default=1e-5, help="Ignore layers faster than this")
+    compare.set_defaults(handler=run_compare)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,6 @@
 
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Dict, Optional, Any
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr
+from typing import List, Dict, Optional, Any, Callable
 from .trace import PostoperativeOutcome
 
 class StepMetric(BaseModel):
@@ -48,6 +48,7 @@ class TraceabilityEntry(BaseModel):
     step_id: str
     clinical_state_burden: float
     provenance_vector: List[float]
+    clinical_state: Optional[Dict[str, float]] = Field(None, description="Declared Layer C components X_t")
 
 class ShapleyDecomposition(BaseModel):
     """
@@ -60,6 +61,23 @@ class ShapleyDecomposition(BaseModel):
     phi_external: float
     phi_decision: float
     
+class StepAttribution(BaseModel):
+    """
+    Hierarchical (Owen) attribution of Score_SIM to a Step.
+    """
+    step_id: str
+    phi: float = Field(..., description="Step share of Score_SIM")
+    std_error: Optional[float] = Field(None, description="Monte Carlo standard error (None if exact)")
+
+class SurgitAttribution(BaseModel):
+    """
+    Hierarchical (Owen) attribution of Score_SIM to a Surgit within its Step.
+    """
+    step_id: str
+    surgit_id: str
+    phi: float = Field(..., description="Surgit share of Score_SIM")
+    std_error: Optional[float] = Field(None, description="Monte Carlo standard error (None if exact)")
+
 class SimulationReport(BaseModel):
     """
     Annex III: SIM Final Report (Standard Output)
@@ -81,6 +99,90 @@ class SimulationReport(BaseModel):
     # A.III.4 Decomposition
     ShapleyDecomposition: ShapleyDecomposition
     
+    # Optional Step -> Surgit attribution (Owen values), sums to Score_SIM
+    StepAttributionTable: Optional[List[StepAttribution]] = None
+    SurgitAttributionTable: Optional[List[SurgitAttribution]] = None
+    
     # Validation Status
     validation_status: str = "VALID"
     validation_message: str = "Structure Valid"
+
+
+# Tables the engine can defer until first access
+LAZY_TABLES = ("StepTable", "NoiseTable", "CETable", "Traceability")
+
+# Report detail levels, richest first: the tables each one fills (others stay empty).
+# Traceability holds one provenance vector per event, i.e. O(events^2) floats.
+REPORT_DETAILS = {
+    "full": LAZY_TABLES,
+    "tables": ("StepTable", "NoiseTable", "CETable"),
+    "summary": (),
+}
+
+class LazySimulationReport(SimulationReport):
+    """
+    SimulationReport whose A.III.1/A.III.2 tables are built from the engine's
+    arrays on first access. Reading GlobalMetrics never materializes a row;
+    dumping, comparing, copying or pickling materializes every table first.
+    """
+    _builders: Dict[str, Callable[[], list]] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def from_builders(cls, builders: Dict[str, Callable[[], list]], **values: Any) -> "LazySimulationReport":
+        """
+        values: every non-table field (already computed by the engine).
+        builders: table name -> zero-argument callable returning its rows.
+        """
+        report = cls.model_construct(**values)
+        report._builders = dict(builders)
+        # The tables count as set, like the eager constructor's keyword arguments
+        report.__pydantic_fields_set__.update(builders)
+        return report
+
+    def __getattr__(self, name: str) -> Any:
+        if name in LAZY_TABLES:
+            builder = self.__pydantic_private__['_builders'].get(name)
+            if builder is not None:
+                self.__dict__.setdefault(name, builder())
+                self.__pydantic_private__['_builders'].pop(name, None)
+            return self.__dict__[name]
+        return super().__getattr__(name)
+
+    @property
+    def is_materialized(self) -> bool:
+        return not self._builders
+
+    def materialize(self) -> "LazySimulationReport":
+        if self._builders or list(self.__dict__) != list(SimulationReport.model_fields):
+            for name in LAZY_TABLES:
+                getattr(self, name)
+            # Restore declaration order so dumps match an eagerly built report
+            ordered = {name: self.__dict__[name] for name in SimulationReport.model_fields}
+            object.__setattr__(self, '__dict__', ordered)
+        return self
+
+    def model_dump(self, **kwargs) -> Dict[str, Any]:
+        return super(LazySimulationReport, self.materialize()).model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs) -> str:
+        return super(LazySimulationReport, self.materialize()).model_dump_json(**kwargs)
+
+    def model_copy(self, **kwargs) -> "LazySimulationReport":
+        return super(LazySimulationReport, self.materialize()).model_copy(**kwargs)
+
+    def __eq__(self, other: Any) -> bool:
+        """
+        Equal to any SimulationReport (lazy or eager) with the same field values.
+        """
+        if not isinstance(other, SimulationReport):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in SimulationReport.model_fields)
+
+    def __iter__(self):
+        return super(LazySimulationReport, self.materialize()).__iter__()
+
+    def __repr_args__(self):
+        return super(LazySimulationReport, self.materialize()).__repr_args__()
+
+    def __getstate__(self) -> Dict[Any, Any]:
+        return super(LazySimulationReport, self.materialize()).__getstate__()
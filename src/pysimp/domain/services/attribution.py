@@ -0,0 +1,64 @@
+
+import numpy as np
+from typing import List, Dict, Tuple
+
+from .layer_d import LayerD
+
+
+class SurgitAttributionGame:
+    """
+    Characteristic function v(S) over the surgits of a scored trace, grouped by
+    Step for hierarchical (Owen) attribution.
+    v(S) = Score_SIM when only the surgits in S keep their final deviation; the
+    others are scored with delta_final = 0 (mitigation is left unchanged).
+    Hence v(empty) = 0 and v(all surgits) = Score_SIM, so attributions split the
+    score exactly.
+    Instances are picklable and vectorized: calling one with a (batch, n) boolean
+    membership matrix (columns ordered as `elements`) scores every row at once;
+    `evaluations` counts the coalitions scored so far.
+    """
+
+    def __init__(
+        self,
+        event_deviations: List[Tuple[str, str, float]],
+        step_weights: Dict[str, float],
+        q: float,
+        alpha: float = 1.0,
+        beta: float = 1.0
+    ):
+        """
+        event_deviations: (surgit_id, step_id, delta_final) per scored event, in trace order.
+        """
+        self.q = q
+        self.alpha = alpha
+        self.beta = beta
+
+        self.groups: Dict[str, List[str]] = {}
+        for surgit_id, step_id, _ in event_deviations:
+            members = self.groups.setdefault(step_id, [])
+            if surgit_id not in members:
+                members.append(surgit_id)
+        self.elements = [s for members in self.groups.values() for s in members]
+        player_index = {s: i for i, s in enumerate(self.elements)}
+        step_index = {s: t for t, s in enumerate(self.groups)}
+
+        # Events sorted by step so per-step products are one reduceat
+        order = sorted(range(len(event_deviations)), key=lambda i: step_index[event_deviations[i][1]])
+        self._players = np.array([player_index[event_deviations[i][0]] for i in order], dtype=np.int64)
+        self._survival = np.array([1.0 - event_deviations[i][2] for i in order])
+        steps_sorted = np.array([step_index[event_deviations[i][1]] for i in order], dtype=np.int64)
+        self._step_starts = np.searchsorted(steps_sorted, np.arange(len(self.groups)))
+        self._weights = np.array([step_weights.get(s, 1.0) for s in self.groups])
+        self.evaluations = 0
+
+    def __call__(self, membership: np.ndarray) -> np.ndarray:
+        membership = np.asarray(membership, dtype=bool)
+        self.evaluations += len(membership)
+        if not self.groups:
+            return np.zeros(len(membership))
+        factors = np.where(membership[:, self._players], self._survival[None, :], 1.0)
+        pi_t = np.multiply.reduceat(factors, self._step_starts, axis=1)
+        s_q_t = LayerD.calculate_step_entropy_array(pi_t, self.q)
+        s_q_sim = LayerD.calculate_global_entropy_array(s_q_t, self.q)
+        rho_sim = (1.0 - pi_t) @ self._weights
+        return LayerD.calculate_global_score(rho_sim, s_q_sim, self.alpha, self.beta)
@@ -0,0 +1,193 @@
+
+import warnings
+
+import numpy as np
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+
+from ..entities.report import SimulationReport
+from ..entities.template import NormativeTemplate
+from ..entities.trace import SurgicalTrace
+
+# (features, outcomes) mini-batch: X is (n, 2 + T), Y is (n, K) in {0, 1}
+Batch = Tuple[np.ndarray, np.ndarray]
+
+
+class CalibrationConvergenceWarning(RuntimeWarning):
+    """
+    IRLS stopped at max_iter without converging (e.g. separable outcomes).
+    """
+
+
+class LayerECalibrator:
+    """
+    Fits the SIM-PCP bridge coefficients (E4) from observed outcomes (A.II.1b).
+    Per complication k: logit P_k = alpha_k + beta_k_delta * Delta_SIM
+                                  + beta_k_s * S_q(SIM) + sum_t gamma_k_t * delta_t
+    All K models are fitted jointly by IRLS (Newton) with a small ridge penalty on
+    the slopes. Each iteration is one pass over the data that only accumulates the
+    (K, p, p) Hessians and (K, p) gradients, so the same fitter runs on an in-memory
+    matrix or on a stream of mini-batches re-read every iteration.
+    """
+
+    @staticmethod
+    def feature_names(step_ids: List[str]) -> List[str]:
+        return ["Delta_SIM", "S_q(SIM)"] + [f"delta_{s}" for s in step_ids]
+
+    @staticmethod
+    def feature_matrix(reports: Iterable[SimulationReport], step_ids: List[str]) -> np.ndarray:
+        """
+        Rows: [Delta_SIM, S_q(SIM), delta_t for t in step_ids] per report.
+        Delta_SIM uses rho_SIM, as RunSimulation does for the bridge; steps that a
+        trace never executed contribute delta_t = 0.
+        """
+        column = {s: 2 + i for i, s in enumerate(step_ids)}
+        rows = []
+        for report in reports:
+            row = np.zeros(2 + len(step_ids))
+            row[0] = report.GlobalMetrics["rho_SIM"]
+            row[1] = report.GlobalMetrics["S_q(SIM)"]
+            for step in report.StepTable:
+                if step.step_id in column:
+                    row[column[step.step_id]] = step.delta_t
+            rows.append(row)
+        return np.array(rows).reshape(len(rows), 2 + len(step_ids))
+
+    @staticmethod
+    def outcome_matrix(
+        traces: Iterable[SurgicalTrace],
+        complications: List[str],
+        time_window: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        (n, K) indicator of complication k observed in each trace's outcomes,
+        optionally restricted to one time window (e.g. '30-day').
+        """
+        index = {k: i for i, k in enumerate(complications)}
+        rows = []
+        for trace in traces:
+            row = np.zeros(len(complications))
+            for outcome in trace.outcomes:
+                if outcome.complication_type in index and (
+                    time_window is None or outcome.time_window == time_window
+                ):
+                    row[index[outcome.complication_type]] = 1.0
+            rows.append(row)
+        return np.array(rows).reshape(len(rows), len(complications))
+
+    @staticmethod
+    def fit_streaming(
+        batches: Callable[[], Iterable[Batch]],
+        l2: float = 1e-4,
+        max_iter: int = 50,
+        tol: float = 1e-8
+    ) -> np.ndarray:
+        """
+        IRLS over a re-iterable source of (X, Y) mini-batches.
+        batches() must yield the same cohort on every call (e.g. re-open a file).
+        Returns a (K, 1 + p) coefficient matrix [intercept, slopes...].
+        Warns with CalibrationConvergenceWarning when max_iter is reached
+        first; raises ValueError if the iterates diverge to non-finite values.
+        """
+        coef = None
+        penalty = None
+        for _ in range(max_iter):
+            hessian, gradient = None, None
+            for X, Y in batches():
+                X = np.asarray(X, dtype=float)
+                Y = np.asarray(Y, dtype=float)
+                design = np.hstack([np.ones((len(X), 1)), X])
+                if coef is None:
+                    p, K = design.shape[1], Y.shape[1]
+                    coef = np.zeros((K, p))
+                    penalty = l2 * np.eye(p)
+                    penalty[0, 0] = 0.0
+                if hessian is None:
+                    hessian = np.zeros((coef.shape[0], coef.shape[1], coef.shape[1]))
+                    gradient = np.zeros_like(coef)
+
+                prob = 1.0 / (1.0 + np.exp(-np.clip(design @ coef.T, -60, 60)))  # (n, K)
+                weight = prob * (1.0 - prob)
+                hessian += np.einsum('ni,nk,nj->kij', design, weight, design)
+                gradient += (Y - prob).T @ design
+
+            if coef is None:
+                raise ValueError("Calibration requires at least one non-empty batch")
+
+            gradient -= coef @ penalty
+            step = np.linalg.solve(hessian + penalty[None, :, :], gradient[:, :, None])[:, :, 0]
+            coef = coef + step
+            if not np.all(np.isfinite(coef)):
+                raise ValueError("Calibration diverged (non-finite coefficients)")
+            if np.max(np.abs(step)) < tol:
+                break
+        else:
+            warnings.warn(
+                f"IRLS did not converge in {max_iter} iterations (last step {np.max(np.abs(step)):.3g}); "
+                "outcomes may be separable or max_iter too small",
+                CalibrationConvergenceWarning, stacklevel=2
+            )
+        return coef
+
+    @staticmethod
+    def fit(X: np.ndarray, Y: np.ndarray, l2: float = 1e-4, max_iter: int = 50, tol: float = 1e-8) -> np.ndarray:
+        """
+        In-memory IRLS; see fit_streaming.
+        """
+        return LayerECalibrator.fit_streaming(lambda: [(X, Y)], l2=l2, max_iter=max_iter, tol=tol)
+
+    @staticmethod
+    def calibrated_template(
+        template: NormativeTemplate,
+        coefficients: np.ndarray,
+        complications: List[str],
+        step_ids: List[str],
+        version: str
+    ) -> NormativeTemplate:
+        """
+        A.I.2: publishes the fitted coefficients as a new frozen template version.
+        xi_k_t is published as 0: the fitted features are [Delta_SIM, S_q, delta_t]
+        and rho_t == delta_t in this engine, so gamma_k_t already absorbs the
+        xi_k_t * rho_t term of E4 and keeping xi would count it twice.
+        """
+        if version == template.version:
+            raise ValueError("A calibrated template must carry a new version")
+
+        calibration: Dict[str, Any] = dict(template.calibration_coefficients)
+        for k, row in zip(complications, coefficients):
+            calibration[k] = {
+                'alpha_k': float(row[0]),
+                'beta_k_delta': float(row[1]),
+                'beta_k_s': float(row[2]),
+                'gamma_k_t': {s: float(c) for s, c in zip(step_ids, row[3:])},
+                'xi_k_t': {s: 0.0 for s in step_ids},
+            }
+
+        complication_set = list(template.complication_set_k)
+        complication_set += [k for k in complications if k not in complication_set]
+        return template.model_copy(update={
+            'version': version,
+            'calibration_coefficients': calibration,
+            'complication_set_k': complication_set,
+        })
+
+    @staticmethod
+    def calibrate(
+        template: NormativeTemplate,
+        reports: List[SimulationReport],
+        traces: List[SurgicalTrace],
+        version: str,
+        time_window: Optional[str] = None,
+        l2: float = 1e-4
+    ) -> NormativeTemplate:
+        """
+        Convenience: features from batch scoring output, labels from trace outcomes,
+        one fit for every k in complication_set_k, new template version.
+        """
+        if version == template.version:
+            raise ValueError("A calibrated template must carry a new version")
+        step_ids = list(template.steps)
+        complications = list(template.complication_set_k)
+        X = LayerECalibrator.feature_matrix(reports, step_ids)
+        Y = LayerECalibrator.outcome_matrix(traces, complications, time_window)
+        coefficients = LayerECalibrator.fit(X, Y, l2=l2)
+        return LayerECalibrator.calibrated_template(template, coefficients, complications, step_ids, version)
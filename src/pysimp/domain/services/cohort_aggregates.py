@@ -0,0 +1,263 @@
+
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Report metrics aggregated at trace level (step_id None)
+GLOBAL_METRICS = ("Score_SIM", "rho_SIM", "S_q(SIM)")
+SHAPLEY_METRICS = ("score_ideal", "phi_intrinsic", "phi_patient", "phi_external", "phi_decision")
+# StepTable columns aggregated per step
+STEP_METRICS = ("pi_t", "delta_t", "s_q_t", "rho_t")
+PCP_PREFIX = "pcp:"
+
+
+@dataclass
+class MomentSketch:
+    """
+    Count, mean, variance (M2), min and max. Batches and partial sketches are
+    combined with the pairwise update of Chan et al., so merging is exact up
+    to floating point rounding.
+    """
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    minimum: float = np.inf
+    maximum: float = -np.inf
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=float).ravel()
+        if len(values):
+            mean = float(values.mean())
+            self._combine(len(values), mean, float(((values - mean) ** 2).sum()),
+                          float(values.min()), float(values.max()))
+
+    def merge(self, other: "MomentSketch") -> None:
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.minimum, other.maximum)
+
+    def _combine(self, count: int, mean: float, m2: float, minimum: float, maximum: float) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+
+    @property
+    def variance(self) -> float:
+        """
+        Sample variance (0 for fewer than two values).
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+
+@dataclass
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty 2016). Level h holds items of
+    weight 2^h; a level over capacity k*(2/3)^depth is sorted and every other
+    item (random offset) is promoted. Memory stays O(k) whatever the stream
+    length and rank error is O(1/k) w.h.p., also after merges.
+    """
+    k: int = 200
+    seed: Optional[int] = None
+    n: int = 0
+    levels: List[np.ndarray] = field(default_factory=lambda: [np.zeros(0)])
+    _rng: Any = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self._rng is None:
+            self._rng = np.random.default_rng(self.seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.zeros(0))
+                items = np.sort(items)
+                keep = items[len(items) - len(items) % 2:]
+                promoted = items[:len(items) - len(keep)][int(self._rng.integers(2))::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=float).ravel()
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.n += len(values)
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.zeros(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+
+    @property
+    def size(self) -> int:
+        """
+        Items currently retained.
+        """
+        return sum(len(items) for items in self.levels)
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        qs = np.asarray(qs, dtype=float)
+        if not self.n:
+            return np.full(qs.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_h), 2.0 ** h) for h, items_h in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, qs * cumulative[-1], side="left")
+        return items[order][np.minimum(index, len(items) - 1)]
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles([q])[0])
+
+
+@dataclass
+class MetricSummary:
+    """
+    Moments and quantile sketch of one metric. Single values are buffered and
+    flushed in blocks so per-report updates stay cheap.
+    """
+    sketch_k: int = 200
+    seed: Optional[int] = None
+    buffer_size: int = 256
+    moments: MomentSketch = field(default_factory=MomentSketch)
+    sketch: KLLSketch = None
+    _buffer: List[float] = field(default_factory=list, repr=False)
+
+    def __post_init__(self):
+        if self.sketch is None:
+            self.sketch = KLLSketch(k=self.sketch_k, seed=self.seed)
+
+    def add(self, value: float) -> None:
+        self._buffer.append(float(value))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def update(self, values: np.ndarray) -> None:
+        self.flush()
+        self.moments.update(values)
+        self.sketch.update(values)
+
+    def flush(self) -> None:
+        if self._buffer:
+            values = np.array(self._buffer)
+            self._buffer.clear()
+            self.moments.update(values)
+            self.sketch.update(values)
+
+    def merge(self, other: "MetricSummary") -> None:
+        self.flush()
+        other.flush()
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+
+
+class CohortAggregator:
+    """
+    Streaming cohort statistics keyed by (template version, step_id, metric);
+    step_id is None for trace-level metrics. Consumes SimulationReports or
+    CompiledTemplate kernel arrays one batch at a time, so memory depends on
+    the number of keys, not on the cohort size. Aggregators built on different
+    workers combine with merge().
+    """
+
+    def __init__(self, sketch_k: int = 200, seed: Optional[int] = None, quantiles: Sequence[float] = (0.05, 0.5, 0.95)):
+        self.sketch_k = sketch_k
+        self.quantile_levels = tuple(quantiles)
+        self._seed = np.random.SeedSequence(seed)
+        self._metrics: Dict[Tuple[str, Optional[str], str], MetricSummary] = {}
+
+    def _summary(self, key: Tuple[str, Optional[str], str]) -> MetricSummary:
+        summary = self._metrics.get(key)
+        if summary is None:
+            seed = int(self._seed.spawn(1)[0].generate_state(1)[0])
+            summary = self._metrics[key] = MetricSummary(sketch_k=self.sketch_k, seed=seed)
+        return summary
+
+    def add_report(self, report: Any, template_version: str) -> None:
+        """
+        Global metrics, Shapley factors, PCP probabilities and StepTable rows of one report.
+        """
+        for name in GLOBAL_METRICS:
+            if name in report.GlobalMetrics:
+                self._summary((template_version, None, name)).add(report.GlobalMetrics[name])
+        decomposition = report.ShapleyDecomposition
+        for name in SHAPLEY_METRICS:
+            self._summary((template_version, None, name)).add(getattr(decomposition, name))
+        for row in report.PCPTable:
+            self._summary((template_version, None, PCP_PREFIX + row.complication_type)).add(row.p_k_sim)
+        for row in report.StepTable:
+            for name in STEP_METRICS:
+                self._summary((template_version, row.step_id, name)).add(getattr(row, name))
+
+    def add_reports(self, reports: Iterable[Any], template_version: str) -> None:
+        for report in reports:
+            self.add_report(report, template_version)
+
+    def add_kernel_result(self, result: Any, step_ids: Sequence[str], template_version: str) -> None:
+        """
+        A CompiledTemplate KernelResult batch; only executed steps are counted,
+        matching the StepTable of the equivalent reports.
+        """
+        for name, values in (("Score_SIM", result.score), ("rho_SIM", result.rho), ("S_q(SIM)", result.entropy)):
+            self._summary((template_version, None, name)).update(values)
+        step_values = {"pi_t": result.pi_t, "delta_t": result.delta_t, "s_q_t": result.s_q_t, "rho_t": result.delta_t}
+        for t, step_id in enumerate(step_ids):
+            executed = result.executed[:, t]
+            if executed.any():
+                for name in STEP_METRICS:
+                    self._summary((template_version, step_id, name)).update(step_values[name][executed, t])
+
+    def add_pcp(self, complications: Sequence[str], prob: np.ndarray, template_version: str) -> None:
+        """
+        (traces x K) probabilities from RunSimulation.pcp_matrix.
+        """
+        prob = np.asarray(prob, dtype=float)
+        for j, k in enumerate(complications):
+            self._summary((template_version, None, PCP_PREFIX + k)).update(prob[:, j])
+
+    def merge(self, other: "CohortAggregator") -> "CohortAggregator":
+        for key, summary in other._metrics.items():
+            self._summary(key).merge(summary)
+        return self
+
+    def keys(self) -> List[Tuple[str, Optional[str], str]]:
+        return list(self._metrics)
+
+    def get(self, template_version: str, metric: str, step_id: Optional[str] = None) -> Optional[MetricSummary]:
+        summary = self._metrics.get((template_version, step_id, metric))
+        if summary is not None:
+            summary.flush()
+        return summary
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        One row per key: count, mean, variance, min, max and the configured quantiles.
+        """
+        rows = []
+        for (version, step_id, metric), summary in self._metrics.items():
+            summary.flush()
+            m = summary.moments
+            row = {
+                "template_version": version, "step_id": step_id, "metric": metric,
+                "count": m.count, "mean": m.mean, "variance": m.variance,
+                "min": m.minimum, "max": m.maximum,
+            }
+            for q, value in zip(self.quantile_levels, summary.sketch.quantiles(self.quantile_levels)):
+                row[f"q{q:g}"] = float(value)
+            rows.append(row)
+        return rows
@@ -0,0 +1,260 @@
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .layer_c import CompiledDynamics
+from .layer_d import LayerD
+from .scoring_kernel import SCOPE_CODES, CompiledTemplate
+
+
+# Trace edits. Positions index the base trace's events (0-based).
+@dataclass(frozen=True)
+class RemoveEvent:
+    position: int
+
+
+@dataclass(frozen=True)
+class InsertEvent:
+    position: int  # inserted before base event `position`; len(events) appends
+    event: Any
+
+
+@dataclass(frozen=True)
+class ReplaceEvent:
+    position: int
+    event: Any
+
+
+@dataclass(frozen=True)
+class OverrideNoise:
+    position: int  # applies to the (possibly replaced) event at `position`
+    n_t: Optional[float] = None
+    e_t: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class OverrideSurgit:
+    surgit_id: str
+    intrinsic_deviation: Optional[float] = None
+    mitigation_factor: Optional[float] = None
+    security_scope: Optional[str] = None
+
+
+TraceEdit = Union[RemoveEvent, InsertEvent, ReplaceEvent, OverrideNoise, OverrideSurgit]
+
+
+@dataclass
+class CounterfactualResult:
+    """
+    Layer A/A'/C/D outputs of one what-if over the T template steps.
+    Steps the edited trace never executes have pi_t = 1.
+    """
+    score: float
+    rho: float
+    entropy: float
+    pi_t: np.ndarray            # (T,)
+    s_q_t: np.ndarray           # (T,)
+    executed: np.ndarray        # (T,) bool
+    clinical_state: np.ndarray  # (C,) X after the last position
+    base_score: float
+    resumed_at: int             # first affected base position (len(events) if none)
+    recomputed: int             # edited suffix length, in events
+
+    @property
+    def delta_score(self) -> float:
+        return self.score - self.base_score
+
+
+class CounterfactualEngine:
+    """
+    What-if re-scoring of one base trace. The base pass is run once and
+    checkpointed: residual mitigation carried into every position, the Layer C
+    state after every position, and the per-step products pi_t every `stride`
+    positions. A counterfactual resumes at its first affected position, so it
+    costs the edited suffix (plus at most stride - 1 cached factors) instead of
+    a full execute with its four passes and Layer B replay.
+    Scoring matches RunSimulation._run_single_pass on the edited trace/template.
+    """
+
+    def __init__(
+        self, events: Sequence[Any], kernel: CompiledTemplate, dynamics: CompiledDynamics, stride: int = 32
+    ):
+        if stride < 1:
+            raise ValueError("stride must be >= 1")
+        self.events = list(events)
+        self.kernel = kernel
+        self.dynamics = dynamics
+        self.stride = stride
+
+        codes, n_t, e_t, pause = self._encode(self.events)
+        self._codes, self._n_t, self._e_t, self._pause = codes, n_t, e_t, pause
+        params = (kernel.intrinsic_deviation, kernel.mitigation_factor, kernel.scope)
+        self._delta_final, self._carried = self._layer_a(codes, n_t, e_t, 1.0, params)
+
+        # Per-step products before positions 0, stride, 2*stride, ...
+        L, T = len(codes), len(kernel.step_ids)
+        valid = codes >= 0
+        self._steps = np.where(valid, kernel.surgit_step[np.where(valid, codes, 0)], -1)
+        blocks = np.ones((L // stride + 1, T))
+        np.multiply.at(blocks, (np.flatnonzero(valid) // stride, self._steps[valid]), 1.0 - self._delta_final[valid])
+        self._checkpoints = np.vstack([np.ones((1, T)), np.cumprod(blocks, axis=0)[:-1]])
+        self._first_seen = np.full(T, L)
+        np.minimum.at(self._first_seen, self._steps[valid], np.flatnonzero(valid))
+
+        # Layer C: positions are scored events and pauses; _positions[k] = positions before event k
+        self._positions = np.concatenate([[0], np.cumsum(valid | pause)])
+        self._states = self._layer_c(codes, self._delta_final, n_t, e_t, pause, None)
+        self.base: Optional[CounterfactualResult] = None
+        self.base = self.evaluate(())
+
+    def _encode(self, events: List[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        codes, n_t, e_t = self.kernel.encode_events(events)
+        pause = np.array([bool(getattr(e, 'is_pause', False)) for e in events], dtype=bool)
+        return codes, n_t, e_t, pause
+
+    @staticmethod
+    def _layer_a(codes, n_t, e_t, carry, params) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Eq 5 and A' for one event run starting with residual mitigation `carry`.
+        Returns delta_final (L,) and the residual carried into each position (L+1,).
+        """
+        intrinsic, mitigation, scope = params
+        valid = codes >= 0
+        if np.any(valid & ((n_t < 1.0) | (e_t < 1.0))):
+            raise ValueError("Noise factors n_t and e_t must be >= 1.0")
+        idx = np.where(valid, codes, 0)
+        delta_tot = 1.0 - (1.0 - intrinsic[idx]) ** (n_t * e_t)
+        residual = np.where(valid & (scope[idx] == SCOPE_CODES["res"]), mitigation[idx], 1.0)
+        carried = carry * np.concatenate([[1.0], np.cumprod(residual)])
+        own = np.where(valid & (scope[idx] != SCOPE_CODES["pcp"]), mitigation[idx], 1.0)
+        return np.where(valid, carried[:-1] * own * delta_tot, 0.0), carried
+
+    def _layer_c(self, codes, delta_final, n_t, e_t, pause, initial) -> np.ndarray:
+        """
+        C6 states after each Layer C position of an event run (unknown surgits are skipped).
+        """
+        at = (codes >= 0) | pause
+        if not at.any():
+            return np.empty((0, len(self.dynamics.components)))
+        n_t, e_t = np.where(pause, 1.0, n_t), np.where(pause, 1.0, e_t)
+        return self.dynamics.run(delta_final[at], n_t[at], e_t[at], pause[at], initial)
+
+    def _parameters(self, overrides: List[OverrideSurgit]) -> Tuple[Tuple[np.ndarray, ...], int]:
+        """
+        Surgit parameter arrays with overrides applied, and the first base
+        position that scores an overridden surgit.
+        """
+        kernel = self.kernel
+        params = (kernel.intrinsic_deviation, kernel.mitigation_factor, kernel.scope)
+        if not overrides:
+            return params, len(self.events)
+        intrinsic, mitigation, scope = (a.copy() for a in params)
+        index = {s: i for i, s in enumerate(kernel.surgit_ids)}
+        start = len(self.events)
+        for edit in overrides:
+            s = index.get(edit.surgit_id)
+            if s is None:
+                raise ValueError(f"Surgit {edit.surgit_id} not in template")
+            if edit.intrinsic_deviation is not None:
+                intrinsic[s] = edit.intrinsic_deviation
+            if edit.mitigation_factor is not None:
+                mitigation[s] = edit.mitigation_factor
+            if edit.security_scope is not None:
+                scope[s] = SCOPE_CODES[getattr(edit.security_scope, 'value', edit.security_scope)]
+            hits = np.flatnonzero(self._codes == s)
+            if hits.size:
+                start = min(start, int(hits[0]))
+        return (intrinsic, mitigation, scope), start
+
+    def evaluate(self, edits: Iterable[TraceEdit]) -> CounterfactualResult:
+        """
+        Re-scores the base trace with `edits` applied, resuming from the
+        checkpoints at the first affected position.
+        """
+        edits = list(edits)
+        event_edits = [e for e in edits if not isinstance(e, OverrideSurgit)]
+        params, start = self._parameters([e for e in edits if isinstance(e, OverrideSurgit)])
+        start = min([start] + [e.position for e in event_edits])
+        start = max(start, 0)
+
+        # Per-step products and executed steps of the unchanged prefix
+        kernel = self.kernel
+        block = start // self.stride * self.stride
+        pi_t = self._checkpoints[start // self.stride].copy()
+        cached = np.arange(block, start)
+        cached = cached[self._codes[cached] >= 0]
+        np.multiply.at(pi_t, self._steps[cached], 1.0 - self._delta_final[cached])
+        executed = self._first_seen < start
+
+        # Edited suffix: Layers A/A' from the carried residual mitigation
+        codes, n_t, e_t, pause = self._suffix(start, event_edits)
+        delta_final, _ = self._layer_a(codes, n_t, e_t, self._carried[start], params)
+        valid = codes >= 0
+        steps = kernel.surgit_step[codes[valid]]
+        np.multiply.at(pi_t, steps, 1.0 - delta_final[valid])
+        executed[steps] = True
+
+        # Layer C from the checkpointed state
+        before = self._positions[start]
+        initial = self._states[before - 1] if before else np.zeros(len(self.dynamics.components))
+        states = self._layer_c(codes, delta_final, n_t, e_t, pause, initial)
+        clinical_state = states[-1] if len(states) else initial
+
+        # Layer D (D1-D7)
+        s_q_t = LayerD.calculate_step_entropy_array(pi_t, kernel.q)
+        entropy = float(LayerD.calculate_global_entropy_array(s_q_t[executed], kernel.q))
+        rho = float((1.0 - pi_t) @ kernel.step_weights)
+        score = float(LayerD.calculate_global_score(rho, entropy, kernel.alpha, kernel.beta))
+        base = self.base
+        return CounterfactualResult(
+            score=score, rho=rho, entropy=entropy, pi_t=pi_t, s_q_t=s_q_t, executed=executed,
+            clinical_state=clinical_state, base_score=base.score if base else score,
+            resumed_at=start, recomputed=len(codes)
+        )
+
+    def _suffix(self, start: int, edits: List[TraceEdit]):
+        """
+        (codes, n_t, e_t, pause) of the edited trace from base position `start` on.
+        """
+        L = len(self.events)
+        codes, n_t, e_t, pause = (a[start:].copy() for a in (self._codes, self._n_t, self._e_t, self._pause))
+        keep = np.ones(L - start, dtype=bool)
+        touched = {}
+        inserted, insert_at = [], []
+        for edit in edits:
+            if isinstance(edit, InsertEvent):
+                if not 0 <= edit.position <= L:
+                    raise IndexError(f"Insert position {edit.position} outside 0..{L}")
+                inserted.append(edit.event)
+                insert_at.append(edit.position - start)
+                continue
+            if not 0 <= edit.position < L:
+                raise IndexError(f"Event position {edit.position} outside 0..{L - 1}")
+            if isinstance(edit, OverrideNoise):
+                continue
+            i = edit.position - start
+            if edit.position in touched:
+                raise ValueError(f"Conflicting edits at position {edit.position}")
+            touched[edit.position] = edit
+            if isinstance(edit, RemoveEvent):
+                keep[i] = False
+            else:
+                c, n, e, p = self._encode([edit.event])
+                codes[i], n_t[i], e_t[i], pause[i] = c[0], n[0], e[0], p[0]
+        for edit in edits:
+            if isinstance(edit, OverrideNoise):
+                if isinstance(touched.get(edit.position), RemoveEvent):
+                    raise ValueError(f"Noise override on removed event {edit.position}")
+                i = edit.position - start
+                if edit.n_t is not None:
+                    n_t[i] = edit.n_t
+                if edit.e_t is not None:
+                    e_t[i] = edit.e_t
+        if inserted:
+            c, n, e, p = self._encode(inserted)
+            codes, n_t, e_t, pause = (
+                np.insert(a, insert_at, v) for a, v in ((codes, c), (n_t, n), (e_t, e), (pause, p))
+            )
+            keep = np.insert(keep, insert_at, True)
+        return codes[keep], n_t[keep], e_t[keep], pause[keep]
@@ -0,0 +1,215 @@
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..entities.trace import SurgicalTrace, SurgitEvent, SurgitType
+from .petri_net import CompiledPetriNet
+from .scoring_kernel import CompiledTemplate, KernelResult
+
+CE_CODES = (None, SurgitType.CE_SUBSTITUTION, SurgitType.CE_ADDITION)
+
+
+@dataclass(frozen=True)
+class NoiseDistribution:
+    """
+    A.II.3 noise factor distribution (draws are always >= 1.0).
+    kind: constant (value) | uniform (low, high) | shifted_gamma (1 + Gamma(shape, scale))
+          | lognormal (max(1, exp(N(mu, sigma))))
+    """
+    kind: str = "constant"
+    value: float = 1.0
+    low: float = 1.0
+    high: float = 1.0
+    shape: float = 1.0
+    scale: float = 0.0
+    mu: float = 0.0
+    sigma: float = 0.0
+
+    def sample(self, rng: np.random.Generator, size) -> np.ndarray:
+        if self.kind == "constant":
+            draws = np.full(size, self.value, dtype=float)
+        elif self.kind == "uniform":
+            draws = rng.uniform(self.low, self.high, size)
+        elif self.kind == "shifted_gamma":
+            draws = 1.0 + (rng.gamma(self.shape, self.scale, size) if self.scale > 0 else np.zeros(size))
+        elif self.kind == "lognormal":
+            draws = rng.lognormal(self.mu, self.sigma, size)
+        else:
+            raise ValueError(f"Unknown noise distribution '{self.kind}'")
+        return np.maximum(draws, 1.0)
+
+
+@dataclass(frozen=True)
+class ForwardSimulationConfig:
+    """
+    Generative assumptions for synthetic traces.
+    """
+    n_t: NoiseDistribution = field(default_factory=NoiseDistribution)
+    e_t: NoiseDistribution = field(default_factory=NoiseDistribution)
+    max_events: int = 256
+    max_attempts: int = 100              # rejection rounds for truncated / B6-incomplete walks
+    mean_event_minutes: float = 5.0
+    pause_probability: float = 0.0       # chance of an external pause before each event (A.I.3)
+    mean_pause_minutes: float = 5.0
+    ce_probability: float = 0.0          # chance an event is CE-labeled (A.II.4)
+    ce_substitution_share: float = 0.5   # remaining CE events are additions
+    transition_weights: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class SampledCohort:
+    """
+    Array form of B synthetic traces (L = max events, padded with -1 / 0).
+    """
+    transitions: np.ndarray    # (B, L) net transition index
+    surgits: np.ndarray        # (B, L) template surgit index (-1: pad / not a surgit)
+    n_t: np.ndarray            # (B, L)
+    e_t: np.ndarray            # (B, L)
+    event_minutes: np.ndarray  # (B, L)
+    pause_minutes: np.ndarray  # (B, L) pause before the event, 0 if none
+    ce: np.ndarray             # (B, L) index into CE_CODES
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return (self.transitions >= 0).sum(axis=1)
+
+
+def _score_batch(simulator: "ForwardSimulator", seed: np.random.SeedSequence, size: int) -> np.ndarray:
+    """
+    Module-level so that score batches can run on worker processes.
+    """
+    cohort = simulator.sample_cohort(np.random.default_rng(seed), size)
+    return simulator.score(cohort).score
+
+
+class ForwardSimulator:
+    """
+    Monte Carlo forward model of a NormativeTemplate: firing sequences that end
+    in a terminal marking and fire every mandatory surgit (B6) are drawn from
+    the compiled Layer B net and decorated with sampled noise, pauses
+    and CE labels. Batch b of a run uses child b of SeedSequence(seed), so the
+    same seed and batch size reproduce the same cohort on any number of workers.
+    """
+
+    def __init__(self, template: Any, config: Optional[ForwardSimulationConfig] = None):
+        self.template = template
+        self.config = config or ForwardSimulationConfig()
+        self.net = CompiledPetriNet.from_template(template)
+        self.kernel = CompiledTemplate.from_template(template)
+        self._transition_surgit = self.kernel.surgit_index(self.net.transitions)
+        self._weights = np.array(
+            [self.config.transition_weights.get(t, 1.0) for t in self.net.transitions], dtype=float
+        )
+
+    def sample_cohort(self, rng: np.random.Generator, n_traces: int) -> SampledCohort:
+        cfg = self.config
+        transitions = self.net.sample_firing_sequences(
+            rng, n_traces, cfg.max_events, self._weights, cfg.max_attempts
+        )
+        fired = transitions >= 0
+        shape = transitions.shape
+
+        surgits = np.where(fired, self._transition_surgit[np.maximum(transitions, 0)], -1)
+        n_t = np.where(fired, cfg.n_t.sample(rng, shape), 1.0)
+        e_t = np.where(fired, cfg.e_t.sample(rng, shape), 1.0)
+        event_minutes = np.where(fired, rng.exponential(cfg.mean_event_minutes, shape), 0.0)
+        paused = fired & (rng.random(shape) < cfg.pause_probability)
+        pause_minutes = np.where(paused, rng.exponential(cfg.mean_pause_minutes, shape), 0.0)
+        is_ce = fired & (rng.random(shape) < cfg.ce_probability)
+        substitution = rng.random(shape) < cfg.ce_substitution_share
+        ce = np.where(is_ce, np.where(substitution, 1, 2), 0)
+        return SampledCohort(transitions, surgits, n_t, e_t, event_minutes, pause_minutes, ce)
+
+    def score(self, cohort: SampledCohort) -> KernelResult:
+        """
+        Layers A-D straight from the arrays (pauses do not affect the score).
+        """
+        return self.kernel.score_cohort(cohort.surgits, cohort.n_t, cohort.e_t)
+
+    def to_traces(
+        self,
+        cohort: SampledCohort,
+        start_time: Optional[datetime] = None,
+        id_prefix: str = "SYN",
+        first_index: int = 0
+    ) -> List[SurgicalTrace]:
+        start_time = start_time or datetime(2000, 1, 1)
+        traces = []
+        for b, length in enumerate(cohort.lengths.tolist()):
+            clock = start_time
+            events = []
+            for k in range(length):
+                pause = float(cohort.pause_minutes[b, k])
+                if pause > 0.0:
+                    events.append(SurgitEvent(
+                        surgit_id="PAUSE", timestamp_start=clock,
+                        timestamp_end=clock + timedelta(minutes=pause), is_pause=True
+                    ))
+                    clock += timedelta(minutes=pause)
+                end = clock + timedelta(minutes=float(cohort.event_minutes[b, k]))
+                ce = CE_CODES[int(cohort.ce[b, k])]
+                events.append(SurgitEvent(
+                    surgit_id=self.net.transitions[cohort.transitions[b, k]],
+                    timestamp_start=clock, timestamp_end=end,
+                    surgit_type=ce or SurgitType.NORMAL,
+                    n_t=float(cohort.n_t[b, k]), e_t=float(cohort.e_t[b, k])
+                ))
+                clock = end
+            index = first_index + b
+            traces.append(SurgicalTrace(
+                procedure_id=f"{id_prefix}-{index:08d}", patient_id=f"{id_prefix}-PAT-{index:08d}", events=events
+            ))
+        return traces
+
+    def _batch_seeds(self, n_traces: int, seed: Optional[int], batch_size: int):
+        root = np.random.SeedSequence(seed)
+        sizes = [min(batch_size, n_traces - lo) for lo in range(0, n_traces, batch_size)]
+        return list(zip(root.spawn(len(sizes)), sizes))
+
+    def iter_traces(
+        self,
+        n_traces: int,
+        seed: Optional[int] = None,
+        batch_size: int = 1024,
+        start_time: Optional[datetime] = None,
+        id_prefix: str = "SYN"
+    ) -> Iterator[SurgicalTrace]:
+        """
+        Streams materialized SurgicalTraces batch by batch.
+        """
+        first = 0
+        for child, size in self._batch_seeds(n_traces, seed, batch_size):
+            cohort = self.sample_cohort(np.random.default_rng(child), size)
+            yield from self.to_traces(cohort, start_time, id_prefix, first)
+            first += size
+
+    def iter_scores(
+        self,
+        n_traces: int,
+        seed: Optional[int] = None,
+        batch_size: int = 4096,
+        n_workers: int = 1
+    ) -> Iterator[np.ndarray]:
+        """
+        Streams Score_SIM per batch without ever building SurgicalTrace objects.
+        n_workers > 1 samples and scores batches on a process pool (order kept).
+        """
+        batches = self._batch_seeds(n_traces, seed, batch_size)
+        if n_workers <= 1:
+            for child, size in batches:
+                yield _score_batch(self, child, size)
+            return
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            yield from pool.map(
+                _score_batch, [self] * len(batches), [c for c, _ in batches], [s for _, s in batches]
+            )
+
+    def sample_scores(self, n_traces: int, seed: Optional[int] = None, batch_size: int = 4096, n_workers: int = 1) -> np.ndarray:
+        """
+        Score distribution of n_traces synthetic traces as one array.
+        """
+        chunks = list(self.iter_scores(n_traces, seed, batch_size, n_workers))
+        return np.concatenate(chunks) if chunks else np.zeros(0)
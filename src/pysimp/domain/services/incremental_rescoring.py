@@ -0,0 +1,255 @@
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, Sequence, Tuple
+
+from .layer_d import LayerD
+from .scoring_kernel import SCOPE_CODES, CompiledTemplate, KernelResult
+
+
+@dataclass(frozen=True)
+class TemplateDiff:
+    """
+    Scoring-relevant differences between two compiled template versions.
+    surgits maps every surgit whose step, intrinsic_deviation,
+    mitigation_factor or security_scope changed (or that was added/removed)
+    to the steps it belongs to in either version; carried holds those whose
+    change also alters the residual mitigation (A') of later events.
+    """
+    surgits: Dict[str, Tuple[str, ...]]
+    carried: FrozenSet[str]
+    weights: FrozenSet[str]   # steps whose weight_wt changed
+    q_changed: bool
+    weights_changed: bool     # weight_alpha / weight_beta
+    structural: bool          # steps added, removed or reordered
+
+    @property
+    def empty(self) -> bool:
+        return not (self.surgits or self.weights or self.q_changed or self.weights_changed or self.structural)
+
+    @staticmethod
+    def between(old: CompiledTemplate, new: CompiledTemplate) -> "TemplateDiff":
+        def params(kernel: CompiledTemplate) -> Dict[str, Tuple[str, float, float, int]]:
+            return {
+                s: (kernel.step_ids[kernel.surgit_step[i]], kernel.intrinsic_deviation[i],
+                    kernel.mitigation_factor[i], kernel.scope[i])
+                for i, s in enumerate(kernel.surgit_ids)
+            }
+
+        res = SCOPE_CODES["res"]
+        before, after = params(old), params(new)
+        surgits, carried = {}, set()
+        for s_id in list(before) + [s for s in after if s not in before]:
+            b, a = before.get(s_id), after.get(s_id)
+            if b == a:
+                continue
+            surgits[s_id] = tuple(dict.fromkeys(p[0] for p in (b, a) if p is not None))
+            if any(p is not None and p[3] == res for p in (b, a)) and (b is None or a is None or b[2:] != a[2:]):
+                carried.add(s_id)
+
+        structural = old.step_ids != new.step_ids
+        weights = frozenset() if structural else frozenset(
+            t for t, w_old, w_new in zip(old.step_ids, old.step_weights, new.step_weights) if w_old != w_new
+        )
+        return TemplateDiff(
+            surgits=surgits, carried=frozenset(carried), weights=weights,
+            q_changed=old.q != new.q,
+            weights_changed=(old.alpha, old.beta) != (new.alpha, new.beta),
+            structural=structural
+        )
+
+
+@dataclass
+class RescoreStats:
+    diff: TemplateDiff
+    traces: int   # traces whose events were re-scored
+    cells: int    # (trace, step) pi_t values recomputed from events
+    full: bool
+
+
+class IncrementalCohortScorer:
+    """
+    Cohort scores (KernelResult arrays) kept current across template versions.
+    An inverted index maps each surgit to the sorted rows of the traces that
+    contain it, so a new version only re-scores, for the traces containing a
+    changed surgit, the pi_t and S_q(t) of the steps that surgit belongs to;
+    the global q-sum, rho and score are then patched from the cached per-step
+    values. D5 in product form, 1 + (1-q) S = prod_t (1 + (1-q) S_q(t)),
+    makes the q-sum patchable per step (plain sums for q = 1).
+    Changes that alter carried residual mitigation re-score the whole trace;
+    a change in q re-evaluates D3/D5 from the cached pi_t; added, removed or
+    reordered steps fall back to a full re-score.
+    """
+
+    def __init__(
+        self, trace_ids: Sequence[str], vocabulary: Sequence[str],
+        codes: np.ndarray, n_t: np.ndarray, e_t: np.ndarray, template: Any
+    ):
+        """
+        codes: (B, L) index into vocabulary per scored event (-1: padding).
+        """
+        self.trace_ids = list(trace_ids)
+        self.vocabulary = tuple(vocabulary)
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.n_t = np.asarray(n_t, dtype=float)
+        self.e_t = np.asarray(e_t, dtype=float)
+
+        # Inverted index: vocabulary code -> sorted trace rows
+        B = max(len(self.codes), 1)
+        rows = np.broadcast_to(np.arange(len(self.codes))[:, None], self.codes.shape)
+        valid = self.codes >= 0
+        keys = np.unique(self.codes[valid] * B + rows[valid])
+        bounds = np.searchsorted(keys // B, np.arange(len(self.vocabulary) + 1))
+        self.postings = {
+            s_id: keys[bounds[v]:bounds[v + 1]] % B for v, s_id in enumerate(self.vocabulary)
+        }
+        self._rescore_all(CompiledTemplate.from_template(template))
+
+    @staticmethod
+    def from_traces(traces: Iterable[Any], template: Any) -> "IncrementalCohortScorer":
+        """
+        Encodes SurgicalTraces against a cohort vocabulary of surgit ids, so
+        surgits a later version adds are indexed too (pauses do not score).
+        """
+        vocabulary: Dict[str, int] = {}
+        trace_ids, rows = [], []
+        for trace in traces:
+            events = [e for e in trace.events if not getattr(e, 'is_pause', False)]
+            trace_ids.append(trace.procedure_id)
+            rows.append((
+                [vocabulary.setdefault(e.surgit_id, len(vocabulary)) for e in events],
+                [e.noise_patient for e in events],
+                [e.noise_external for e in events],
+            ))
+        L = max((len(r[0]) for r in rows), default=0)
+        codes = np.full((len(rows), L), -1, dtype=np.int64)
+        n_t, e_t = np.ones((len(rows), L)), np.ones((len(rows), L))
+        for b, (c, n, e) in enumerate(rows):
+            codes[b, :len(c)], n_t[b, :len(c)], e_t[b, :len(c)] = c, n, e
+        return IncrementalCohortScorer(trace_ids, list(vocabulary), codes, n_t, e_t, template)
+
+    def rows(self, surgit_ids: Iterable[str]) -> np.ndarray:
+        """
+        Sorted rows of the traces containing any of the surgits.
+        """
+        postings = [self.postings[s] for s in surgit_ids if s in self.postings]
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(postings))
+
+    def step_rows(self, step_id: str) -> np.ndarray:
+        """
+        Sorted rows of the traces executing a step of the current template.
+        """
+        t = self.kernel.step_ids.index(step_id)
+        return self.rows(s for s, step in zip(self.kernel.surgit_ids, self.kernel.surgit_step) if step == t)
+
+    def _surgits(self, kernel: CompiledTemplate, rows=slice(None)) -> np.ndarray:
+        lookup = np.append(kernel.surgit_index(self.vocabulary), -1)
+        return lookup[self.codes[rows]]
+
+    def _rescore_all(self, kernel: CompiledTemplate) -> None:
+        surgits = self._surgits(kernel)
+        self.kernel = kernel
+        self.result: KernelResult = kernel.score_cohort(surgits, self.n_t, self.e_t)
+        _, self.carried = kernel.deviations(surgits, self.n_t, self.e_t)
+
+    def update(self, template: Any) -> RescoreStats:
+        """
+        Moves the cached scores to a new template version.
+        """
+        old, new = self.kernel, CompiledTemplate.from_template(template)
+        diff = TemplateDiff.between(old, new)
+        if diff.structural:
+            self._rescore_all(new)
+            return RescoreStats(diff, traces=len(self.codes), cells=self.result.pi_t.size, full=True)
+
+        res = self.result
+
+        # Carried mitigation changed: re-score those traces end to end
+        carry_rows = self.rows(diff.carried)
+        part = None
+        if carry_rows.size:
+            sub, n_t, e_t = self._surgits(new, carry_rows), self.n_t[carry_rows], self.e_t[carry_rows]
+            part = new.score_cohort(sub, n_t, e_t)
+            _, self.carried[carry_rows] = new.deviations(sub, n_t, e_t)
+            for name in ("delta_final", "pi_t", "delta_t", "s_q_t", "executed", "rho", "entropy"):
+                getattr(res, name)[carry_rows] = getattr(part, name)
+
+        # (trace, step) cells of changed surgits, with carried mitigation unchanged
+        B, T = res.pi_t.shape
+        step_index = {s: t for t, s in enumerate(new.step_ids)}
+        cells = np.zeros((B, T), dtype=bool)
+        for s_id, step_ids in diff.surgits.items():
+            if s_id in diff.carried:
+                continue
+            rows = np.setdiff1d(self.rows([s_id]), carry_rows, assume_unique=True)
+            cells[np.ix_(rows, [step_index[t] for t in step_ids])] = True
+        rows, steps = np.nonzero(cells)
+        touched = np.unique(rows)
+        if touched.size:
+            self._rescore_cells(new, touched, rows, steps, cells)
+
+        # D3/D5 from the cached pi_t when q changes; weights patch rho; D7
+        if diff.q_changed:
+            res.s_q_t[:] = LayerD.calculate_step_entropy_array(res.pi_t, new.q)
+            res.entropy[:] = LayerD.calculate_global_entropy_array(res.s_q_t, new.q)
+        if diff.weights:
+            changed = np.array([step_index[t] for t in diff.weights])
+            res.rho += res.delta_t[:, changed] @ (new.step_weights[changed] - old.step_weights[changed])
+            if part is not None:
+                res.rho[carry_rows] = part.rho  # already under the new weights
+        res.score[:] = LayerD.calculate_global_score(res.rho, res.entropy, new.alpha, new.beta)
+        self.kernel = new
+        return RescoreStats(diff, traces=len(np.union1d(touched, carry_rows)), cells=len(rows), full=False)
+
+    def _rescore_cells(
+        self, new: CompiledTemplate, touched: np.ndarray, rows: np.ndarray, steps: np.ndarray, cells: np.ndarray
+    ) -> None:
+        """
+        Re-scores the events of the marked (trace, step) cells under the new
+        parameters (old kernel q and weights) and patches rho and the q-sum.
+        """
+        res, old = self.result, self.kernel
+        local = np.searchsorted(touched, rows)
+
+        # Events that score in a marked cell under either version
+        def in_cells(kernel: CompiledTemplate, sub: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            valid = sub >= 0
+            step = np.where(valid, kernel.surgit_step[np.where(valid, sub, 0)], 0)
+            return valid & cells[touched[:, None], step], step
+
+        new_sub = self._surgits(new, touched)
+        hit, step = in_cells(new, new_sub)
+        was_hit, _ = in_cells(old, self._surgits(old, touched))
+        delta_final, _ = new.deviations(
+            new_sub[hit], self.n_t[touched][hit], self.e_t[touched][hit], self.carried[touched][hit]
+        )
+        block = res.delta_final[touched]
+        block[was_hit] = 0.0
+        block[hit] = delta_final
+        res.delta_final[touched] = block
+
+        # D1/D3 for the marked cells only
+        event_rows = np.broadcast_to(np.arange(len(touched))[:, None], hit.shape)[hit]
+        pi_block = np.ones((len(touched), len(new.step_ids)))
+        np.multiply.at(pi_block, (event_rows, step[hit]), 1.0 - delta_final)
+        executed_block = np.zeros_like(pi_block, dtype=bool)
+        executed_block[event_rows, step[hit]] = True
+        pi_new = pi_block[local, steps]
+        old_pi, old_s = res.pi_t[rows, steps], res.s_q_t[rows, steps]
+        s_new = LayerD.calculate_step_entropy_array(pi_new, old.q)
+        res.pi_t[rows, steps] = pi_new
+        res.delta_t[rows, steps] = 1.0 - pi_new
+        res.s_q_t[rows, steps] = s_new
+        res.executed[rows, steps] = executed_block[local, steps]
+
+        # Patch rho and the D5 q-sum with the per-step differences
+        np.add.at(res.rho, rows, old.step_weights[steps] * (old_pi - pi_new))
+        if old.q == 1.0:
+            np.add.at(res.entropy, rows, s_new - old_s)
+        else:
+            k = 1.0 - old.q
+            ratio = np.ones(len(res.entropy))
+            np.multiply.at(ratio, rows, (1.0 + k * s_new) / (1.0 + k * old_s))
+            res.entropy[touched] = ((1.0 + k * res.entropy[touched]) * ratio[touched] - 1.0) / k
@@ -1,8 +1,14 @@
 
-from typing import List, Dict, Callable
+from typing import List, Dict, Callable, Any, Optional, Tuple
 from dataclasses import dataclass, field
 import numpy as np
 
+# C6 drivers of a component's increment per surgit event
+UPDATE_DRIVERS = ("deviation_noise", "deviation", "constant")
+# C7-style decay applied to a component at every position (events and pauses)
+DEFAULT_DECAY_RATES = {"none": 0.0, "exponential": 0.9, "linear": 0.01}
+BURDEN_COMPONENT = "general_burden"
+
 @dataclass
 class ExpandedGlobalState:
     """
@@ -18,6 +24,112 @@ class ExpandedGlobalState:
     # Stores residual influence of past steps k <= t.
     provenance_vector: List[float] = field(default_factory=list)
 
+# Positions per block of the exponential scan: r^W must stay well inside float range
+SCAN_BLOCK = 64
+
+
+def _exponential_scan(u: np.ndarray, rates: np.ndarray, x0: np.ndarray) -> np.ndarray:
+    """
+    x_p = r * x_{p-1} + u_p over (B, L, C) increments, SCAN_BLOCK positions per
+    matmul: inside a block x = u @ T' + r^(j+1) * carry, with T the lower-triangular
+    Toeplitz matrix T[j, k] = r^(j-k). A plain cumsum of u * r^-p would overflow
+    on long traces.
+    """
+    v = np.ascontiguousarray(np.moveaxis(u, -1, 0))                       # (C, B, L)
+    width = min(SCAN_BLOCK, v.shape[2])
+    lags = np.arange(width)[None, :] - np.arange(width)[:, None]          # [k, j] -> j - k
+    transfer = np.where(lags >= 0, rates[:, None, None] ** np.maximum(lags, 0), 0.0)
+    gain = rates[:, None] ** np.arange(1, width + 1)                      # (C, W)
+    out = np.empty_like(v)
+    carry = np.ascontiguousarray(np.asarray(x0, dtype=float).T)           # (C, B)
+    for lo in range(0, v.shape[2], width):
+        n = min(width, v.shape[2] - lo)
+        x = v[:, :, lo:lo + n] @ transfer[:, :n, :n] + gain[:, None, :n] * carry[:, :, None]
+        out[:, :, lo:lo + n] = x
+        carry = x[:, :, -1]
+    return np.moveaxis(out, 0, -1)
+
+
+def _linear_scan(u: np.ndarray, rates: np.ndarray, x0: np.ndarray) -> np.ndarray:
+    """
+    x_p = max(x_{p-1} - r, 0) + u_p in closed form. y_p = x_p - u_p follows the
+    Lindley recursion y_p = max(y_{p-1} + u_{p-1} - r, 0), whose solution is
+    y_p = S_p - min(-y_0, min_{j<=p} S_j) with S the running sum of u_{p-1} - r.
+    """
+    v = np.ascontiguousarray(np.moveaxis(u, -1, 0))                       # (C, B, L)
+    y0 = np.maximum(np.asarray(x0, dtype=float).T - rates[:, None], 0.0)  # (C, B)
+    running = np.empty_like(v)
+    running[:, :, 0] = 0.0
+    np.subtract(v[:, :, :-1], rates[:, None, None], out=running[:, :, 1:])
+    np.cumsum(running, axis=2, out=running)
+    floor = np.minimum(np.minimum.accumulate(running, axis=2), -y0[:, :, None])
+    running -= floor
+    running += v
+    return np.moveaxis(running, 0, -1)
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledDynamics:
+    """
+    Layer C compiled once per template: X_t is a fixed-width vector whose
+    components are grouped by decay kernel, so a trace or a whole cohort
+    advances with array operations instead of per-event dicts and closures.
+    Component 0 is always 'general_burden' (deviation * n_t * e_t, no decay).
+    """
+    components: Tuple[str, ...]
+    drivers: np.ndarray          # (C,) index into UPDATE_DRIVERS
+    update_weights: np.ndarray   # (C,)
+    kernels: Tuple[Tuple[str, np.ndarray, np.ndarray], ...]  # (decay kind, component idx, rates)
+    provenance_decay: float = 1.0
+
+    def run_cohort(
+        self,
+        delta_final: np.ndarray,
+        n_t: np.ndarray,
+        e_t: np.ndarray,
+        is_pause: np.ndarray,
+        initial: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        C6 over (B, L) position arrays (pad short traces with is_pause=True).
+        Returns the (B, L, C) clinical state after each position.
+        initial: (C,) or (B, C) state before the first position (default X_0 = 0),
+        e.g. a checkpoint to resume a trace from.
+        """
+        event = ~np.asarray(is_pause, dtype=bool)
+        delta_final = np.where(event, delta_final, 0.0)
+        drive = np.stack([delta_final * n_t * e_t, delta_final, event.astype(float)])  # (3, B, L)
+        increments = np.moveaxis(drive[self.drivers], 0, -1) * self.update_weights   # (B, L, C)
+
+        states = np.empty_like(increments)
+        start = np.zeros((increments.shape[0], len(self.components)))
+        if initial is not None:
+            start += np.asarray(initial, dtype=float)
+        for kind, idx, rates in self.kernels:
+            u = increments[..., idx]
+            if kind == "none":
+                states[..., idx] = np.cumsum(u, axis=1) + start[:, None, idx]
+            elif kind == "exponential":
+                states[..., idx] = _exponential_scan(u, rates, start[:, idx])
+            else:
+                states[..., idx] = _linear_scan(u, rates, start[:, idx])
+        return states
+
+    def run(self, delta_final, n_t, e_t, is_pause, initial: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Single-trace C6: (L,) position arrays -> (L, C) states.
+        """
+        arrays = [np.asarray(a, dtype=float)[None, :] for a in (delta_final, n_t, e_t)]
+        return self.run_cohort(*arrays, np.asarray(is_pause, dtype=bool)[None, :], initial)[0]
+
+    def provenance(self, deviations: np.ndarray, position: int) -> np.ndarray:
+        """
+        C7 in closed form: H at `position` is h_k = delta_k * g^(position - k),
+        with delta_k = 0 for pauses.
+        """
+        head = np.asarray(deviations[:position + 1], dtype=float)
+        return head * self.provenance_decay ** np.arange(position, -1, -1)
+
 class LayerC:
     """
     Layer C: Expanded Global State Dynamics.
@@ -32,6 +144,51 @@ class LayerC:
         """
         return ExpandedGlobalState(clinical_state={}, provenance_vector=[])
 
+    @staticmethod
+    def compile(dynamics_definition: Dict[str, Any]) -> CompiledDynamics:
+        """
+        Compiles a template's dynamics_definition:
+          state_components: [name, ...]
+          decay_functions: {name: none | exponential | linear}
+          decay_rates: {name: float}       (exp: x*r, linear: max(x - r, 0))
+          update_functions: {name: deviation_noise | deviation | constant}
+          update_weights: {name: float}
+          provenance_decay: float
+        """
+        declared = [c for c in dynamics_definition.get('state_components', []) if c != BURDEN_COMPONENT]
+        components = (BURDEN_COMPONENT,) + tuple(declared)
+        decay_functions = dynamics_definition.get('decay_functions', {})
+        decay_rates = dynamics_definition.get('decay_rates', {})
+        update_functions = dynamics_definition.get('update_functions', {})
+        update_weights = dynamics_definition.get('update_weights', {})
+
+        kinds, drivers, weights, rates = [], [], [], []
+        for name in components:
+            kind = decay_functions.get(name, "none") if name != BURDEN_COMPONENT else "none"
+            if kind not in DEFAULT_DECAY_RATES:
+                raise ValueError(f"Unknown decay function '{kind}' for state component '{name}'")
+            driver = update_functions.get(name, "deviation_noise")
+            if driver not in UPDATE_DRIVERS:
+                raise ValueError(f"Unknown update function '{driver}' for state component '{name}'")
+            kinds.append(kind)
+            drivers.append(UPDATE_DRIVERS.index(driver))
+            weights.append(update_weights.get(name, 1.0))
+            rates.append(decay_rates.get(name, DEFAULT_DECAY_RATES[kind]))
+
+        kernels = tuple(
+            (kind, np.array(idx), np.array([rates[i] for i in idx]))
+            for kind in DEFAULT_DECAY_RATES
+            for idx in [[i for i, k in enumerate(kinds) if k == kind]]
+            if idx
+        )
+        return CompiledDynamics(
+            components=components,
+            drivers=np.array(drivers, dtype=np.int64),
+            update_weights=np.array(weights, dtype=float),
+            kernels=kernels,
+            provenance_decay=dynamics_definition.get('provenance_decay', 1.0)
+        )
+
     @staticmethod
     def update_provenance(
         current_provenance: List[float], 
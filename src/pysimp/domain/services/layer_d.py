@@ -44,6 +44,22 @@ class LayerD:
         term = (pi_t ** q) + (delta_t ** q)
         return (1.0 - term) / (q - 1.0)
 
+    @staticmethod
+    def calculate_step_entropy_array(pi_t: np.ndarray, q: float) -> np.ndarray:
+        """
+        D3 evaluated elementwise over an array of pi_t values.
+        Same boundary handling as calculate_step_entropy.
+        """
+        pi_t = np.asarray(pi_t, dtype=float)
+        delta_t = 1.0 - pi_t
+        if q == 1.0:
+            inside = (pi_t > 0) & (delta_t > 0)
+            safe_pi = np.where(inside, pi_t, 0.5)
+            safe_delta = np.where(inside, delta_t, 0.5)
+            entropy = -(safe_pi * np.log(safe_pi) + safe_delta * np.log(safe_delta))
+            return np.where(inside, entropy, 0.0)
+        return (1.0 - (pi_t ** q + delta_t ** q)) / (q - 1.0)
+
     @staticmethod
     def q_add(x: float, y: float, q: float) -> float:
         """
@@ -67,6 +83,19 @@ class LayerD:
             
         return s_sim
 
+    @staticmethod
+    def calculate_global_entropy_array(step_entropies: np.ndarray, q: float) -> np.ndarray:
+        """
+        D5 q-sum along the last axis of a (..., T) array of step entropies.
+        """
+        step_entropies = np.asarray(step_entropies, dtype=float)
+        if step_entropies.shape[-1] == 0:
+            return np.zeros(step_entropies.shape[:-1])
+        s_sim = step_entropies[..., 0].copy()
+        for t in range(1, step_entropies.shape[-1]):
+            s_sim = LayerD.q_add(s_sim, step_entropies[..., t], q)
+        return s_sim
+
     @staticmethod
     def calculate_global_score(
         rho_sim: float, 
@@ -1,12 +1,264 @@
 
 import math
-from itertools import combinations
-from typing import List, Dict, Callable
+import multiprocessing
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+
+@dataclass
+class ShapleyEstimate:
+    """
+    Monte Carlo Shapley estimate with its standard error and confidence interval.
+    """
+    value: float
+    std_error: float
+    ci_low: float
+    ci_high: float
+    n_permutations: int
+
+class CoalitionCache:
+    """
+    Memo table v(S) keyed by the packed membership bits of S.
+    Each distinct coalition reaches the value function once; repeated coalitions
+    (e.g. the empty and grand coalitions of every sampled permutation) are hits.
+    """
+
+    def __init__(
+        self,
+        elements: List[str],
+        value_function: Optional[Callable[[List[str]], float]] = None,
+        batch_value_function: Optional[Callable[[np.ndarray], Sequence[float]]] = None
+    ):
+        if value_function is None and batch_value_function is None:
+            raise ValueError("A value_function or batch_value_function is required")
+        self.elements = list(elements)
+        self.value_function = value_function
+        self.batch_value_function = batch_value_function
+        self._memo: Dict[bytes, float] = {}
+        self.evaluations = 0
+        self.hits = 0
+
+    def evaluate(self, membership: np.ndarray) -> np.ndarray:
+        """
+        Returns v(S) for every row of a (batch, n) boolean membership matrix.
+        """
+        packed = np.packbits(membership, axis=1)
+        keys = [row.tobytes() for row in packed]
+        out = np.empty(len(keys), dtype=float)
+
+        missing_rows, missing_keys, seen = [], [], set()
+        for r, key in enumerate(keys):
+            if key not in self._memo and key not in seen:
+                seen.add(key)
+                missing_rows.append(r)
+                missing_keys.append(key)
+
+        if missing_rows:
+            rows = membership[missing_rows]
+            if self.batch_value_function is not None:
+                values = np.asarray(self.batch_value_function(rows), dtype=float)
+            else:
+                values = [
+                    self.value_function([e for e, inside in zip(self.elements, row) if inside])
+                    for row in rows
+                ]
+            for key, value in zip(missing_keys, values):
+                self._memo[key] = float(value)
+            self.evaluations += len(missing_rows)
+
+        self.hits += len(keys) - len(missing_rows)
+        for r, key in enumerate(keys):
+            out[r] = self._memo[key]
+        return out
+
+def _sample_permutations(
+    rng: np.random.Generator,
+    n: int,
+    antithetic: bool,
+    stratified: bool,
+    groups: Optional[List[np.ndarray]] = None
+) -> np.ndarray:
+    """
+    Draws one sampling unit of permutations.
+    stratified: the n cyclic shifts of a random permutation (every element visits
+    every position once). antithetic: each permutation is paired with its reverse.
+    groups (Owen): permutations keep each group contiguous; the group order and the
+    order within each group are random, and stratified shifts both cyclically.
+    """
+    if groups is None:
+        base = rng.permutation(n)
+        perms = np.stack([np.roll(base, k) for k in range(n)]) if stratified else base[None, :]
+    else:
+        order = rng.permutation(len(groups))
+        inner = [rng.permutation(g) for g in groups]
+        shifts = range(len(groups)) if stratified else range(1)
+        perms = np.stack([
+            np.concatenate([np.roll(inner[g], k) for g in np.roll(order, k)])
+            for k in shifts
+        ])
+    if antithetic:
+        perms = np.concatenate([perms, perms[:, ::-1]])
+    return perms
+
+# Set in pool workers by _init_worker; the parent raises it to end in-flight batches early
+_stop_event = None
+
+def _init_worker(stop_event) -> None:
+    global _stop_event
+    _stop_event = stop_event
+
+def _permutation_batch(
+    seed: np.random.SeedSequence,
+    n_units: int,
+    cache: CoalitionCache,
+    antithetic: bool,
+    stratified: bool,
+    groups: Optional[List[np.ndarray]] = None
+) -> np.ndarray:
+    """
+    Evaluates n_units sampling units; returns their (n_units, n) mean marginals.
+    Module-level so that it can be shipped to worker processes. In a worker, the
+    units done so far are returned as soon as the shared stop event is set.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(cache.elements)
+    steps = np.arange(n + 1)[:, None]
+    unit_estimates = np.empty((n_units, n))
+
+    for u in range(n_units):
+        if _stop_event is not None and _stop_event.is_set():
+            return unit_estimates[:u]
+        perms = _sample_permutations(rng, n, antithetic, stratified, groups)
+        ranks = np.argsort(perms, axis=1)
+        # Row k of each block = coalition of the first k elements of the permutation
+        membership = (steps[None, :, :] > ranks[:, None, :]).reshape(-1, n)
+        values = cache.evaluate(membership).reshape(len(perms), n + 1)
+        marginals = np.zeros((len(perms), n))
+        np.put_along_axis(marginals, perms, np.diff(values, axis=1), axis=1)
+        unit_estimates[u] = marginals.mean(axis=0)
+
+    return unit_estimates
+
+def _run_permutation_sampling(
+    elements: List[str],
+    value_function: Optional[Callable[[List[str]], float]],
+    batch_value_function: Optional[Callable[[np.ndarray], Sequence[float]]],
+    groups: Optional[List[np.ndarray]],
+    aggregate: Optional[np.ndarray],
+    seed: Optional[int],
+    antithetic: bool,
+    stratified: bool,
+    max_permutations: int,
+    target_std_error: Optional[float],
+    time_budget: Optional[float],
+    n_workers: int,
+    units_per_batch: int
+):
+    """
+    Shared driver of the permutation estimators.
+    Batch b draws from its own child stream of SeedSequence(seed), so results only
+    depend on the seed and on how many batches ran, not on which worker ran them.
+    aggregate (n, m), if given, appends unit @ aggregate (e.g. group totals) to the
+    tracked statistics. Returns (mean, std_error, n_permutations).
+    """
+    n = len(elements)
+    shifts = (len(groups) if groups is not None else n) if stratified else 1
+    unit_size = shifts * (2 if antithetic else 1)
+    max_units = max(2, math.ceil(max_permutations / unit_size))
+    root_seed = np.random.SeedSequence(seed)
+    started = time.monotonic()
+
+    # Welford accumulators over unit estimates
+    width = n + (aggregate.shape[1] if aggregate is not None else 0)
+    count = 0
+    mean = np.zeros(width)
+    m2 = np.zeros(width)
+
+    def _absorb(batch: np.ndarray) -> bool:
+        nonlocal count
+        if aggregate is not None:
+            batch = np.concatenate([batch, batch @ aggregate], axis=1)
+        for unit in batch:
+            count += 1
+            delta = unit - mean
+            mean[:] += delta / count
+            m2[:] += delta * (unit - mean)
+        if count >= max_units:
+            return True
+        if time_budget is not None and time.monotonic() - started >= time_budget:
+            return True
+        if target_std_error is not None and count >= 2:
+            return bool(np.all(np.sqrt(m2 / (count - 1) / count) <= target_std_error))
+        return False
+
+    scheduled = 0
+
+    def _next_batch():
+        nonlocal scheduled
+        size = min(units_per_batch, max_units - scheduled)
+        scheduled += max(size, 0)
+        return size, root_seed.spawn(1)[0]
+
+    if n_workers <= 1:
+        cache = CoalitionCache(elements, value_function, batch_value_function)
+        done = False
+        while not done:
+            size, child_seed = _next_batch()
+            done = _absorb(_permutation_batch(child_seed, size, cache, antithetic, stratified, groups))
+    else:
+        # At most n_workers batches are in flight; on an early stop the running
+        # ones see the stop event and return, the queued ones are cancelled
+        stop = multiprocessing.Event()
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(stop,)) as pool:
+            pending = []
+
+            def _submit():
+                size, child_seed = _next_batch()
+                if size <= 0:
+                    return
+                cache = CoalitionCache(elements, value_function, batch_value_function)
+                pending.append(pool.submit(
+                    _permutation_batch, child_seed, size, cache, antithetic, stratified, groups
+                ))
+
+            for _ in range(n_workers):
+                _submit()
+            # Consume in submission order so the sample sequence is reproducible
+            while pending:
+                if _absorb(pending.pop(0).result()):
+                    stop.set()
+                    for future in pending:
+                        future.cancel()
+                    break
+                _submit()
+
+    std_error = np.sqrt(m2 / (count - 1) / count) if count > 1 else np.full(width, math.inf)
+    return mean, std_error, count * unit_size
+
+def _to_estimates(
+    names: List[str], mean: np.ndarray, std_error: np.ndarray, n_permutations: int, confidence: float
+) -> Dict[str, ShapleyEstimate]:
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+    return {
+        name: ShapleyEstimate(
+            value=float(mean[i]),
+            std_error=float(std_error[i]),
+            ci_low=float(mean[i] - z * std_error[i]),
+            ci_high=float(mean[i] + z * std_error[i]),
+            n_permutations=n_permutations
+        )
+        for i, name in enumerate(names)
+    }
 
 class LayerE:
     """
     Layer E: Probabilistic Bridge and Shapley Attribution.
     """
+    # Exact Shapley keeps three 2^n arrays (values, masks, sizes): ~100 MB at 22 elements
+    EXACT_SHAPLEY_MAX_ELEMENTS = 22
     
     @staticmethod
     def sigmoid(eta: float) -> float:
@@ -40,7 +292,7 @@ class LayerE:
         """
         E4. Linear Predictor (D-Bridge 4)
         eta_k = alpha_k + beta_k^(Delta) * Delta_SIM + beta_k^(S) * S_q(SIM) 
-        (+ sum(gamma * delta_t) in full model, here simplified to global metrics first)
+        Global terms only; the full model with the gamma_k_t/xi_k_t step terms is predict_pcp_matrix.
         """
         return alpha_k + (beta_delta * delta_sim) + (beta_s * s_q_sim)
 
@@ -52,38 +304,262 @@ class LayerE:
         """
         return LayerE.sigmoid(eta_k)
 
+    @staticmethod
+    def pcp_coefficient_matrix(template: Any) -> Tuple[List[str], List[str], np.ndarray]:
+        """
+        E4 coefficients of every calibrated k in complication_set_k as one matrix.
+        Returns (complications, step_ids, C) with C of shape (K, 3 + 2T), columns
+        [alpha_k, beta_k_delta, beta_k_s, gamma_k_t..., xi_k_t...] over template steps.
+        """
+        coefficients = template.calibration_coefficients
+        complications = [k for k in template.complication_set_k if k in coefficients]
+        if not template.complication_set_k:
+            complications = list(coefficients)
+        step_ids = list(template.steps)
+        T = len(step_ids)
+
+        matrix = np.zeros((len(complications), 3 + 2 * T))
+        for row, k in enumerate(complications):
+            c = coefficients[k]
+            matrix[row, 0] = c.get('alpha_k', 0.0)
+            matrix[row, 1] = c.get('beta_k_delta', 0.0)
+            matrix[row, 2] = c.get('beta_k_s', 0.0)
+            gamma, xi = c.get('gamma_k_t', {}), c.get('xi_k_t', {})
+            for t, step_id in enumerate(step_ids):
+                matrix[row, 3 + t] = gamma.get(step_id, 0.0)
+                matrix[row, 3 + T + t] = xi.get(step_id, 0.0)
+        return complications, step_ids, matrix
+
+    @staticmethod
+    def predict_pcp_matrix(
+        coefficient_matrix: np.ndarray,
+        delta_sim: np.ndarray,
+        s_q_sim: np.ndarray,
+        delta_t: np.ndarray,
+        rho_t: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Full E4 + E3 for a cohort in one product.
+        delta_sim, s_q_sim: (N,); delta_t, rho_t: (N, T) in the coefficient step order.
+        Returns (eta, P) of shape (N, K).
+        """
+        delta_sim = np.atleast_1d(np.asarray(delta_sim, dtype=float))
+        design = np.hstack([
+            np.ones((len(delta_sim), 1)),
+            delta_sim[:, None],
+            np.atleast_1d(np.asarray(s_q_sim, dtype=float))[:, None],
+            np.asarray(delta_t, dtype=float).reshape(len(delta_sim), -1),
+            np.asarray(rho_t, dtype=float).reshape(len(delta_sim), -1),
+        ])
+        eta = design @ coefficient_matrix.T
+        return eta, 1.0 / (1.0 + np.exp(-np.clip(eta, -60, 60)))
+
+    @staticmethod
+    def coalition_membership(masks: np.ndarray, n: int) -> np.ndarray:
+        """
+        Expands integer bitmask coalitions into a (len(masks), n) boolean matrix.
+        Bit i set <=> elements[i] belongs to the coalition.
+        """
+        masks = np.asarray(masks, dtype=np.int64)
+        return ((masks[:, None] >> np.arange(n, dtype=np.int64)) & 1).astype(bool)
+
     @staticmethod
     def calculate_shapley_values(
         elements: List[str], 
-        value_function: Callable[[List[str]], float]
+        value_function: Optional[Callable[[List[str]], float]] = None,
+        batch_value_function: Optional[Callable[[np.ndarray], Sequence[float]]] = None,
+        batch_size: int = 65536
     ) -> Dict[str, float]:
         """
         Calculates Shapley values for a set of elements given a value function v(S).
         Eq (36).
-        Currently implements an exponential-time algorithm (exact). 
-        For many elements, Monte Carlo approximation would be needed.
+        Exact algorithm: each of the 2^n coalitions is evaluated exactly once into a
+        bitmask-indexed memo table, then every marginal v(S U {i}) - v(S) is read back
+        from it; more than EXACT_SHAPLEY_MAX_ELEMENTS elements is refused.
+        batch_value_function, if given, receives a (batch, n) boolean membership matrix
+        (columns ordered as `elements`) and returns one value per row; it takes
+        precedence over value_function. For many elements use estimate_shapley_values.
         """
-        shapley_values = {e: 0.0 for e in elements}
         n = len(elements)
+        if n == 0:
+            return {}
+        if value_function is None and batch_value_function is None:
+            raise ValueError("A value_function or batch_value_function is required")
+        if n > LayerE.EXACT_SHAPLEY_MAX_ELEMENTS:
+            raise ValueError(
+                f"Exact Shapley over {n} elements needs a 2^{n}-entry coalition table "
+                f"(limit {LayerE.EXACT_SHAPLEY_MAX_ELEMENTS}); use LayerE.estimate_shapley_values instead"
+            )
+
+        n_coalitions = 1 << n
+        masks = np.arange(n_coalitions, dtype=np.int64)
+        values = np.empty(n_coalitions, dtype=float)
+
+        # 1. Memo table: v(S) for every coalition, evaluated once
+        for lo in range(0, n_coalitions, batch_size):
+            chunk = masks[lo:lo + batch_size]
+            if batch_value_function is not None:
+                membership = LayerE.coalition_membership(chunk, n)
+                values[lo:lo + len(chunk)] = np.asarray(batch_value_function(membership), dtype=float)
+            else:
+                for offset, mask in enumerate(chunk.tolist()):
+                    coalition = [elements[i] for i in range(n) if mask >> i & 1]
+                    values[lo + offset] = value_function(coalition)
+
+        # 2. Weights |S|! (n - |S| - 1)! / n!, one per coalition size
         factorial = math.factorial
-        
-        for element in elements:
-            # Elements excluding current one
-            others = [e for e in elements if e != element]
-            
-            # Iterate over all subsets of others
-            for k in range(len(others) + 1):
-                for subset in combinations(others, k):
-                    subset = list(subset)
-                    
-                    # Weight = |S|! * (n - |S| - 1)! / n!
-                    weight = (factorial(len(subset)) * factorial(n - len(subset) - 1)) / factorial(n)
-                    
-                    # Marginal contribution = v(S U {i}) - v(S)
-                    val_with = value_function(subset + [element])
-                    val_without = value_function(subset)
-                    
-                    marginal = val_with - val_without
-                    shapley_values[element] += weight * marginal
-                    
+        size_weights = np.array(
+            [factorial(s) * factorial(n - s - 1) / factorial(n) for s in range(n)]
+        )
+        sizes = np.zeros(n_coalitions, dtype=np.int64)
+        for i in range(n):
+            sizes += (masks >> i) & 1
+
+        # 3. Marginals read back from the table
+        shapley_values = {}
+        for i, element in enumerate(elements):
+            bit = 1 << i
+            without = masks[(masks & bit) == 0]
+            marginal = values[without | bit] - values[without]
+            shapley_values[element] = float(np.dot(size_weights[sizes[without]], marginal))
+
         return shapley_values
+
+    @staticmethod
+    def estimate_shapley_values(
+        elements: List[str],
+        value_function: Optional[Callable[[List[str]], float]] = None,
+        batch_value_function: Optional[Callable[[np.ndarray], Sequence[float]]] = None,
+        seed: Optional[int] = None,
+        antithetic: bool = True,
+        stratified: bool = False,
+        max_permutations: int = 2000,
+        target_std_error: Optional[float] = None,
+        time_budget: Optional[float] = None,
+        n_workers: int = 1,
+        units_per_batch: int = 8,
+        confidence: float = 0.95
+    ) -> Dict[str, ShapleyEstimate]:
+        """
+        Monte Carlo permutation estimate of Eq (36) for many elements.
+        Sampling units (see _sample_permutations) are drawn in seeded batches and
+        memoized through a CoalitionCache.
+        Stops when every standard error <= target_std_error, when time_budget seconds
+        have elapsed, or after max_permutations. With n_workers > 1 batches run on a
+        process pool, so the value functions must be picklable.
+        """
+        if not elements:
+            return {}
+        if not 0.0 < confidence < 1.0:
+            raise ValueError("confidence must be in (0, 1)")
+
+        mean, std_error, n_permutations = _run_permutation_sampling(
+            elements, value_function, batch_value_function, None, None, seed,
+            antithetic, stratified, max_permutations, target_std_error, time_budget,
+            n_workers, units_per_batch
+        )
+        return _to_estimates(elements, mean, std_error, n_permutations, confidence)
+
+    @staticmethod
+    def calculate_owen_values(
+        groups: Dict[str, List[str]],
+        value_function: Optional[Callable[[List[str]], float]] = None,
+        batch_value_function: Optional[Callable[[np.ndarray], Sequence[float]]] = None
+    ) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """
+        Exact Owen values for elements partitioned into groups (a priori unions).
+        phi_i = sum_{R, T} |R|!(m-|R|-1)!/m! * |T|!(n_k-|T|-1)!/n_k! * [v(Q_R U T U i) - v(Q_R U T)]
+        over unions of other groups Q_R and subsets T of i's own group k.
+        Returns (element values, group values); group values are the Shapley values
+        of the quotient game and equal the sum of their elements' Owen values.
+        Coalitions are memoized, so the cost is ~sum_k 2^(m-1+n_k) evaluations.
+        """
+        elements = [e for members in groups.values() for e in members]
+        if not elements:
+            return {}, {}
+        group_ids = list(groups)
+        m = len(group_ids)
+        if max(m - 1 + len(members) for members in groups.values()) > 24:
+            raise ValueError("Exact Owen values are intractable for this hierarchy; use estimate_owen_values")
+
+        cache = CoalitionCache(elements, value_function, batch_value_function)
+        n = len(elements)
+        offsets = np.cumsum([0] + [len(groups[g]) for g in group_ids])
+        factorial = math.factorial
+
+        def _size_weights(size: int) -> np.ndarray:
+            return np.array([factorial(s) * factorial(size - s - 1) / factorial(size) for s in range(size)])
+
+        element_values: Dict[str, float] = {}
+        for k, g in enumerate(group_ids):
+            others = [j for j in range(m) if j != k]
+            n_k = len(groups[g])
+            r_masks = np.arange(1 << len(others), dtype=np.int64)
+            t_masks = np.arange(1 << n_k, dtype=np.int64)
+            r_member = LayerE.coalition_membership(r_masks, len(others))
+            t_member = LayerE.coalition_membership(t_masks, n_k)
+
+            # Membership rows for every (R, T) pair: union of groups in R plus T
+            base = np.zeros((len(r_masks), n), dtype=bool)
+            for col, j in enumerate(others):
+                base[r_member[:, col], offsets[j]:offsets[j + 1]] = True
+            rows = np.repeat(base, len(t_masks), axis=0)
+            rows[:, offsets[k]:offsets[k + 1]] = np.tile(t_member, (len(r_masks), 1))
+            values = cache.evaluate(rows).reshape(len(r_masks), len(t_masks))
+
+            w_r = _size_weights(m)[r_member.sum(axis=1)]
+            t_sizes = t_member.sum(axis=1)
+            w_t = _size_weights(n_k)
+            for local, element in enumerate(groups[g]):
+                bit = 1 << local
+                without = t_masks[(t_masks & bit) == 0]
+                marginal = values[:, without | bit] - values[:, without]
+                element_values[element] = float(w_r @ marginal @ w_t[t_sizes[without]])
+
+        group_values = {g: sum(element_values[e] for e in groups[g]) for g in group_ids}
+        return element_values, group_values
+
+    @staticmethod
+    def estimate_owen_values(
+        groups: Dict[str, List[str]],
+        value_function: Optional[Callable[[List[str]], float]] = None,
+        batch_value_function: Optional[Callable[[np.ndarray], Sequence[float]]] = None,
+        seed: Optional[int] = None,
+        antithetic: bool = True,
+        stratified: bool = False,
+        max_permutations: int = 2000,
+        target_std_error: Optional[float] = None,
+        time_budget: Optional[float] = None,
+        n_workers: int = 1,
+        units_per_batch: int = 8,
+        confidence: float = 0.95
+    ) -> Tuple[Dict[str, ShapleyEstimate], Dict[str, ShapleyEstimate]]:
+        """
+        Monte Carlo Owen values: marginals along random permutations that keep every
+        group contiguous. Same sampling controls as estimate_shapley_values.
+        Returns (element estimates, group estimates); group estimates track the
+        per-unit group totals, so their standard errors include covariances.
+        """
+        elements = [e for members in groups.values() for e in members]
+        if not elements:
+            return {}, {}
+        if not 0.0 < confidence < 1.0:
+            raise ValueError("confidence must be in (0, 1)")
+
+        group_ids = list(groups)
+        offsets = np.cumsum([0] + [len(groups[g]) for g in group_ids])
+        index_groups = [np.arange(offsets[k], offsets[k + 1]) for k in range(len(group_ids))]
+        aggregate = np.zeros((len(elements), len(group_ids)))
+        for k, idx in enumerate(index_groups):
+            aggregate[idx, k] = 1.0
+
+        mean, std_error, n_permutations = _run_permutation_sampling(
+            elements, value_function, batch_value_function, index_groups, aggregate, seed,
+            antithetic, stratified, max_permutations, target_std_error, time_budget,
+            n_workers, units_per_batch
+        )
+        n = len(elements)
+        return (
+            _to_estimates(elements, mean[:n], std_error[:n], n_permutations, confidence),
+            _to_estimates(group_ids, mean[n:], std_error[n:], n_permutations, confidence)
+        )
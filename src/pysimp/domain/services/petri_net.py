@@ -0,0 +1,173 @@
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledPetriNet:
+    """
+    Layer B net (B1, B2, B11) compiled to incidence matrices over black tokens.
+    Markings are integer vectors over `places`; a transition t is enabled in M
+    iff M >= pre[t], and firing it yields M - pre[t] + post[t]. All operations
+    accept a leading batch axis so many markings advance at once.
+    """
+    places: Tuple[str, ...]
+    transitions: Tuple[str, ...]
+    pre: np.ndarray                 # (T, P)
+    post: np.ndarray                # (T, P)
+    initial_marking: np.ndarray     # (P,)
+    forbidden: Tuple[np.ndarray, ...] = ()  # B12 place-index sets
+    mandatory: Tuple[int, ...] = ()         # B6 transition indices every valid trace fires
+
+    @staticmethod
+    def from_template(template: Any) -> "CompiledPetriNet":
+        definition = template.structure_definition or {}
+        places = list(definition.get('places', []))
+        place_index = {p: i for i, p in enumerate(places)}
+
+        def _as_list(value):
+            return [value] if isinstance(value, str) else list(value or [])
+
+        def _index(name: str) -> int:
+            if name not in place_index:
+                place_index[name] = len(places)
+                places.append(name)
+            return place_index[name]
+
+        transitions, arcs = [], []
+        for t_def in definition.get('transitions', []):
+            transitions.append(t_def['id'])
+            arcs.append((
+                [_index(p) for p in _as_list(t_def.get('input'))],
+                [_index(p) for p in _as_list(t_def.get('output'))]
+            ))
+        initial = [_index(p) for p in _as_list(definition.get('initial_marking'))]
+        forbidden = [[_index(p) for p in places_set] for places_set in (template.forbidden_states or [])]
+        mandatory = {s_id for step in template.steps.values() for s_id, surgit in step.surgits.items()
+                     if surgit.is_mandatory}
+        missing = mandatory.difference(transitions)
+        if missing:
+            raise ValueError(f"Mandatory surgits {sorted(missing)} are not transitions of the net (B6)")
+
+        pre = np.zeros((len(transitions), len(places)), dtype=np.int64)
+        post = np.zeros((len(transitions), len(places)), dtype=np.int64)
+        for t, (inputs, outputs) in enumerate(arcs):
+            for p in inputs:
+                pre[t, p] += 1
+            for p in outputs:
+                post[t, p] += 1
+        marking = np.zeros(len(places), dtype=np.int64)
+        for p in initial:
+            marking[p] += 1
+
+        return CompiledPetriNet(
+            places=tuple(places), transitions=tuple(transitions), pre=pre, post=post,
+            initial_marking=marking, forbidden=tuple(np.array(f, dtype=np.int64) for f in forbidden),
+            mandatory=tuple(t for t, t_id in enumerate(transitions) if t_id in mandatory)
+        )
+
+    @property
+    def incidence(self) -> np.ndarray:
+        return self.post - self.pre
+
+    def transition_index(self, transition_id: str) -> Optional[int]:
+        try:
+            return self.transitions.index(transition_id)
+        except ValueError:
+            return None
+
+    def is_forbidden(self, marking: np.ndarray) -> np.ndarray:
+        """
+        B12 over (..., P) markings: any forbidden set with all places marked.
+        """
+        marking = np.asarray(marking)
+        hit = np.zeros(marking.shape[:-1], dtype=bool)
+        for places_set in self.forbidden:
+            hit |= np.all(marking[..., places_set] > 0, axis=-1)
+        return hit
+
+    def enabled(self, marking: np.ndarray, avoid_forbidden: bool = False) -> np.ndarray:
+        """
+        (..., P) markings -> (..., T) enabled mask. avoid_forbidden also disables
+        transitions whose successor marking is forbidden.
+        """
+        marking = np.asarray(marking)
+        mask = np.all(marking[..., None, :] >= self.pre, axis=-1)
+        if avoid_forbidden and self.forbidden:
+            successors = marking[..., None, :] + self.incidence
+            mask &= ~self.is_forbidden(successors)
+        return mask
+
+    def fire(self, marking: np.ndarray, transition: np.ndarray) -> np.ndarray:
+        """
+        Fires one transition index per marking (no enabledness check).
+        """
+        return np.asarray(marking) + self.incidence[transition]
+
+    def _walk(
+        self, rng: np.random.Generator, n_sequences: int, max_length: int, weights: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        One batch of random walks; also returns which walks ended in a
+        deadlock (terminal marking) rather than being cut at max_length.
+        """
+        marking = np.repeat(self.initial_marking[None, :], n_sequences, axis=0)
+        sequences = np.full((n_sequences, max_length), -1, dtype=np.int64)
+        alive = np.ones(n_sequences, dtype=bool)
+
+        for step in range(max_length):
+            scores = self.enabled(marking, avoid_forbidden=True) * weights
+            alive &= scores.sum(axis=1) > 0
+            if not alive.any():
+                break
+            # Weighted choice per row: first index where cumulative share exceeds u
+            cumulative = np.cumsum(scores, axis=1)
+            u = rng.random(n_sequences) * cumulative[:, -1]
+            choice = np.minimum((cumulative <= u[:, None]).sum(axis=1), len(self.transitions) - 1)
+            sequences[alive, step] = choice[alive]
+            marking[alive] = self.fire(marking[alive], choice[alive])
+        else:
+            alive &= (self.enabled(marking, avoid_forbidden=True) * weights).sum(axis=1) > 0
+        return sequences, ~alive
+
+    def is_complete(self, sequences: np.ndarray, terminal: np.ndarray) -> np.ndarray:
+        """
+        (B, L) walks -> (B,) mask of those that reached a terminal marking and
+        fired every mandatory transition (B6).
+        """
+        complete = np.asarray(terminal, dtype=bool).copy()
+        for t in self.mandatory:
+            complete &= (sequences == t).any(axis=1)
+        return complete
+
+    def sample_firing_sequences(
+        self,
+        rng: np.random.Generator,
+        n_sequences: int,
+        max_length: int,
+        weights: Optional[np.ndarray] = None,
+        max_attempts: int = 100
+    ) -> np.ndarray:
+        """
+        Random walks from M0: at every step each sequence fires one enabled,
+        non-forbidden transition (probability proportional to `weights`) until it
+        deadlocks. Walks cut at max_length or missing a mandatory transition are
+        rejected and redrawn, up to max_attempts rounds. Returns
+        (n_sequences, max_length) transition indices padded with -1.
+        """
+        weights = np.ones(len(self.transitions)) if weights is None else np.asarray(weights, dtype=float)
+        sequences, terminal = self._walk(rng, n_sequences, max_length, weights)
+        rejected = np.flatnonzero(~self.is_complete(sequences, terminal))
+        for _ in range(max_attempts - 1):
+            if not rejected.size:
+                break
+            redrawn, terminal = self._walk(rng, len(rejected), max_length, weights)
+            sequences[rejected] = redrawn
+            rejected = rejected[~self.is_complete(redrawn, terminal)]
+        if rejected.size:
+            raise ValueError(
+                f"{rejected.size} of {n_sequences} walks found no terminal, B6-complete firing sequence "
+                f"within {max_length} events after {max_attempts} attempts"
+            )
+        return sequences
@@ -0,0 +1,218 @@
+
+import math
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+
+from .layer_d import LayerD
+
+
+@dataclass
+class ScoreGradientResult:
+    """
+    Gradient of Score_SIM (Eq 27) with respect to the template parameters.
+    Surgit/step keyed dicts contain every template entry; entries that do not
+    influence the trace are 0.0.
+    """
+    score: float
+    d_intrinsic_deviation: Dict[str, float] = field(default_factory=dict)
+    d_mitigation_factor: Dict[str, float] = field(default_factory=dict)
+    d_weight_wt: Dict[str, float] = field(default_factory=dict)
+    d_q: float = 0.0
+    d_alpha: float = 0.0
+    d_beta: float = 0.0
+
+
+class ScoreGradient:
+    """
+    Reverse-mode differentiation of the Layer A -> A' -> D scoring chain.
+    One forward sweep records the intermediates of the scoring pass and one
+    backward sweep propagates dScore through them, so the full gradient costs
+    about two scoring passes regardless of the number of parameters.
+    """
+
+    @staticmethod
+    def step_entropy_partials(pi_t: float, q: float) -> Tuple[float, float]:
+        """
+        Partial derivatives of D3 S_q(t) with respect to pi_t and q.
+        Boundary cases follow LayerD.calculate_step_entropy (q=1 clamps to 0).
+        """
+        delta_t = 1.0 - pi_t
+        if q == 1.0:
+            if pi_t <= 0 or delta_t <= 0:
+                return 0.0, 0.0
+            ln_pi, ln_delta = math.log(pi_t), math.log(delta_t)
+            d_pi = ln_delta - ln_pi
+            # Limit of dS_q/dq at q->1: -1/2 * sum p * ln(p)^2
+            d_q = -0.5 * (pi_t * ln_pi ** 2 + delta_t * ln_delta ** 2)
+            return d_pi, d_q
+
+        def _pow_deriv(p: float) -> float:
+            # d(p^q)/dp / q = p^(q-1); diverges at p=0 for q<1
+            if p <= 0.0:
+                return 0.0 if q > 1.0 else math.inf
+            return p ** (q - 1.0)
+
+        def _plogp(p: float) -> float:
+            return p ** q * math.log(p) if p > 0.0 else 0.0
+
+        d_pi = -q * (_pow_deriv(pi_t) - _pow_deriv(delta_t)) / (q - 1.0)
+        f = 1.0 - (pi_t ** q + delta_t ** q)
+        f_prime = -(_plogp(pi_t) + _plogp(delta_t))
+        d_q = (f_prime * (q - 1.0) - f) / (q - 1.0) ** 2
+        return d_pi, d_q
+
+    @staticmethod
+    def q_sum_partials(step_entropies: List[float], q: float) -> Tuple[List[float], float]:
+        """
+        Partial derivatives of D5 S_q(SIM) with respect to each S_q(t) and q.
+        """
+        if not step_entropies:
+            return [], 0.0
+
+        prefix = [step_entropies[0]]
+        for s_t in step_entropies[1:]:
+            prefix.append(LayerD.q_add(prefix[-1], s_t, q))
+
+        grads = [0.0] * len(step_entropies)
+        d_q = 0.0
+        adj = 1.0
+        for k in range(len(step_entropies) - 1, 0, -1):
+            s_prev, x_k = prefix[k - 1], step_entropies[k]
+            grads[k] = adj * (1.0 + (1.0 - q) * s_prev)
+            d_q += adj * (-s_prev * x_k)
+            adj *= 1.0 + (1.0 - q) * x_k
+        grads[0] = adj
+        return grads, d_q
+
+    @staticmethod
+    def compute(
+        trace_events: List[Any],
+        template: Any,
+        factor_mask: Optional[Dict[str, bool]] = None
+    ) -> ScoreGradientResult:
+        """
+        Returns Score_SIM and dScore/dtheta for every surgit's intrinsic_deviation
+        and mitigation_factor, every step's weight_wt, and q, alpha, beta.
+        Mirrors the per-event logic of RunSimulation._run_single_pass.
+        """
+        q = template.tsallis_q
+        alpha = template.weight_alpha
+        beta = template.weight_beta
+        use_pat = factor_mask.get('patient', True) if factor_mask else True
+        use_ext = factor_mask.get('external', True) if factor_mask else True
+
+        surgit_to_step = {
+            s_id: step_id
+            for step_id, step in template.steps.items()
+            for s_id in step.surgits
+        }
+
+        # 1. Forward sweep (record intermediates)
+        records = []  # (surgit, step_id, x, exponent, delta_tot, sigma, scope, C_i)
+        step_order: Dict[str, List[int]] = {}
+        cumulative_sigma_res = 1.0
+        for event in trace_events:
+            if getattr(event, 'is_pause', False):
+                continue
+            step_id = surgit_to_step.get(event.surgit_id)
+            if step_id is None:
+                continue
+            surgit = template.steps[step_id].surgits[event.surgit_id]
+
+            n_t = event.noise_patient if use_pat else 1.0
+            e_t = event.noise_external if use_ext else 1.0
+            if n_t < 1.0 or e_t < 1.0:
+                raise ValueError("Noise factors n_t and e_t must be >= 1.0")
+            exponent = n_t * e_t
+            x = 1.0 - surgit.intrinsic_deviation
+            delta_tot = 1.0 - x ** exponent
+
+            sigma = surgit.mitigation_factor
+            scope = surgit.security_scope
+            sigma_effective = cumulative_sigma_res
+            if scope in ("imm", "res"):
+                sigma_effective *= sigma
+
+            step_order.setdefault(step_id, []).append(len(records))
+            records.append({
+                'surgit': surgit, 'x': x, 'exponent': exponent,
+                'delta_tot': delta_tot, 'sigma': sigma, 'scope': scope,
+                'c_in': cumulative_sigma_res,
+                'delta_final': sigma_effective * delta_tot,
+            })
+            if scope == "res":
+                cumulative_sigma_res *= sigma
+
+        step_ids = list(step_order)
+        pis, entropies, weights = [], [], []
+        for s_id in step_ids:
+            pi_t = LayerD.calculate_step_linearity(
+                [records[i]['delta_final'] for i in step_order[s_id]]
+            )
+            pis.append(pi_t)
+            entropies.append(LayerD.calculate_step_entropy(pi_t, q))
+            weights.append(template.steps[s_id].weight_wt)
+
+        rho_sim = sum(w * (1.0 - p) for w, p in zip(weights, pis))
+        s_q_sim = LayerD.calculate_global_entropy(entropies, q)
+        score = LayerD.calculate_global_score(rho_sim, s_q_sim, alpha, beta)
+
+        result = ScoreGradientResult(
+            score=score,
+            d_intrinsic_deviation={s: 0.0 for s in surgit_to_step},
+            d_mitigation_factor={s: 0.0 for s in surgit_to_step},
+            d_weight_wt={s: 0.0 for s in template.steps},
+            d_alpha=rho_sim,
+            d_beta=s_q_sim,
+        )
+
+        # 2. Backward sweep
+        d_entropies, d_q = ScoreGradient.q_sum_partials(entropies, q)
+        d_q *= beta
+        d_delta_final = [0.0] * len(records)
+        for t, s_id in enumerate(step_ids):
+            result.d_weight_wt[s_id] = alpha * (1.0 - pis[t])
+            s_d_pi, s_d_q = ScoreGradient.step_entropy_partials(pis[t], q)
+            d_q += beta * d_entropies[t] * s_d_q
+            d_pi = -alpha * weights[t] + beta * d_entropies[t] * s_d_pi
+
+            # d pi_t / d delta_i = -prod_{j != i}(1 - delta_j), via prefix/suffix products
+            idx = step_order[s_id]
+            factors = [1.0 - records[i]['delta_final'] for i in idx]
+            prefix = [1.0]
+            for f in factors[:-1]:
+                prefix.append(prefix[-1] * f)
+            suffix = 1.0
+            for j in range(len(idx) - 1, -1, -1):
+                d_delta_final[idx[j]] = -d_pi * prefix[j] * suffix
+                suffix *= factors[j]
+        result.d_q = d_q
+
+        # A' cumulative residual mitigation is a running product: reverse through it
+        d_c_next = 0.0
+        for i in range(len(records) - 1, -1, -1):
+            rec = records[i]
+            s_id = rec['surgit'].id
+            mitigates = rec['scope'] in ("imm", "res")
+            d_sigma_effective = d_delta_final[i] * rec['delta_tot']
+            own = rec['sigma'] if mitigates else 1.0
+
+            d_sigma = d_sigma_effective * rec['c_in'] if mitigates else 0.0
+            d_c_in = d_sigma_effective * own
+            if rec['scope'] == "res":
+                d_sigma += d_c_next * rec['c_in']
+                d_c_in += d_c_next * rec['sigma']
+            else:
+                d_c_in += d_c_next
+            d_c_next = d_c_in
+            result.d_mitigation_factor[s_id] += d_sigma
+
+            # delta_tot = 1 - (1 - delta_intr)^E
+            d_tot_d_intr = rec['exponent'] * rec['x'] ** (rec['exponent'] - 1.0) if rec['x'] > 0.0 else (
+                1.0 if rec['exponent'] == 1.0 else 0.0
+            )
+            result.d_intrinsic_deviation[s_id] += (
+                d_delta_final[i] * rec['c_in'] * own * d_tot_d_intr
+            )
+
+        return result
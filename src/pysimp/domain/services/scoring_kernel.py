@@ -0,0 +1,147 @@
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional, Tuple
+
+from .layer_d import LayerD
+
+SCOPE_CODES = {"imm": 0, "res": 1, "pcp": 2}
+
+
+@dataclass
+class KernelResult:
+    """
+    Layer A/A'/D outputs for a batch of B traces over the T template steps.
+    Steps a trace never executed have pi_t = 1 and contribute nothing.
+    """
+    delta_final: np.ndarray   # (B, L)
+    pi_t: np.ndarray          # (B, T)
+    delta_t: np.ndarray       # (B, T)
+    s_q_t: np.ndarray         # (B, T)
+    executed: np.ndarray      # (B, T) bool
+    rho: np.ndarray           # (B,)
+    entropy: np.ndarray       # (B,)
+    score: np.ndarray         # (B,)
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledTemplate:
+    """
+    NormativeTemplate parameters flattened into surgit-indexed arrays so that
+    Layers A, A' and D score whole cohorts with array operations.
+    Events are encoded as surgit indices; -1 marks pauses, padding and surgits
+    unknown to the template (all skipped by scoring, as in RunSimulation).
+    """
+    surgit_ids: Tuple[str, ...]
+    step_ids: Tuple[str, ...]
+    surgit_step: np.ndarray          # (S,) step index
+    intrinsic_deviation: np.ndarray  # (S,)
+    mitigation_factor: np.ndarray    # (S,)
+    scope: np.ndarray                # (S,) SCOPE_CODES
+    step_weights: np.ndarray         # (T,)
+    q: float
+    alpha: float
+    beta: float
+
+    @staticmethod
+    def from_template(template: Any) -> "CompiledTemplate":
+        surgit_ids, surgit_step, intrinsic, mitigation, scope = [], [], [], [], []
+        for t, step in enumerate(template.steps.values()):
+            for s_id, surgit in step.surgits.items():
+                if s_id in surgit_ids:
+                    continue  # get_surgit resolves duplicates to the first step
+                surgit_ids.append(s_id)
+                surgit_step.append(t)
+                intrinsic.append(surgit.intrinsic_deviation)
+                mitigation.append(surgit.mitigation_factor)
+                scope.append(SCOPE_CODES[getattr(surgit.security_scope, 'value', surgit.security_scope)])
+        return CompiledTemplate(
+            surgit_ids=tuple(surgit_ids),
+            step_ids=tuple(template.steps),
+            surgit_step=np.array(surgit_step, dtype=np.int64),
+            intrinsic_deviation=np.array(intrinsic, dtype=float),
+            mitigation_factor=np.array(mitigation, dtype=float),
+            scope=np.array(scope, dtype=np.int64),
+            step_weights=np.array([s.weight_wt for s in template.steps.values()], dtype=float),
+            q=template.tsallis_q,
+            alpha=template.weight_alpha,
+            beta=template.weight_beta
+        )
+
+    def surgit_index(self, surgit_ids: Iterable[str]) -> np.ndarray:
+        index = {s: i for i, s in enumerate(self.surgit_ids)}
+        return np.array([index.get(s, -1) for s in surgit_ids], dtype=np.int64)
+
+    def encode_events(self, events: Iterable[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (surgit index, n_t, e_t) arrays for one trace; pauses encode as -1.
+        """
+        events = list(events)
+        surgits = self.surgit_index(
+            [None if getattr(e, 'is_pause', False) else e.surgit_id for e in events]
+        )
+        n_t = np.array([e.noise_patient for e in events], dtype=float)
+        e_t = np.array([e.noise_external for e in events], dtype=float)
+        return surgits, n_t, e_t
+
+    def deviations(
+        self, surgits: np.ndarray, n_t: np.ndarray, e_t: np.ndarray, carried: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Layers A and A' over (B, L) event arrays: delta_final and the residual
+        mitigation carried into each event (exclusive running product).
+        A known `carried` (any shape matching the events) is used as is.
+        """
+        valid = surgits >= 0
+        if np.any(valid & ((n_t < 1.0) | (e_t < 1.0))):
+            raise ValueError("Noise factors n_t and e_t must be >= 1.0")
+        idx = np.where(valid, surgits, 0)
+
+        # Layer A (Eq 5)
+        delta_tot = 1.0 - (1.0 - self.intrinsic_deviation[idx]) ** (n_t * e_t)
+
+        # Layer A': residual mitigation carries forward
+        scope = self.scope[idx]
+        sigma = self.mitigation_factor[idx]
+        if carried is None:
+            residual = np.where(valid & (scope == SCOPE_CODES["res"]), sigma, 1.0)
+            carried = np.cumprod(residual, axis=1)
+            carried = np.concatenate([np.ones((len(carried), 1)), carried[:, :-1]], axis=1)
+        own = np.where(valid & (scope != SCOPE_CODES["pcp"]), sigma, 1.0)
+        return np.where(valid, carried * own * delta_tot, 0.0), carried
+
+    def score_cohort(self, surgits: np.ndarray, n_t: np.ndarray, e_t: np.ndarray) -> KernelResult:
+        """
+        Scores (B, L) padded event arrays in one vectorized pass.
+        """
+        surgits = np.atleast_2d(np.asarray(surgits, dtype=np.int64))
+        n_t = np.atleast_2d(np.asarray(n_t, dtype=float))
+        e_t = np.atleast_2d(np.asarray(e_t, dtype=float))
+        valid = surgits >= 0
+        idx = np.where(valid, surgits, 0)
+        delta_final, _ = self.deviations(surgits, n_t, e_t)
+
+        # Layer D (D1-D7)
+        B, T = len(surgits), len(self.step_ids)
+        rows = np.nonzero(valid)[0]
+        steps = self.surgit_step[idx[valid]]
+        pi_t = np.ones((B, T))
+        np.multiply.at(pi_t, (rows, steps), 1.0 - delta_final[valid])
+        executed = np.zeros((B, T), dtype=bool)
+        executed[rows, steps] = True
+
+        delta_t = 1.0 - pi_t
+        s_q_t = LayerD.calculate_step_entropy_array(pi_t, self.q)
+        entropy = LayerD.calculate_global_entropy_array(s_q_t, self.q)
+        rho = delta_t @ self.step_weights
+        score = LayerD.calculate_global_score(rho, entropy, self.alpha, self.beta)
+        return KernelResult(
+            delta_final=delta_final, pi_t=pi_t, delta_t=delta_t, s_q_t=s_q_t,
+            executed=executed, rho=rho, entropy=entropy, score=score
+        )
+
+    def score_events(self, events: Iterable[Any]) -> KernelResult:
+        """
+        Single-trace convenience around encode_events + score_cohort.
+        """
+        return self.score_cohort(*self.encode_events(events))
@@ -0,0 +1,132 @@
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from pysimp.application.interfaces.observer import SimulationObserver
+
+# Bucket upper bounds in ns: 1 us doubling up to ~67 s; one overflow bucket after
+BUCKET_BOUNDS_NS = tuple(1000 << i for i in range(27))
+
+
+class LatencyHistogram:
+    """
+    Log2-bucketed latency distribution of one span name.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_NS) + 1)
+        self.n = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, elapsed_ns: int) -> None:
+        self.counts[bisect_left(BUCKET_BOUNDS_NS, elapsed_ns)] += 1
+        self.n += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound (seconds) of the bucket holding the q-quantile, capped at the observed max.
+        """
+        if not self.n:
+            return 0.0
+        rank, seen = q * self.n, 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                bound = BUCKET_BOUNDS_NS[bucket] if bucket < len(BUCKET_BOUNDS_NS) else self.max_ns
+                return min(bound, self.max_ns) / 1e9
+        return self.max_ns / 1e9
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """
+        Non-empty (upper bound seconds, count) pairs; the overflow bucket reports inf.
+        """
+        return [
+            (BUCKET_BOUNDS_NS[b] / 1e9 if b < len(BUCKET_BOUNDS_NS) else float("inf"), c)
+            for b, c in enumerate(self.counts) if c
+        ]
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.n += other.n
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+
+class _Span:
+    __slots__ = ("_observer", "_name", "_start")
+
+    def __init__(self, observer: "LatencyHistogramObserver", name: str):
+        self._observer = observer
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self._observer.record(self._name, time.perf_counter_ns() - self._start)
+        return False
+
+
+class LatencyHistogramObserver(SimulationObserver):
+    """
+    Aggregates spans into per-layer LatencyHistograms and sums counters.
+    Thread-safe; summary() gives a JSON-ready per-layer latency view.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.counters: Dict[str, int] = {}
+
+    def span(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    def record(self, name: str, elapsed_ns: int) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(elapsed_ns)
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def histogram(self, name: str) -> Optional[LatencyHistogram]:
+        return self.histograms.get(name)
+
+    def merge(self, other: "LatencyHistogramObserver") -> None:
+        """
+        Folds another observer in (e.g. one per worker process).
+        """
+        with self._lock:
+            for name, histogram in other.histograms.items():
+                self.histograms.setdefault(name, LatencyHistogram()).merge(histogram)
+            for name, value in other.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def summary(self, quantiles: Tuple[float, ...] = (0.5, 0.95, 0.99)) -> Dict[str, Dict]:
+        with self._lock:
+            layers = {
+                name: {
+                    "n": h.n,
+                    "mean_s": h.total_ns / h.n / 1e9 if h.n else 0.0,
+                    "max_s": h.max_ns / 1e9,
+                    **{f"p{round(q * 100)}_s": h.quantile(q) for q in quantiles},
+                    "buckets": h.buckets(),
+                }
+                for name, h in sorted(self.histograms.items())
+            }
+            return {"spans": layers, "counters": dict(sorted(self.counters.items()))}
@@ -1,19 +1,41 @@
-import snakes.plugins
-snakes.plugins.load('gv', 'snakes.nets', 'nets')
-from snakes.nets import PetriNet, Place, Transition, Value, Variable
+from ...application.interfaces.observer import NULL_OBSERVER, SimulationObserver
 from ...domain.services.layer_b import LayerB
-from typing import List, Any, Set
+from typing import List, Any, Optional, Set, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from snakes.nets import PetriNet
+
+_nets = None
+
+def _snakes_nets():
+    """
+    Imports snakes (and loads its gv plugin) on first use instead of at import time.
+    """
+    global _nets
+    if _nets is None:
+        import snakes.plugins
+        snakes.plugins.load('gv', 'snakes.nets', 'nets')
+        import snakes.nets
+        _nets = snakes.nets
+    return _nets
 
 class SnakesLayerBAdapter(LayerB):
     """
     Adapter for Snakes library to validate Petri Net structures.
     Implements SIM v1.2.0 Layer B: Normative Structural Layer.
+    The observer receives layer_b.build_net / layer_b.replay spans and the
+    transitions_fired counter.
     """
 
-    def _build_net(self, template: Any) -> PetriNet:
+    def __init__(self, observer: Optional[SimulationObserver] = None):
+        self.observer = observer or NULL_OBSERVER
+
+    def _build_net(self, template: Any) -> "PetriNet":
         """
         Builds a Snakes PetriNet from the template definition (B1, B2).
         """
+        nets = _snakes_nets()
+        PetriNet, Place, Transition, Value = nets.PetriNet, nets.Place, nets.Transition, nets.Value
         net = PetriNet('ProcedureNet')
         definition = template.structure_definition
         
@@ -59,15 +81,14 @@ class SnakesLayerBAdapter(LayerB):
         2. Forbidden States (B12)
         3. Mandatory Transitions (B6 - Computed at end)
         """
+        observer = self.observer
         try:
-            net = self._build_net(template)
+            with observer.span("layer_b.build_net"):
+                net = self._build_net(template)
         except Exception as e:
             print(f"Layer B Error: Failed to build Peti Net - {e}")
             return False
 
-        # Track fired transitions for B6 (Mandatory Check)
-        fired_transitions = set()
-        
         # B12: Parse Forbidden States (List of Lists of Places that cannot be simultaneously marked)
         forbidden_markings = template.forbidden_states or [] # e.g., [['p_error', 'p_safe']]
         
@@ -76,6 +97,14 @@ class SnakesLayerBAdapter(LayerB):
             print("Layer B Violation: Initial state is forbidden.")
             return False
 
+        with observer.span("layer_b.replay"):
+            return self._replay(net, trace_events, template, forbidden_markings)
+
+    def _replay(self, net: "PetriNet", trace_events: List[Any], template: Any, forbidden_markings: List[List[str]]) -> bool:
+        observer = self.observer
+        # Track fired transitions for B6 (Mandatory Check)
+        fired_transitions = set()
+
         # Attempt to fire transitions in order (B11)
         for event in trace_events:
             t_id = event.surgit_id
@@ -97,6 +126,7 @@ class SnakesLayerBAdapter(LayerB):
             # Fire!
             transition.fire(modes[0])
             fired_transitions.add(t_id)
+            observer.count("transitions_fired")
             
             # Check B12: Forbidden States after firing
             if self._is_forbidden(net, forbidden_markings):
@@ -115,7 +145,7 @@ class SnakesLayerBAdapter(LayerB):
             
         return True
 
-    def _is_forbidden(self, net: PetriNet, forbidden_markings: List[List[str]]) -> bool:
+    def _is_forbidden(self, net: "PetriNet", forbidden_markings: List[List[str]]) -> bool:
         """
         Checks if current network marking matches any forbidden state definition.
         A forbidden state (list of places) is matched if ALL places in the list have at least one token.
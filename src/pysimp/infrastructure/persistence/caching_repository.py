@@ -0,0 +1,205 @@
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pysimp.application.interfaces.repository import TraceFilter, TraceRepository
+from pysimp.domain.entities.trace import SurgicalTrace
+
+# Rough CPython footprint of a SurgitEvent / SurgicalTrace without their strings
+EVENT_OVERHEAD_BYTES = 900
+TRACE_OVERHEAD_BYTES = 600
+
+
+def estimate_trace_bytes(trace: SurgicalTrace) -> int:
+    """
+    Approximate resident size of a trace: fixed per-object overheads plus strings.
+    """
+    size = TRACE_OVERHEAD_BYTES + sys.getsizeof(trace.procedure_id) + sys.getsizeof(trace.patient_id)
+    for event in trace.events:
+        size += EVENT_OVERHEAD_BYTES + sys.getsizeof(event.surgit_id)
+        size += sum(sys.getsizeof(tag) for tag in event.risk_tags)
+    return size + TRACE_OVERHEAD_BYTES * len(trace.outcomes)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class CachingTraceRepository(TraceRepository):
+    """
+    Read-through LRU cache in front of any TraceRepository, bounded by the
+    estimated bytes of the cached traces. Saves go to the backend first and
+    then either refresh the cached entry (write_through) or drop it.
+    Entries older than ttl seconds are treated as misses. Backend reads run
+    outside the lock, so a miss only caches what it fetched if no save or
+    invalidate touched that ID since the read began (write generations).
+    """
+
+    def __init__(
+        self,
+        backend: TraceRepository,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: Optional[float] = None,
+        write_through: bool = True,
+        size_of: Callable[[SurgicalTrace], int] = estimate_trace_bytes,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.write_through = write_through
+        self._size_of = size_of
+        self._clock = clock
+        self._lock = threading.Lock()
+        # trace_id -> (trace, size, stored_at); order is least -> most recently used
+        self._entries: "OrderedDict[str, Tuple[SurgicalTrace, int, float]]" = OrderedDict()
+        self._stats = CacheStats()
+        # Write generations: bumped by every save/invalidate, recorded per ID
+        # (or as _epoch for a full invalidate) while backend reads are in flight
+        self._generation = 0
+        self._epoch = 0
+        self._written: Dict[str, int] = {}
+        self._reading = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(**self._stats.__dict__)
+
+    def _lookup(self, trace_id: str) -> Optional[SurgicalTrace]:
+        entry = self._entries.get(trace_id)
+        if entry is not None and self.ttl is not None and self._clock() - entry[2] > self.ttl:
+            self._discard(trace_id)
+            self._stats.expirations += 1
+            entry = None
+        if entry is None:
+            self._stats.misses += 1
+            return None
+        self._entries.move_to_end(trace_id)
+        self._stats.hits += 1
+        return entry[0]
+
+    def _discard(self, trace_id: str) -> None:
+        entry = self._entries.pop(trace_id, None)
+        if entry is not None:
+            self._stats.bytes -= entry[1]
+            self._stats.entries -= 1
+
+    def _store(self, trace: SurgicalTrace) -> None:
+        size = self._size_of(trace)
+        self._discard(trace.procedure_id)
+        if size > self.max_bytes:
+            return
+        self._entries[trace.procedure_id] = (trace, size, self._clock())
+        self._stats.bytes += size
+        self._stats.entries += 1
+        while self._stats.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self._stats.evictions += 1
+
+    def _written_since(self, trace_id: str, generation: int) -> bool:
+        return self._epoch > generation or self._written.get(trace_id, -1) > generation
+
+    def _bump(self, trace_ids: Iterable[str]) -> None:
+        self._generation += 1
+        if self._reading:
+            for trace_id in trace_ids:
+                self._written[trace_id] = self._generation
+
+    def _fetch(self, trace_ids: List[str]) -> List[Optional[SurgicalTrace]]:
+        """
+        Reads misses from the backend and caches those not written meanwhile.
+        """
+        with self._lock:
+            generation = self._generation
+            self._reading += 1
+        fetched: List[Optional[SurgicalTrace]] = []
+        try:
+            if len(trace_ids) == 1:
+                fetched = [self.backend.get_trace(trace_ids[0])]
+            else:
+                fetched = self.backend.get_traces(trace_ids)
+        finally:
+            with self._lock:
+                for trace_id, trace in zip(trace_ids, fetched):
+                    if trace is not None and not self._written_since(trace_id, generation):
+                        self._store(trace)
+                self._reading -= 1
+                if not self._reading:
+                    self._written.clear()
+        return fetched
+
+    def get_trace(self, trace_id: str) -> Optional[SurgicalTrace]:
+        with self._lock:
+            trace = self._lookup(trace_id)
+        if trace is None:
+            trace = self._fetch([trace_id])[0]
+        return trace
+
+    def get_traces(self, trace_ids: Iterable[str]) -> List[Optional[SurgicalTrace]]:
+        """
+        Cached traces are served directly; all misses go to the backend in one get_traces call.
+        """
+        trace_ids = list(trace_ids)
+        with self._lock:
+            found: Dict[str, Optional[SurgicalTrace]] = {}
+            for trace_id in trace_ids:
+                if trace_id not in found:
+                    found[trace_id] = self._lookup(trace_id)
+        missing = [trace_id for trace_id, trace in found.items() if trace is None]
+        if missing:
+            found.update(zip(missing, self._fetch(missing)))
+        return [found[trace_id] for trace_id in trace_ids]
+
+    def save_trace(self, trace: SurgicalTrace) -> None:
+        self.save_traces([trace])
+
+    def save_traces(self, traces: Iterable[SurgicalTrace]) -> None:
+        traces = list(traces)
+        self.backend.save_traces(traces)
+        with self._lock:
+            self._bump(trace.procedure_id for trace in traces)
+            for trace in traces:
+                if self.write_through:
+                    self._store(trace)
+                else:
+                    self._discard(trace.procedure_id)
+
+    def trace_ids(self) -> List[str]:
+        return self.backend.trace_ids()
+
+    def iter_traces(self, filter: Optional[TraceFilter] = None, batch_size: int = 1000) -> Iterator[SurgicalTrace]:
+        """
+        Full scans stream from the backend and bypass the cache.
+        """
+        return self.backend.iter_traces(filter, batch_size)
+
+    def invalidate(self, trace_id: Optional[str] = None) -> None:
+        """
+        Drops one cached trace, or everything when trace_id is None.
+        """
+        with self._lock:
+            if trace_id is not None:
+                self._bump([trace_id])
+                self._discard(trace_id)
+            else:
+                self._generation += 1
+                self._epoch = self._generation
+                self._entries.clear()
+                self._stats.entries = self._stats.bytes = 0
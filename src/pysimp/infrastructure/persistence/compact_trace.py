@@ -0,0 +1,206 @@
+
+import struct
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import orjson
+
+from pysimp.domain.entities.trace import SurgicalTrace
+from pysimp.infrastructure.persistence.trace_codec import (
+    NAIVE, decode_span, encode_span, pack_flags, unpack_flags
+)
+
+# Serialized layout (EncodedTrace.to_bytes)
+COLUMNS = ("surgits", "start_deltas", "durations", "flags", "n_t", "e_t",
+           "offsets", "complexity", "tag_codes", "tag_bounds", "end_offsets")
+_DTYPES = (None,) + tuple(np.dtype(d) for d in (np.int8, np.int16, np.int32, np.int64, np.uint8, np.float32, np.float64))
+_DTYPE_CODE = {d: i for i, d in enumerate(_DTYPES) if d is not None}
+# events, tags, len(procedure_id), len(patient_id), len(outcomes), start_base
+_HEADER = struct.Struct("<IIHHIq")
+
+
+def _narrow(values: Iterable[int]) -> np.ndarray:
+    """
+    Smallest signed integer dtype that holds every value.
+    """
+    values = np.asarray(list(values) if not isinstance(values, np.ndarray) else values, dtype=np.int64)
+    if not len(values):
+        return values.astype(np.int8)
+    low, high = int(values.min()), int(values.max())
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+class TraceDictionary:
+    """
+    Append-only string <-> integer code dictionary.
+    """
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, values: Iterable[str]) -> List[int]:
+        out = []
+        for value in values:
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.values)
+                self.values.append(value)
+            out.append(code)
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return sum(sys.getsizeof(v) for v in self.values) + sys.getsizeof(self.codes) + sys.getsizeof(self.values)
+
+
+@dataclass(eq=False)
+class EncodedTrace:
+    """
+    Column form of one SurgicalTrace (one array element per event).
+    Optional columns are None when every event has the default value.
+    Stored as its to_bytes() buffer; decoding works on views into it.
+    """
+    procedure_id: str
+    patient_id: str
+    surgits: np.ndarray                      # surgit dictionary codes
+    start_deltas: np.ndarray                 # us since the previous start (start_base for the first)
+    durations: np.ndarray                    # us elapsed between the start and end instants
+    flags: np.ndarray                        # uint8 trace_codec.pack_flags
+    n_t: np.ndarray
+    e_t: np.ndarray
+    offsets: Optional[np.ndarray] = None     # UTC offset seconds (NAIVE if none)
+    complexity: Optional[np.ndarray] = None  # NaN = None
+    tag_codes: Optional[np.ndarray] = None   # tag dictionary codes, all events concatenated
+    tag_bounds: Optional[np.ndarray] = None  # (E + 1,) prefix offsets into tag_codes
+    outcomes: Optional[bytes] = None         # orjson list of outcome dicts
+    end_offsets: Optional[np.ndarray] = None # end UTC offsets, when any differs from the start's
+    start_base: int = 0                      # us; absolute start of the first event
+
+    def __len__(self) -> int:
+        return len(self.flags)
+
+    def to_bytes(self) -> bytes:
+        """
+        One contiguous buffer: fixed header, dtype code per column (0 = absent),
+        ids, outcomes, then the raw column data in COLUMNS order.
+        """
+        ids = self.procedure_id.encode(), self.patient_id.encode()
+        outcomes = self.outcomes or b""
+        columns = [getattr(self, name) for name in COLUMNS]
+        n_tags = len(self.tag_codes) if self.tag_codes is not None else 0
+        header = _HEADER.pack(len(self), n_tags, len(ids[0]), len(ids[1]), len(outcomes), self.start_base)
+        codes = bytes(0 if c is None else _DTYPE_CODE[c.dtype] for c in columns)
+        return b"".join([header, codes, ids[0], ids[1], outcomes] + [c.tobytes() for c in columns if c is not None])
+
+    @staticmethod
+    def from_bytes(blob: bytes) -> "EncodedTrace":
+        """
+        Inverse of to_bytes; columns are read-only views into blob.
+        """
+        n_events, n_tags, id_len, patient_len, outcomes_len, start_base = _HEADER.unpack_from(blob)
+        offset = _HEADER.size
+        codes = blob[offset:offset + len(COLUMNS)]
+        offset += len(COLUMNS)
+        procedure_id = blob[offset:offset + id_len].decode()
+        offset += id_len
+        patient_id = blob[offset:offset + patient_len].decode()
+        offset += patient_len
+        outcomes = blob[offset:offset + outcomes_len] or None
+        offset += outcomes_len
+        lengths = {"tag_codes": n_tags, "tag_bounds": n_events + 1}
+        values = {}
+        for name, code in zip(COLUMNS, codes):
+            if code:
+                dtype = _DTYPES[code]
+                count = lengths.get(name, n_events)
+                values[name] = np.frombuffer(blob, dtype=dtype, count=count, offset=offset)
+                offset += dtype.itemsize * count
+        return EncodedTrace(procedure_id, patient_id, outcomes=outcomes, start_base=start_base, **values)
+
+
+class CompactTraceCodec:
+    """
+    SurgicalTrace <-> EncodedTrace with shared surgit and risk-tag dictionaries.
+    Deviation causes and surgit types are enum codes inside the flags byte.
+    noise_dtype float32 halves the noise columns at the cost of exact n_t/e_t.
+    """
+
+    def __init__(self, noise_dtype=np.float64):
+        self.noise_dtype = np.dtype(noise_dtype)
+        self.surgits = TraceDictionary()
+        self.tags = TraceDictionary()
+
+    def encode(self, trace: SurgicalTrace) -> EncodedTrace:
+        events = trace.events
+        starts, durations, offsets, end_offsets = [], [], [], []
+        for event in events:
+            start, offset, duration, end_offset = encode_span(event.timestamp_start, event.timestamp_end)
+            starts.append(start)
+            durations.append(duration)
+            offsets.append(NAIVE if offset is None else offset)
+            end_offsets.append(end_offset)
+        starts = np.array(starts, dtype=np.int64)
+        start_base = int(starts[0]) if len(starts) else 0
+        tags = [event.risk_tags for event in events]
+        weights = [event.complexity_weight for event in events]
+        return EncodedTrace(
+            procedure_id=trace.procedure_id,
+            patient_id=trace.patient_id,
+            surgits=_narrow(self.surgits.encode(e.surgit_id for e in events)),
+            start_deltas=_narrow(np.diff(starts, prepend=start_base)),
+            durations=_narrow(durations),
+            flags=np.array([pack_flags(e.surgit_type, e.deviation_cause, e.is_deviation, e.is_pause)
+                            for e in events], dtype=np.uint8),
+            n_t=np.array([e.noise_patient for e in events], dtype=self.noise_dtype),
+            e_t=np.array([e.noise_external for e in events], dtype=self.noise_dtype),
+            offsets=None if all(o == NAIVE for o in offsets) else np.array(offsets, dtype=np.int32),
+            complexity=None if all(w is None for w in weights)
+            else np.array([np.nan if w is None else w for w in weights], dtype=np.float64),
+            tag_codes=_narrow(self.tags.encode(t for ts in tags for t in ts)) if any(tags) else None,
+            tag_bounds=_narrow(np.cumsum([0] + [len(ts) for ts in tags])) if any(tags) else None,
+            outcomes=orjson.dumps([o.model_dump() for o in trace.outcomes]) if trace.outcomes else None,
+            start_base=start_base,
+            end_offsets=None if all(o is None for o in end_offsets)
+            else np.array([offsets[k] if o is None else o for k, o in enumerate(end_offsets)], dtype=np.int32),
+        )
+
+    def decode(self, encoded: EncodedTrace) -> SurgicalTrace:
+        starts = encoded.start_base + np.cumsum(encoded.start_deltas, dtype=np.int64)
+        durations = encoded.durations.tolist()
+        starts = starts.tolist()
+        offsets = encoded.offsets.tolist() if encoded.offsets is not None else [NAIVE] * len(encoded)
+        end_offsets = encoded.end_offsets.tolist() if encoded.end_offsets is not None else offsets
+        complexity = encoded.complexity.tolist() if encoded.complexity is not None else [None] * len(encoded)
+        bounds = encoded.tag_bounds.tolist() if encoded.tag_bounds is not None else None
+        tag_codes = encoded.tag_codes.tolist() if encoded.tag_codes is not None else None
+        surgit_names = self.surgits.values
+        tag_names = self.tags.values
+
+        events = []
+        for k, (code, flags, n_t, e_t) in enumerate(zip(
+            encoded.surgits.tolist(), encoded.flags.tolist(), encoded.n_t.tolist(), encoded.e_t.tolist()
+        )):
+            surgit_type, cause, is_deviation, is_pause = unpack_flags(flags)
+            offset = None if offsets[k] == NAIVE else offsets[k]
+            start, end = decode_span(starts[k], offset, durations[k], end_offsets[k])
+            weight = complexity[k]
+            events.append({
+                "surgit_id": surgit_names[code],
+                "timestamp_start": start, "timestamp_end": end,
+                "surgit_type": surgit_type, "deviation_cause": cause,
+                "is_deviation": is_deviation, "is_pause": is_pause,
+                "n_t": n_t, "e_t": e_t,
+                "complexity_weight": None if weight is None or weight != weight else weight,
+                "risk_tags": [tag_names[c] for c in tag_codes[bounds[k]:bounds[k + 1]]] if bounds else [],
+            })
+        return SurgicalTrace.model_validate({
+            "procedure_id": encoded.procedure_id, "patient_id": encoded.patient_id, "events": events,
+            "outcomes": orjson.loads(encoded.outcomes) if encoded.outcomes else [],
+        })
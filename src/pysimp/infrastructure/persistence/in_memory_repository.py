@@ -1,14 +1,108 @@
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
-from typing import Dict, Optional
-from pysimp.application.interfaces.repository import TraceRepository
+import numpy as np
+
+from pysimp.application.interfaces.repository import TraceFilter, TraceRepository
 from pysimp.domain.entities.trace import SurgicalTrace
+from pysimp.infrastructure.persistence.caching_repository import estimate_trace_bytes
+from pysimp.infrastructure.persistence.compact_trace import CompactTraceCodec, EncodedTrace
 
 class InMemoryTraceRepository(TraceRepository):
-    def __init__(self):
-        self._traces: Dict[str, SurgicalTrace] = {}
+    """
+    Dict-backed TraceRepository. With compact=True each trace is stored as one
+    EncodedTrace buffer (dictionary-coded surgits/tags, delta-coded times,
+    noise_dtype noise) and decoded on every read; hot_entries additionally
+    zlib-compresses all but that many most recently used entries.
+    """
+    def __init__(
+        self, compact: bool = False, noise_dtype=np.float64,
+        hot_entries: Optional[int] = None, compression_level: int = 6
+    ):
+        self._traces: Dict[str, Any] = {}
+        self.compact = compact
+        if compact:
+            self._codec = CompactTraceCodec(noise_dtype)
+            self._hot: "OrderedDict[str, None]" = OrderedDict()
+            self._event_counts: Dict[str, int] = {}
+            self._lock = threading.Lock()
+        self.hot_entries = hot_entries
+        self.compression_level = compression_level
 
     def get_trace(self, trace_id: str) -> Optional[SurgicalTrace]:
-        return self._traces.get(trace_id)
+        if not self.compact:
+            return self._traces.get(trace_id)
+        with self._lock:
+            entry = self._traces.get(trace_id)
+            if entry is None:
+                return None
+            if trace_id not in self._hot:
+                entry = self._traces[trace_id] = zlib.decompress(entry)
+            self._touch(trace_id)
+        return self._codec.decode(EncodedTrace.from_bytes(entry))
 
     def save_trace(self, trace: SurgicalTrace) -> None:
-        self._traces[trace.procedure_id] = trace
+        if not self.compact:
+            self._traces[trace.procedure_id] = trace
+            return
+        with self._lock:
+            self._traces[trace.procedure_id] = self._codec.encode(trace).to_bytes()
+            self._event_counts[trace.procedure_id] = len(trace.events)
+            self._touch(trace.procedure_id)
+
+    def _touch(self, trace_id: str) -> None:
+        """
+        Marks an (uncompressed) entry most recently used and compresses the coldest overflow.
+        """
+        self._hot[trace_id] = None
+        self._hot.move_to_end(trace_id)
+        if self.hot_entries is None:
+            return
+        while len(self._hot) > self.hot_entries:
+            cold, _ = self._hot.popitem(last=False)
+            self._traces[cold] = zlib.compress(self._traces[cold], self.compression_level)
+
+    def trace_ids(self) -> List[str]:
+        return list(self._traces)
+
+    def get_traces(self, trace_ids: Iterable[str]) -> List[Optional[SurgicalTrace]]:
+        if not self.compact:
+            return list(map(self._traces.get, trace_ids))
+        return [self.get_trace(trace_id) for trace_id in trace_ids]
+
+    def save_traces(self, traces: Iterable[SurgicalTrace]) -> None:
+        if not self.compact:
+            self._traces.update((trace.procedure_id, trace) for trace in traces)
+            return
+        for trace in traces:
+            self.save_trace(trace)
+
+    def iter_traces(self, filter: Optional[TraceFilter] = None, batch_size: int = 1000) -> Iterator[SurgicalTrace]:
+        if self.compact:
+            return super().iter_traces(filter, batch_size)
+        # Snapshot so saves during iteration do not break the stream
+        traces = list(self._traces.values())
+        return iter(traces) if filter is None else (t for t in traces if filter(t))
+
+    def memory_stats(self) -> Dict[str, float]:
+        """
+        Estimated resident bytes of the stored traces (and dictionaries), per event.
+        """
+        if not self.compact:
+            events = sum(len(t.events) for t in self._traces.values())
+            total = sum(estimate_trace_bytes(t) for t in self._traces.values())
+            cold, dictionaries = 0, 0
+        else:
+            with self._lock:
+                events = sum(self._event_counts.values())
+                cold = len(self._traces) - len(self._hot)
+                dictionaries = self._codec.surgits.nbytes + self._codec.tags.nbytes
+                total = dictionaries + sum(sys.getsizeof(e) for e in self._traces.values())
+        return {
+            "traces": len(self._traces), "events": events, "cold_traces": cold,
+            "bytes": total, "dictionary_bytes": dictionaries,
+            "bytes_per_event": total / events if events else 0.0,
+        }
@@ -0,0 +1,71 @@
+
+from typing import Iterable, Iterator, List, Optional
+
+from pysimp.application.interfaces.repository import TraceFilter, TraceRepository
+from pysimp.domain.entities.trace import SurgicalTrace
+from pysimp.infrastructure.persistence.trace_index import Query, TraceIndex
+
+
+class IndexedTraceRepository(TraceRepository):
+    """
+    TraceRepository wrapper that keeps a TraceIndex in step with every save,
+    so cohort filters (surgit presence, CE events, risk tags, deviation
+    causes, pauses, outcomes) are answered from postings instead of a scan
+    of deserialized traces. Traces already in the backend are indexed once
+    at construction when the backend can enumerate them.
+    """
+
+    def __init__(self, backend: TraceRepository, index: Optional[TraceIndex] = None, batch_size: int = 1000):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.index = index or TraceIndex()
+        if index is None:
+            self.reindex()
+
+    def reindex(self) -> None:
+        """
+        Rebuilds the index from a full scan of the backend.
+        """
+        index = TraceIndex(self.index.compact_ratio)
+        try:
+            index.add_many(self.backend.iter_traces(batch_size=self.batch_size))
+        except NotImplementedError:
+            pass  # backend cannot enumerate: index only what is saved from now on
+        self.index = index
+
+    def get_trace(self, trace_id: str) -> Optional[SurgicalTrace]:
+        return self.backend.get_trace(trace_id)
+
+    def get_traces(self, trace_ids: Iterable[str]) -> List[Optional[SurgicalTrace]]:
+        return self.backend.get_traces(trace_ids)
+
+    def save_trace(self, trace: SurgicalTrace) -> None:
+        self.save_traces([trace])
+
+    def save_traces(self, traces: Iterable[SurgicalTrace]) -> None:
+        traces = list(traces)
+        self.backend.save_traces(traces)
+        self.index.add_many(traces)
+
+    def trace_ids(self) -> List[str]:
+        return self.backend.trace_ids()
+
+    def iter_traces(self, filter: Optional[TraceFilter] = None, batch_size: int = 1000) -> Iterator[SurgicalTrace]:
+        return self.backend.iter_traces(filter, batch_size)
+
+    def query(self, query: Query) -> List[str]:
+        """
+        IDs of the traces matching an index query, in indexing order.
+        """
+        return self.index.query_ids(query)
+
+    def find(self, query: Query, batch_size: Optional[int] = None) -> Iterator[SurgicalTrace]:
+        """
+        Streams the traces matching an index query, batch_size per get_traces.
+        """
+        trace_ids = self.index.query_ids(query)
+        batch_size = batch_size or self.batch_size
+        for lo in range(0, len(trace_ids), batch_size):
+            for trace in self.backend.get_traces(trace_ids[lo:lo + batch_size]):
+                if trace is not None:
+                    yield trace
@@ -0,0 +1,114 @@
+
+import orjson
+from typing import Any, Dict, List, Optional, Type
+from pydantic import BaseModel
+
+from pysimp.domain.entities.report import (
+    SimulationReport, StepMetric, NoiseMetric, CEMetric, PCPMetric, TraceabilityEntry,
+    ShapleyDecomposition, StepAttribution, SurgitAttribution, LazySimulationReport, LAZY_TABLES
+)
+
+FORMAT = "pysimp.report/1"
+
+# Annex III tables stored column-wise: field -> list of values
+TABLES: Dict[str, Type[BaseModel]] = {
+    "StepTable": StepMetric,
+    "NoiseTable": NoiseMetric,
+    "CETable": CEMetric,
+    "PCPTable": PCPMetric,
+    "Traceability": TraceabilityEntry,
+    "StepAttributionTable": StepAttribution,
+    "SurgitAttributionTable": SurgitAttribution,
+}
+SCALARS = ("trace_id", "validation_status", "validation_message")
+
+
+class ReportSerializer:
+    """
+    Fast SimulationReport codec: tables are written as columnar dicts of lists
+    transposed straight from the rows' field storage and encoded with orjson,
+    skipping the recursive model_dump traversal. Payloads written by dumps are
+    trusted: decoding skips pydantic validation and returns a
+    LazySimulationReport whose StepTable/NoiseTable/CETable/Traceability rows
+    are only built (unvalidated) from their columns when first read.
+    validate=True runs a full SimulationReport.model_validate instead, for
+    payloads from elsewhere.
+    """
+
+    @staticmethod
+    def _columns(rows: List[BaseModel], model: Type[BaseModel]) -> Dict[str, List[Any]]:
+        fields = list(model.model_fields)
+        if not rows:
+            return {f: [] for f in fields}
+        return dict(zip(fields, map(list, zip(*[row.__dict__.values() for row in rows]))))
+
+    @staticmethod
+    def _rows(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+        fields = list(columns)
+        return [dict(zip(fields, values)) for values in zip(*columns.values())]
+
+    @staticmethod
+    def _construct(model: Type[BaseModel], values: Dict[str, Any]) -> BaseModel:
+        """
+        model_construct without the per-field default pass: values become the field storage.
+        """
+        instance = model.__new__(model)
+        object.__setattr__(instance, '__dict__', values)
+        object.__setattr__(instance, '__pydantic_fields_set__', set(values))
+        object.__setattr__(instance, '__pydantic_extra__', None)
+        object.__setattr__(instance, '__pydantic_private__', None)
+        return instance
+
+    @staticmethod
+    def _construct_rows(model: Type[BaseModel], columns: Dict[str, List[Any]]) -> List[BaseModel]:
+        construct, fields = ReportSerializer._construct, list(columns)
+        return [construct(model, dict(zip(fields, values))) for values in zip(*columns.values())]
+
+    @staticmethod
+    def to_columnar(report: SimulationReport) -> Dict[str, Any]:
+        state = report.__dict__
+        out: Dict[str, Any] = {"format": FORMAT}
+        for name in SCALARS:
+            out[name] = state[name]
+        out["GlobalMetrics"] = dict(state["GlobalMetrics"])
+        out["ShapleyDecomposition"] = dict(state["ShapleyDecomposition"].__dict__)
+        for name, model in TABLES.items():
+            rows = getattr(report, name)  # also materializes LazySimulationReport tables
+            out[name] = None if rows is None else ReportSerializer._columns(rows, model)
+        return out
+
+    @staticmethod
+    def from_columnar(data: Dict[str, Any], validate: bool = False) -> SimulationReport:
+        """
+        validate: full pydantic validation, for payloads not written by dumps.
+        """
+        if data.get("format") != FORMAT:
+            raise ValueError(f"Unsupported report format: {data.get('format')}")
+        values: Dict[str, Any] = {name: data[name] for name in SCALARS}
+        values["GlobalMetrics"] = data["GlobalMetrics"]
+        if validate:
+            values["ShapleyDecomposition"] = data["ShapleyDecomposition"]
+            for name in TABLES:
+                columns: Optional[Dict[str, List[Any]]] = data.get(name)
+                values[name] = None if columns is None else ReportSerializer._rows(columns)
+            return SimulationReport.model_validate(values)
+
+        values["ShapleyDecomposition"] = ReportSerializer._construct(ShapleyDecomposition, data["ShapleyDecomposition"])
+        builders = {}
+        for name, model in TABLES.items():
+            columns = data.get(name)
+            if columns is None:
+                values[name] = None
+            elif name in LAZY_TABLES:
+                builders[name] = lambda model=model, columns=columns: ReportSerializer._construct_rows(model, columns)
+            else:
+                values[name] = ReportSerializer._construct_rows(model, columns)
+        return LazySimulationReport.from_builders(builders, **values)
+
+    @staticmethod
+    def dumps(report: SimulationReport) -> bytes:
+        return orjson.dumps(ReportSerializer.to_columnar(report))
+
+    @staticmethod
+    def loads(payload: bytes, validate: bool = False) -> SimulationReport:
+        return ReportSerializer.from_columnar(orjson.loads(payload), validate)
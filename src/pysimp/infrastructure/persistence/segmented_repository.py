@@ -0,0 +1,275 @@
+
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from pysimp.application.interfaces.repository import TraceRepository
+from pysimp.domain.entities.trace import SurgicalTrace
+
+# Record: magic, key length, payload length, crc32(key + payload), then key and JSON payload
+HEADER = struct.Struct("<HHII")
+MAGIC = 0x5354
+SEGMENT_PATTERN = re.compile(r"^segment-(\d{10})-(\d{4})\.log$")
+
+SegmentKey = Tuple[int, int]  # (number, compaction generation): later keys supersede earlier ones
+
+
+class _Segment:
+    """
+    One segment file plus a read-only mmap that is extended as the file grows.
+    """
+
+    def __init__(self, path: Path, key: SegmentKey):
+        self.path = path
+        self.key = key
+        self.size = path.stat().st_size if path.exists() else 0
+        self.garbage = 0  # bytes of superseded records
+        self._map: Optional[mmap.mmap] = None
+
+    def read(self, offset: int, length: int) -> bytes:
+        if self._map is None or offset + length > len(self._map):
+            self.close()
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[offset:offset + length]
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def _segment_path(directory: Path, key: SegmentKey) -> Path:
+    return directory / f"segment-{key[0]:010d}-{key[1]:04d}.log"
+
+
+def _encode(trace: SurgicalTrace) -> bytes:
+    key = trace.procedure_id.encode()
+    payload = trace.model_dump_json(by_alias=True).encode()
+    return HEADER.pack(MAGIC, len(key), len(payload), zlib.crc32(key + payload)) + key + payload
+
+
+class SegmentedTraceRepository(TraceRepository):
+    """
+    Append-only TraceRepository on rotating segment files. Every save appends
+    a record to the active segment; an in-memory index maps procedure_id to
+    (segment, offset, length) and is rebuilt by scanning the segments on open
+    (a torn record at the tail of the last segment is truncated away).
+    Reads go through mmap. Compaction rewrites sealed segments that hold
+    mostly superseded records and can run on a background thread while
+    ingestion and reads continue.
+    """
+
+    def __init__(self, directory: Union[str, Path], segment_bytes: int = 64 * 1024 * 1024, fsync: bool = False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._compaction_lock = threading.Lock()
+        self._segments: Dict[SegmentKey, _Segment] = {}
+        self._index: Dict[str, Tuple[SegmentKey, int, int]] = {}
+        self._stop: Optional[threading.Event] = None
+        self._compactor: Optional[threading.Thread] = None
+        self._load()
+        last = max(self._segments, default=None)
+        if last is not None and last[1] == 0 and self._segments[last].size < segment_bytes:
+            self._open_active(last)
+        else:
+            self._open_active(((last or (0, 0))[0] + 1, 0))
+
+    # --- recovery -------------------------------------------------------
+
+    def _load(self) -> None:
+        keys = sorted(
+            (int(m.group(1)), int(m.group(2)))
+            for m in (SEGMENT_PATTERN.match(p.name) for p in self.directory.iterdir()) if m
+        )
+        for n, key in enumerate(keys):
+            segment = self._segments[key] = _Segment(_segment_path(self.directory, key), key)
+            valid = self._scan(segment)
+            if valid < segment.size:
+                if n != len(keys) - 1:
+                    raise ValueError(f"Corrupt record in sealed segment {segment.path} at offset {valid}")
+                os.truncate(segment.path, valid)
+                segment.size = valid
+
+    def _scan(self, segment: _Segment) -> int:
+        """
+        Indexes every intact record; returns the offset after the last one.
+        """
+        if segment.size == 0:
+            return 0
+        with open(segment.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = 0
+            while offset + HEADER.size <= len(data):
+                magic, key_len, payload_len, crc = HEADER.unpack_from(data, offset)
+                end = offset + HEADER.size + key_len + payload_len
+                if magic != MAGIC or end > len(data) or zlib.crc32(data[offset + HEADER.size:end]) != crc:
+                    break
+                trace_id = data[offset + HEADER.size:offset + HEADER.size + key_len].decode()
+                self._point(trace_id, (segment.key, offset, end - offset))
+                offset = end
+        return offset
+
+    def _point(self, trace_id: str, location: Tuple[SegmentKey, int, int]) -> None:
+        previous = self._index.get(trace_id)
+        if previous is not None:
+            self._segments[previous[0]].garbage += previous[2]
+        self._index[trace_id] = location
+
+    # --- writes ---------------------------------------------------------
+
+    def _open_active(self, key: SegmentKey) -> None:
+        if key not in self._segments:
+            self._segments[key] = _Segment(_segment_path(self.directory, key), key)
+        self._active = self._segments[key]
+        self._active_file = open(self._active.path, "ab")
+
+    def _rotate(self) -> None:
+        self._active_file.close()
+        self._open_active((self._active.key[0] + 1, 0))
+
+    def save_trace(self, trace: SurgicalTrace) -> None:
+        self.save_traces([trace])
+
+    def save_traces(self, traces: Iterable[SurgicalTrace]) -> None:
+        """
+        Encodes outside the lock, then appends the batch with one write per segment.
+        """
+        records = [(trace.procedure_id, _encode(trace)) for trace in traces]
+        with self._lock:
+            pending: List[bytes] = []
+            for trace_id, record in records:
+                if self._active.size >= self.segment_bytes:
+                    self._flush(pending)
+                    self._rotate()
+                self._point(trace_id, (self._active.key, self._active.size, len(record)))
+                self._active.size += len(record)
+                pending.append(record)
+            self._flush(pending)
+
+    def _flush(self, pending: List[bytes]) -> None:
+        if pending:
+            self._active_file.write(b"".join(pending))
+            self._active_file.flush()
+            if self.fsync:
+                os.fsync(self._active_file.fileno())
+            pending.clear()
+
+    # --- reads ----------------------------------------------------------
+
+    def _payload(self, trace_id: str) -> Optional[bytes]:
+        with self._lock:
+            location = self._index.get(trace_id)
+            if location is None:
+                return None
+            key, offset, length = location
+            record = self._segments[key].read(offset, length)
+        _, key_len, _, _ = HEADER.unpack_from(record)
+        return record[HEADER.size + key_len:]
+
+    def get_trace(self, trace_id: str) -> Optional[SurgicalTrace]:
+        payload = self._payload(trace_id)
+        return None if payload is None else SurgicalTrace.model_validate_json(payload)
+
+    def trace_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segments)
+
+    @property
+    def garbage_bytes(self) -> int:
+        with self._lock:
+            return sum(s.garbage for s in self._segments.values())
+
+    # --- compaction -----------------------------------------------------
+
+    def compact(self, min_garbage_ratio: float = 0.3) -> int:
+        """
+        Rewrites the live records of every sealed segment whose superseded
+        share is at least min_garbage_ratio into one new segment, which takes
+        the highest input number and a higher generation (so recovery order
+        is preserved), then deletes the inputs. Returns the bytes reclaimed.
+        """
+        with self._compaction_lock:
+            with self._lock:
+                victims = [
+                    s for s in self._segments.values()
+                    if s is not self._active and s.size and s.garbage / s.size >= min_garbage_ratio
+                ]
+                if not victims:
+                    return 0
+                victim_keys = {s.key for s in victims}
+                live = sorted(
+                    ((trace_id, location) for trace_id, location in self._index.items() if location[0] in victim_keys),
+                    key=lambda item: (item[1][0], item[1][1])
+                )
+                number = max(victim_keys)[0]
+                generation = 1 + max(k[1] for k in self._segments if k[0] == number)
+                reclaimed = sum(s.size for s in victims)
+
+            out_key = (number, generation)
+            out_path = _segment_path(self.directory, out_key)
+            tmp_path = out_path.with_suffix(".tmp")
+            moved: List[Tuple[str, Tuple[SegmentKey, int, int], int]] = []
+            with open(tmp_path, "wb") as out:
+                offset = 0
+                for trace_id, location in live:
+                    with self._lock:
+                        record = self._segments[location[0]].read(location[1], location[2])
+                    out.write(record)
+                    moved.append((trace_id, location, offset))
+                    offset += len(record)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, out_path)
+
+            with self._lock:
+                segment = self._segments[out_key] = _Segment(out_path, out_key)
+                for trace_id, location, new_offset in moved:
+                    if self._index.get(trace_id) == location:
+                        self._index[trace_id] = (out_key, new_offset, location[2])
+                    else:
+                        segment.garbage += location[2]  # superseded while compacting
+                for victim in victims:
+                    victim.close()
+                    del self._segments[victim.key]
+                    victim.path.unlink()
+                return reclaimed - segment.size
+
+    def start_compaction(self, interval: float = 30.0, min_garbage_ratio: float = 0.3) -> None:
+        """
+        Runs compact() every interval seconds on a daemon thread until close().
+        """
+        if self._compactor is not None:
+            return
+        self._stop = threading.Event()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.compact(min_garbage_ratio)
+
+        self._compactor = threading.Thread(target=loop, name="trace-compactor", daemon=True)
+        self._compactor.start()
+
+    def close(self) -> None:
+        if self._compactor is not None:
+            self._stop.set()
+            self._compactor.join()
+            self._compactor = None
+        with self._lock:
+            self._active_file.close()
+            for segment in self._segments.values():
+                segment.close()
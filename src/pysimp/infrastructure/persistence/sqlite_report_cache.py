@@ -0,0 +1,145 @@
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from pysimp.application.interfaces.report_cache import ReportCache
+from pysimp.domain.entities.report import SimulationReport
+from pysimp.infrastructure.persistence.report_serializer import ReportSerializer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_last_access ON reports (last_access);
+CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO usage (id, bytes) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS reports_insert AFTER INSERT ON reports
+BEGIN UPDATE usage SET bytes = bytes + NEW.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS reports_delete AFTER DELETE ON reports
+BEGIN UPDATE usage SET bytes = bytes - OLD.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS reports_update AFTER UPDATE OF size ON reports
+BEGIN UPDATE usage SET bytes = bytes - OLD.size + NEW.size WHERE id = 0; END;
+"""
+
+
+class SQLiteReportCache(ReportCache):
+    """
+    ReportCache in a local SQLite file shared by any number of worker
+    processes (WAL mode, writes in IMMEDIATE transactions). Values are
+    ReportSerializer payloads; when the stored bytes exceed max_bytes the
+    least recently read reports are evicted. Reads do not write: hit times
+    are buffered per process and folded into last_access by the next put,
+    or in one transaction once flush_reads distinct keys are pending.
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = 1024 * 1024 * 1024, flush_reads: int = 256):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.flush_reads = flush_reads
+        self._local = threading.local()
+        self._reads: Dict[str, float] = {}   # key -> last hit time not yet written
+        self._reads_lock = threading.Lock()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after fork (connections must not cross processes)
+        pid, connection = getattr(self._local, "connection", (None, None))
+        if pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=60.0, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = (os.getpid(), connection)
+        return connection
+
+    def get(self, key: str) -> Optional[SimulationReport]:
+        connection = self._connection()
+        row = connection.execute("SELECT payload FROM reports WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self._reads_lock:
+            self._reads[key] = time.time()
+            flush = len(self._reads) >= self.flush_reads
+        if flush:
+            self.flush()
+        return ReportSerializer.loads(row[0])
+
+    def _take_reads(self) -> Dict[str, float]:
+        with self._reads_lock:
+            reads, self._reads = self._reads, {}
+        return reads
+
+    def _write_reads(self, connection: sqlite3.Connection, reads: Dict[str, float]) -> None:
+        connection.executemany(
+            "UPDATE reports SET last_access = MAX(last_access, ?) WHERE key = ?",
+            [(at, key) for key, at in reads.items()]
+        )
+
+    def flush(self) -> None:
+        """
+        Writes the buffered read times to last_access.
+        """
+        reads = self._take_reads()
+        if not reads:
+            return
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._write_reads(connection, reads)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def put(self, key: str, report: SimulationReport) -> None:
+        payload = ReportSerializer.dumps(report)
+        if len(payload) > self.max_bytes:
+            return
+        connection = self._connection()
+        reads = self._take_reads()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._write_reads(connection, reads)  # recency is current before evicting
+            connection.execute(
+                "INSERT INTO reports (key, payload, size, last_access) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET payload = excluded.payload, size = excluded.size, "
+                "last_access = excluded.last_access",
+                (key, payload, len(payload), time.time())
+            )
+            self._evict(connection)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        excess = self.size_bytes(connection) - self.max_bytes
+        while excess > 0:
+            rows = connection.execute(
+                "SELECT key, size FROM reports ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            victims = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                victims.append((key,))
+                excess -= size
+            connection.executemany("DELETE FROM reports WHERE key = ?", victims)
+
+    def size_bytes(self, connection: Optional[sqlite3.Connection] = None) -> int:
+        connection = connection or self._connection()
+        return connection.execute("SELECT bytes FROM usage WHERE id = 0").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def clear(self) -> None:
+        self._take_reads()
+        self._connection().execute("DELETE FROM reports")
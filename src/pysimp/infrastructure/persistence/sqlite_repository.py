@@ -0,0 +1,256 @@
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import orjson
+
+from pysimp.application.interfaces.repository import TraceFilter, TraceRepository
+from pysimp.domain.entities.trace import SurgicalTrace
+from pysimp.infrastructure.persistence.trace_codec import decode_span, encode_span, pack_flags, unpack_flags
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS surgits (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS traces (
+    id INTEGER PRIMARY KEY,
+    procedure_id TEXT NOT NULL UNIQUE,
+    patient_id TEXT NOT NULL,
+    outcomes BLOB
+);
+CREATE INDEX IF NOT EXISTS traces_patient ON traces (patient_id);
+CREATE TABLE IF NOT EXISTS events (
+    trace INTEGER NOT NULL REFERENCES traces (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    surgit INTEGER NOT NULL REFERENCES surgits (id),
+    start_us INTEGER NOT NULL,
+    duration_us INTEGER NOT NULL,
+    utc_offset INTEGER,
+    end_offset INTEGER,  -- NULL: same as utc_offset
+    flags INTEGER NOT NULL,
+    n_t REAL NOT NULL,
+    e_t REAL NOT NULL,
+    complexity_weight REAL,
+    risk_tags BLOB,
+    PRIMARY KEY (trace, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_surgit ON events (surgit, trace);
+"""
+
+# SQLITE_MAX_VARIABLE_NUMBER before SQLite 3.32: caps every IN (...) list
+MAX_VARIABLES = 999
+EVENT_COLUMNS = (
+    "position, surgit, start_us, duration_us, utc_offset, end_offset, flags, n_t, e_t, complexity_weight, risk_tags"
+)
+
+
+def _placeholders(n: int) -> str:
+    return ",".join("?" * n)
+
+
+class SQLiteTraceRepository(TraceRepository):
+    """
+    TraceRepository on a local SQLite file. Events are stored one row each with
+    compact columns: dictionary-encoded surgit IDs, integer microsecond times,
+    packed enum/bool flags. The database runs in WAL mode so readers do not
+    block the writer; each thread reuses its own connection.
+    """
+
+    def __init__(self, path: Union[str, Path], batch_size: int = 1000):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._surgit_ids: Dict[str, int] = {}
+        self._surgit_names: Dict[int, str] = {}
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(events)")}
+        if "end_offset" not in columns:  # files written before end offsets were stored
+            connection.execute("ALTER TABLE events ADD COLUMN end_offset INTEGER")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # check_same_thread off only so close() can release every thread's connection
+            connection = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _encode_surgits(self, connection: sqlite3.Connection, names: Iterable[str]) -> None:
+        missing = {n for n in names if n not in self._surgit_ids}
+        if missing:
+            connection.executemany("INSERT OR IGNORE INTO surgits (name) VALUES (?)", [(n,) for n in missing])
+            self._load_surgits(connection)
+
+    def _load_surgits(self, connection: sqlite3.Connection) -> None:
+        rows = connection.execute("SELECT id, name FROM surgits").fetchall()
+        with self._lock:
+            self._surgit_ids.update((name, i) for i, name in rows)
+            self._surgit_names.update(rows)
+
+    def _event_rows(self, trace_row: int, trace: SurgicalTrace) -> List[tuple]:
+        rows = []
+        for position, event in enumerate(trace.events):
+            start, offset, duration, end_offset = encode_span(event.timestamp_start, event.timestamp_end)
+            rows.append((
+                trace_row, position, self._surgit_ids[event.surgit_id], start, duration, offset, end_offset,
+                pack_flags(event.surgit_type, event.deviation_cause, event.is_deviation, event.is_pause),
+                event.noise_patient, event.noise_external, event.complexity_weight,
+                orjson.dumps(event.risk_tags) if event.risk_tags else None
+            ))
+        return rows
+
+    def _write(self, connection: sqlite3.Connection, traces: List[SurgicalTrace]) -> None:
+        self._encode_surgits(connection, {e.surgit_id for t in traces for e in t.events})
+        connection.executemany(
+            "INSERT INTO traces (procedure_id, patient_id, outcomes) VALUES (?, ?, ?) "
+            "ON CONFLICT (procedure_id) DO UPDATE SET patient_id = excluded.patient_id, outcomes = excluded.outcomes",
+            [(t.procedure_id, t.patient_id,
+              orjson.dumps([o.model_dump() for o in t.outcomes]) if t.outcomes else None) for t in traces]
+        )
+        ids = {}
+        for lo in range(0, len(traces), MAX_VARIABLES):
+            chunk = [t.procedure_id for t in traces[lo:lo + MAX_VARIABLES]]
+            ids.update(connection.execute(
+                f"SELECT procedure_id, id FROM traces WHERE procedure_id IN ({_placeholders(len(chunk))})", chunk
+            ).fetchall())
+        rows = [ids[t.procedure_id] for t in traces]
+        connection.executemany("DELETE FROM events WHERE trace = ?", [(r,) for r in rows])
+        connection.executemany(
+            f"INSERT INTO events (trace, {EVENT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [row for r, t in zip(rows, traces) for row in self._event_rows(r, t)]
+        )
+
+    def save_trace(self, trace: SurgicalTrace) -> None:
+        self.save_traces([trace])
+
+    def save_traces(self, traces: Iterable[SurgicalTrace]) -> None:
+        """
+        Bulk insert: batch_size traces per executemany, all in one transaction.
+        """
+        connection = self._connection()
+        try:
+            with connection:
+                batch: Dict[str, SurgicalTrace] = {}
+                for trace in traces:
+                    batch[trace.procedure_id] = trace
+                    if len(batch) >= self.batch_size:
+                        self._write(connection, list(batch.values()))
+                        batch.clear()
+                if batch:
+                    self._write(connection, list(batch.values()))
+        except BaseException:
+            # Surgit codes cached during a rolled-back transaction are not durable
+            with self._lock:
+                self._surgit_ids.clear()
+                self._surgit_names.clear()
+            raise
+
+    def _decode(self, connection: sqlite3.Connection, procedure_id: str, patient_id: str,
+                outcomes: Optional[bytes], events: List[tuple]) -> SurgicalTrace:
+        if any(row[1] not in self._surgit_names for row in events):
+            self._load_surgits(connection)
+        decoded = []
+        for position, surgit, start_us, duration_us, offset, end_offset, flags, n_t, e_t, weight, tags in events:
+            surgit_type, cause, is_deviation, is_pause = unpack_flags(flags)
+            start, end = decode_span(start_us, offset, duration_us, end_offset)
+            decoded.append({
+                "surgit_id": self._surgit_names[surgit],
+                "timestamp_start": start, "timestamp_end": end,
+                "surgit_type": surgit_type, "deviation_cause": cause,
+                "is_deviation": is_deviation, "is_pause": is_pause,
+                "n_t": n_t, "e_t": e_t, "complexity_weight": weight,
+                "risk_tags": orjson.loads(tags) if tags else [],
+            })
+        return SurgicalTrace.model_validate({
+            "procedure_id": procedure_id, "patient_id": patient_id, "events": decoded,
+            "outcomes": orjson.loads(outcomes) if outcomes else [],
+        })
+
+    def _fetch(self, connection: sqlite3.Connection, traces: List[tuple]) -> List[SurgicalTrace]:
+        """
+        traces: (id, procedure_id, patient_id, outcomes) rows; events in one query.
+        """
+        if not traces:
+            return []
+        events: Dict[int, List[tuple]] = {row[0]: [] for row in traces}
+        keys = list(events)
+        for lo in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[lo:lo + MAX_VARIABLES]
+            for row in connection.execute(
+                f"SELECT trace, {EVENT_COLUMNS} FROM events WHERE trace IN ({_placeholders(len(chunk))}) "
+                "ORDER BY trace, position", chunk
+            ):
+                events[row[0]].append(row[1:])
+        return [self._decode(connection, procedure_id, patient_id, outcomes, events[i])
+                for i, procedure_id, patient_id, outcomes in traces]
+
+    def get_trace(self, trace_id: str) -> Optional[SurgicalTrace]:
+        return self.get_traces([trace_id])[0]
+
+    def get_traces(self, trace_ids: Iterable[str]) -> List[Optional[SurgicalTrace]]:
+        trace_ids = list(trace_ids)
+        connection = self._connection()
+        found: Dict[str, SurgicalTrace] = {}
+        size = min(self.batch_size, MAX_VARIABLES)
+        for lo in range(0, len(trace_ids), size):
+            chunk = trace_ids[lo:lo + size]
+            rows = connection.execute(
+                "SELECT id, procedure_id, patient_id, outcomes FROM traces "
+                f"WHERE procedure_id IN ({_placeholders(len(chunk))})", chunk
+            ).fetchall()
+            found.update((t.procedure_id, t) for t in self._fetch(connection, rows))
+        return [found.get(trace_id) for trace_id in trace_ids]
+
+    def trace_ids(self) -> List[str]:
+        return [r[0] for r in self._connection().execute("SELECT procedure_id FROM traces ORDER BY id")]
+
+    def iter_traces(self, filter: Optional[TraceFilter] = None, batch_size: int = 1000) -> Iterator[SurgicalTrace]:
+        """
+        Keyset pagination over the trace rowid, batch_size traces per round trip.
+        """
+        connection = self._connection()
+        last = -1
+        while True:
+            rows = connection.execute(
+                "SELECT id, procedure_id, patient_id, outcomes FROM traces WHERE id > ? ORDER BY id LIMIT ?",
+                (last, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            for trace in self._fetch(connection, rows):
+                if filter is None or filter(trace):
+                    yield trace
+
+    def trace_ids_for_patient(self, patient_id: str) -> List[str]:
+        return [r[0] for r in self._connection().execute(
+            "SELECT procedure_id FROM traces WHERE patient_id = ? ORDER BY id", (patient_id,)
+        )]
+
+    def trace_ids_with_surgit(self, surgit_id: str) -> List[str]:
+        return [r[0] for r in self._connection().execute(
+            "SELECT procedure_id FROM traces WHERE id IN "
+            "(SELECT trace FROM events WHERE surgit = (SELECT id FROM surgits WHERE name = ?)) ORDER BY id",
+            (surgit_id,)
+        )]
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM traces").fetchone()[0]
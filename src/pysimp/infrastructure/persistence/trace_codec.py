@@ -0,0 +1,71 @@
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from pysimp.domain.entities.trace import DeviationCause, SurgitType
+
+# Enum <-> small integer codes shared by the compact trace stores
+SURGIT_TYPES = tuple(SurgitType)
+DEVIATION_CAUSES = (None,) + tuple(DeviationCause)
+_TYPE_CODE = {t: i for i, t in enumerate(SURGIT_TYPES)}
+_CAUSE_CODE = {c: i for i, c in enumerate(DEVIATION_CAUSES)}
+
+_EPOCH = datetime(1970, 1, 1)
+NAIVE = -(1 << 31)  # stored offset of a timestamp without tzinfo, where None means "same as start"
+
+
+def pack_flags(surgit_type: SurgitType, deviation_cause: Optional[DeviationCause], is_deviation: bool, is_pause: bool) -> int:
+    """
+    bits 0-2 surgit type, 3-5 deviation cause (0 = none), 6 is_deviation, 7 is_pause.
+    """
+    return _TYPE_CODE[surgit_type] | _CAUSE_CODE[deviation_cause] << 3 | int(is_deviation) << 6 | int(is_pause) << 7
+
+
+def unpack_flags(flags: int) -> Tuple[SurgitType, Optional[DeviationCause], bool, bool]:
+    return (
+        SURGIT_TYPES[flags & 0b111], DEVIATION_CAUSES[(flags >> 3) & 0b111],
+        bool(flags & 1 << 6), bool(flags & 1 << 7)
+    )
+
+
+def to_micros(moment: datetime) -> Tuple[int, Optional[int]]:
+    """
+    (microseconds of wall-clock time since 1970-01-01, UTC offset in seconds or None if naive).
+    """
+    offset = moment.utcoffset()
+    wall = moment.replace(tzinfo=None) - _EPOCH
+    return wall // timedelta(microseconds=1), None if offset is None else int(offset.total_seconds())
+
+
+def from_micros(micros: int, offset: Optional[int] = None) -> datetime:
+    moment = _EPOCH + timedelta(microseconds=micros)
+    return moment if offset is None else moment.replace(tzinfo=timezone(timedelta(seconds=offset)))
+
+
+def encode_span(start: datetime, end: datetime) -> Tuple[int, Optional[int], int, Optional[int]]:
+    """
+    (start wall micros, start offset, elapsed micros between the two instants,
+    end offset: None when equal to the start's, NAIVE for a naive end).
+    Naive timestamps count as UTC for the elapsed time.
+    """
+    start_us, start_offset = to_micros(start)
+    end_us, end_offset = to_micros(end)
+    duration = (end_us - (end_offset or 0) * 1_000_000) - (start_us - (start_offset or 0) * 1_000_000)
+    if end_offset == start_offset:
+        end_offset = None
+    elif end_offset is None:
+        end_offset = NAIVE
+    return start_us, start_offset, duration, end_offset
+
+
+def decode_span(start_us: int, start_offset: Optional[int], duration_us: int,
+                end_offset: Optional[int]) -> Tuple[datetime, datetime]:
+    """
+    Inverse of encode_span.
+    """
+    if end_offset is None:
+        end_offset = start_offset
+    elif end_offset == NAIVE:
+        end_offset = None
+    end_us = start_us + duration_us + ((end_offset or 0) - (start_offset or 0)) * 1_000_000
+    return from_micros(start_us, start_offset), from_micros(end_us, end_offset)
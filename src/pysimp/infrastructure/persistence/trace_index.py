@@ -0,0 +1,210 @@
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from pysimp.domain.entities.trace import SurgicalTrace, SurgitType
+
+_EMPTY = np.zeros(0, dtype=np.uint32)
+CE_TYPES = (SurgitType.CE_SUBSTITUTION.value, SurgitType.CE_ADDITION.value)
+# Indexed attributes; Term(field) without a value matches traces with any value
+FIELDS = ("surgit", "surgit_type", "ce", "risk_tag", "deviation_cause", "pause", "deviation", "outcome")
+
+
+class Query:
+    """
+    Boolean query over a TraceIndex; combine with &, | and ~.
+    """
+
+    def __and__(self, other: "Query") -> "Query":
+        return And((self, other))
+
+    def __or__(self, other: "Query") -> "Query":
+        return Or((self, other))
+
+    def __invert__(self) -> "Query":
+        return Not(self)
+
+
+@dataclass(frozen=True)
+class Term(Query):
+    field: str
+    value: Optional[Hashable] = None
+
+    def __post_init__(self):
+        if self.field not in FIELDS:
+            raise ValueError(f"Unknown index field '{self.field}'; expected one of {list(FIELDS)}")
+
+
+@dataclass(frozen=True)
+class And(Query):
+    queries: Tuple[Query, ...]
+
+
+@dataclass(frozen=True)
+class Or(Query):
+    queries: Tuple[Query, ...]
+
+
+@dataclass(frozen=True)
+class Not(Query):
+    query: Query
+
+
+def trace_terms(trace: SurgicalTrace) -> Set[Tuple[str, Optional[Hashable]]]:
+    """
+    (field, value) postings of one trace, plus (field, None) for every field it has.
+    """
+    terms = set()
+    for event in trace.events:
+        if event.is_pause:
+            terms.add(("pause", None))
+            continue
+        surgit_type = getattr(event.surgit_type, 'value', event.surgit_type)
+        terms.add(("surgit", event.surgit_id))
+        terms.add(("surgit_type", surgit_type))
+        if surgit_type in CE_TYPES:
+            terms.add(("ce", surgit_type))
+        if event.is_deviation:
+            terms.add(("deviation", None))
+        if event.deviation_cause is not None:
+            terms.add(("deviation_cause", getattr(event.deviation_cause, 'value', event.deviation_cause)))
+        terms.update(("risk_tag", tag) for tag in event.risk_tags)
+    terms.update(("outcome", outcome.complication_type) for outcome in trace.outcomes)
+    terms.update({(field, None) for field, value in terms if value is not None})
+    return terms
+
+
+class TraceIndex:
+    """
+    Inverted index from trace attributes to trace IDs. Each trace gets a dense
+    document number; every (field, value) term keeps a sorted uint32 posting
+    array of document numbers, so boolean queries are merges of sorted arrays.
+    Adding a trace appends its (always largest) number to a per-term buffer
+    that is folded into the sorted array on the next read. Re-adding a trace
+    retires its old number (tombstone) and compact() renumbers once retired
+    numbers outweigh live ones.
+    """
+
+    def __init__(self, compact_ratio: float = 1.0):
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self._doc_ids: List[Optional[str]] = []   # document number -> trace_id (None: retired)
+        self._docs: Dict[str, int] = {}           # trace_id -> live document number
+        self._postings: Dict[Tuple[str, Any], np.ndarray] = {}
+        self._pending: Dict[Tuple[str, Any], List[int]] = {}
+        self._live = np.zeros(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, trace_id: str) -> bool:
+        return trace_id in self._docs
+
+    def add(self, trace: SurgicalTrace) -> None:
+        self.add_many([trace])
+
+    def add_many(self, traces: Iterable[SurgicalTrace]) -> None:
+        with self._lock:
+            for trace in traces:
+                old = self._docs.get(trace.procedure_id)
+                if old is not None:
+                    self._doc_ids[old] = None
+                    self._live[old] = False
+                doc = len(self._doc_ids)
+                self._doc_ids.append(trace.procedure_id)
+                self._docs[trace.procedure_id] = doc
+                if doc == len(self._live):
+                    self._live = np.concatenate([self._live, np.zeros(max(doc, 64), dtype=bool)])
+                self._live[doc] = True
+                for term in trace_terms(trace):
+                    self._pending.setdefault(term, []).append(doc)
+            if len(self._doc_ids) - len(self._docs) > self.compact_ratio * max(len(self._docs), 1):
+                self.compact()
+
+    def _posting(self, term: Tuple[str, Any]) -> np.ndarray:
+        """
+        Sorted document numbers of a term (live or retired), folding in pending adds.
+        """
+        pending = self._pending.pop(term, None)
+        posting = self._postings.get(term, _EMPTY)
+        if pending:
+            posting = self._postings[term] = np.concatenate([posting, np.array(pending, dtype=np.uint32)])
+        return posting
+
+    def _universe(self) -> np.ndarray:
+        return np.flatnonzero(self._live).astype(np.uint32)
+
+    def _evaluate(self, query: Query) -> np.ndarray:
+        if isinstance(query, Term):
+            posting = self._posting((query.field, query.value))
+            return posting[self._live[posting]]
+        if isinstance(query, Not):
+            return np.setdiff1d(self._universe(), self._evaluate(query.query), assume_unique=True)
+        if isinstance(query, And):
+            positive = [q for q in query.queries if not isinstance(q, Not)]
+            parts = sorted((self._evaluate(q) for q in positive), key=len)
+            result = parts[0] if parts else self._universe()
+            for part in parts[1:]:
+                result = np.intersect1d(result, part, assume_unique=True)
+            for q in query.queries:
+                if isinstance(q, Not):
+                    result = np.setdiff1d(result, self._evaluate(q.query), assume_unique=True)
+            return result
+        if isinstance(query, Or):
+            parts = [self._evaluate(q) for q in query.queries]
+            return np.unique(np.concatenate(parts)) if parts else _EMPTY
+        raise TypeError(f"Unsupported query {query!r}")
+
+    def query(self, query: Query) -> Set[str]:
+        """
+        Trace IDs matching the query.
+        """
+        return set(self.query_ids(query))
+
+    def query_ids(self, query: Query) -> List[str]:
+        """
+        Matching trace IDs in indexing order.
+        """
+        with self._lock:
+            doc_ids = self._doc_ids
+            return [doc_ids[doc] for doc in self._evaluate(query).tolist()]
+
+    def count(self, query: Query) -> int:
+        with self._lock:
+            return len(self._evaluate(query))
+
+    def values(self, field: str) -> List[Any]:
+        """
+        Distinct indexed values of a field.
+        """
+        with self._lock:
+            terms = set(self._postings) | set(self._pending)
+        return sorted((v for f, v in terms if f == field and v is not None), key=str)
+
+    def compact(self) -> None:
+        """
+        Drops retired document numbers and renumbers the live ones densely.
+        """
+        with self._lock:
+            live = self._live[:len(self._doc_ids)]
+            renumber = (np.cumsum(live) - 1).astype(np.uint32)
+            postings = {}
+            for term in set(self._postings) | set(self._pending):
+                posting = self._posting(term)
+                posting = renumber[posting[live[posting]]]
+                if len(posting):
+                    postings[term] = posting
+            self._postings = postings
+            self._doc_ids = [trace_id for trace_id in self._doc_ids if trace_id is not None]
+            self._docs = {trace_id: doc for doc, trace_id in enumerate(self._doc_ids)}
+            self._live = np.ones(len(self._doc_ids), dtype=bool)
+
+    def memory_bytes(self) -> int:
+        """
+        Bytes held by the folded posting arrays.
+        """
+        with self._lock:
+            return sum(posting.nbytes for posting in self._postings.values()) + self._live.nbytes
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from pysimp.domain.services.forward_simulator import ForwardSimulator, ForwardSimulationConfig
+from pysimp.infrastructure.persistence.yaml_loader import YamlTemplateLoader
+
+TEMPLATE = os.path.join(os.path.dirname(__file__), "..", "templates", "apendicectomia.yaml")
+
+
+@pytest.fixture(scope="session")
+def template_path():
+    return TEMPLATE
+
+
+@pytest.fixture
+def template():
+    return YamlTemplateLoader.load(TEMPLATE)
+
+
+@pytest.fixture(scope="session")
+def sampled_traces():
+    """
+    sampled_traces(n, seed, **config): n synthetic traces of the appendectomy
+    template drawn with ForwardSimulationConfig(**config). Cohorts are sampled
+    once per session; each call returns a fresh list.
+    """
+    template = YamlTemplateLoader.load(TEMPLATE)
+    cohorts = {}
+
+    def sample(n, seed, **config):
+        key = (n, seed, tuple(sorted(config.items())))
+        if key not in cohorts:
+            cohorts[key] = list(ForwardSimulator(template, ForwardSimulationConfig(**config)).iter_traces(n, seed=seed))
+        return list(cohorts[key])
+
+    return sample
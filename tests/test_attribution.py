@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from itertools import permutations, product
+
+import numpy as np
+import pytest
+
+from pysimp.domain.entities.surgit import Surgit
+from pysimp.domain.entities.step import Step
+from pysimp.domain.entities.template import NormativeTemplate
+from pysimp.domain.entities.trace import SurgicalTrace, SurgitEvent
+from pysimp.domain.services.attribution import SurgitAttributionGame
+from pysimp.domain.services.layer_e import LayerE
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+
+def _template(q=2.0):
+    layout = {"P1": {"S1": 0.1, "S2": 0.2}, "P2": {"S3": 0.3}, "P3": {"S4": 0.05, "S5": 0.25, "S6": 0.15}}
+    steps = {
+        step_id: Step(id=step_id, name=step_id, weight_wt=1.0 + 0.1 * t, surgits={
+            s: Surgit(id=s, name=s, intrinsic_deviation=d) for s, d in surgits.items()
+        })
+        for t, (step_id, surgits) in enumerate(layout.items())
+    }
+    return NormativeTemplate(procedure_type="Test", version="1.0", steps=steps,
+                             structure_definition={}, tsallis_q=q, weight_beta=0.8)
+
+
+def _scored(q=2.0):
+    now = datetime(2024, 1, 1)
+    events = [SurgitEvent(surgit_id=s, timestamp_start=now, timestamp_end=now + timedelta(minutes=1), n_t=n)
+              for s, n in [("S1", 1.0), ("S2", 1.4), ("S3", 1.0), ("S4", 2.0), ("S5", 1.0), ("S6", 1.2), ("S5", 1.1)]]
+    repo = InMemoryTraceRepository()
+    repo.save_trace(SurgicalTrace(procedure_id="T1", patient_id="P", events=events))
+    return RunSimulation(repo), _template(q)
+
+
+def _brute_force_owen(groups, v):
+    """Average marginals over every permutation that keeps groups contiguous."""
+    totals, count = {e: 0.0 for members in groups.values() for e in members}, 0
+    for order in permutations(groups):
+        for inner in product(*[permutations(groups[g]) for g in order]):
+            coalition = []
+            for e in [e for block in inner for e in block]:
+                before = v(coalition)
+                coalition = coalition + [e]
+                totals[e] += v(coalition) - before
+            count += 1
+    return {e: t / count for e, t in totals.items()}
+
+
+def test_exact_owen_matches_brute_force():
+    groups = {"G1": ["a", "b"], "G2": ["c"], "G3": ["d", "e"]}
+    w = {"a": 0.5, "b": 1.0, "c": 0.2, "d": 0.7, "e": 0.1}
+
+    def v(coalition):
+        s = sum(w[e] for e in coalition)
+        return s ** 2 + (0.3 if {"a", "d"} <= set(coalition) else 0.0)
+
+    element_values, group_values = LayerE.calculate_owen_values(groups, v)
+    reference = _brute_force_owen(groups, v)
+    for e, value in reference.items():
+        assert element_values[e] == pytest.approx(value)
+    assert group_values["G3"] == pytest.approx(element_values["d"] + element_values["e"])
+
+
+def test_owen_with_singleton_groups_is_shapley():
+    elements = ["a", "b", "c", "d"]
+    v = lambda c: len(c) ** 1.5 + (1.0 if "a" in c and "c" in c else 0.0)
+    owen, _ = LayerE.calculate_owen_values({e: [e] for e in elements}, v)
+    shapley = LayerE.calculate_shapley_values(elements, v)
+    for e in elements:
+        assert owen[e] == pytest.approx(shapley[e])
+
+
+@pytest.mark.parametrize("q", [1.0, 2.0])
+def test_report_attribution_splits_score_exactly(q):
+    simulation, template = _scored(q)
+    report = simulation.execute("T1", template=template, hierarchical_attribution=True)
+    score = report.GlobalMetrics["Score_SIM"]
+
+    steps = {row.step_id: row for row in report.StepAttributionTable}
+    assert list(steps) == ["P1", "P2", "P3"]
+    assert sum(row.phi for row in steps.values()) == pytest.approx(score)
+    for step_id, row in steps.items():
+        assert row.std_error is None
+        within = [r.phi for r in report.SurgitAttributionTable if r.step_id == step_id]
+        assert sum(within) == pytest.approx(row.phi)
+
+    assert simulation.execute("T1", template=template).StepAttributionTable is None
+
+
+def test_sampled_owen_agrees_with_exact_on_score_game():
+    simulation, template = _scored()
+    pass_res = simulation._run_single_pass(simulation.trace_repo.get_trace("T1").events, template)
+    game = SurgitAttributionGame(
+        pass_res["event_deviations"], {r.step_id: r.w_t for r in pass_res["step_table"]},
+        template.tsallis_q, template.weight_alpha, template.weight_beta
+    )
+    full = np.ones((1, len(game.elements)), dtype=bool)
+    assert game(full)[0] == pytest.approx(pass_res["score"])
+    assert game(~full)[0] == pytest.approx(0.0)
+
+    exact, exact_steps = LayerE.calculate_owen_values(game.groups, batch_value_function=game)
+    sampled, sampled_steps = LayerE.estimate_owen_values(
+        game.groups, batch_value_function=game, seed=3, stratified=True, max_permutations=3000
+    )
+    for s, value in exact.items():
+        assert sampled[s].value == pytest.approx(value, abs=5 * sampled[s].std_error + 1e-12)
+    assert sum(e.value for e in sampled_steps.values()) == pytest.approx(pass_res["score"])
@@ -0,0 +1,112 @@
+import threading
+
+import orjson
+import pytest
+
+from pysimp.application.use_cases.batch_scoring import (
+    BudgetedBatchScorer, MemoryBudget, MemoryBudgetExceeded, estimate_report_bytes, estimate_trace_bytes,
+    plan_detail
+)
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.cli import main
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+
+def _cost(n_events, detail):
+    return estimate_trace_bytes(n_events) + estimate_report_bytes(n_events, detail)
+
+
+def test_estimates_and_planning():
+    assert estimate_report_bytes(1000, "full") > 10 * estimate_report_bytes(100, "full")
+    assert estimate_report_bytes(1000, "full") > estimate_report_bytes(1000, "tables") > estimate_report_bytes(1000, "summary")
+
+    assert plan_detail(6, _cost(6, "full")) == "full"
+    assert plan_detail(6, _cost(6, "tables")) == "tables"
+    assert plan_detail(6, _cost(6, "summary")) == "summary"
+    assert plan_detail(6, 1) == "summary"
+    assert plan_detail(6, _cost(6, "summary"), detail="tables") == "summary"
+    with pytest.raises(MemoryBudgetExceeded):
+        plan_detail(6, _cost(6, "tables"), downgrade=False)
+
+
+def test_memory_budget_blocks_until_release():
+    budget = MemoryBudget(100)
+    assert budget.try_acquire(150)  # admitted alone
+    assert not budget.try_acquire(1)
+    released = threading.Timer(0.05, budget.release, args=(150,))
+    released.start()
+    assert budget.acquire(60, timeout=5)
+    assert budget.in_flight == 60 and budget.peak == 150
+
+
+def _simulation(traces):
+    repo = InMemoryTraceRepository()
+    repo.save_traces(traces)
+    return RunSimulation(repo), [t.procedure_id for t in traces]
+
+
+def test_scorer_throttles_and_downgrades(template, sampled_traces):
+    simulation, ids = _simulation(sampled_traces(20, seed=2))
+    eager = {i: simulation.execute(i, template=template) for i in ids}
+    budget = _cost(6, "tables")
+    scorer = BudgetedBatchScorer(simulation, template, budget, fetch_size=4)
+    items = []
+    for item in scorer.score(ids + ["MISSING"]):
+        assert scorer.budget.in_flight <= budget + 4 * _cost(6, "tables")
+        items.append(item)
+    assert scorer.budget.in_flight == 0
+    assert [i.trace_id for i in items] == ids + ["MISSING"]
+    assert items[-1].error.startswith("ValueError")
+    for item in items[:-1]:
+        assert item.detail == "tables" and item.downgraded
+        assert item.report.Traceability == [] and item.report.StepTable == eager[item.trace_id].StepTable
+        assert item.report.GlobalMetrics == eager[item.trace_id].GlobalMetrics
+
+    strict = BudgetedBatchScorer(simulation, template, budget, downgrade=False)
+    assert all(i.error.startswith("MemoryBudgetExceeded") for i in strict.score(ids[:3]))
+    roomy = BudgetedBatchScorer(simulation, template, 1 << 30, lazy=True)
+    assert [i.report for i in roomy.score(ids[:3])] == [eager[i] for i in ids[:3]]
+
+
+class CountingRepository(InMemoryTraceRepository):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_trace(self, trace_id):
+        self.reads += 1
+        return super().get_trace(trace_id)
+
+    def get_traces(self, trace_ids):
+        trace_ids = list(trace_ids)
+        self.reads += len(trace_ids)
+        return super().get_traces(trace_ids)
+
+
+def test_scorer_reads_each_trace_once(template, sampled_traces):
+    simulation, ids = _simulation(sampled_traces(10, seed=2))
+    repo = CountingRepository()
+    repo.save_traces(simulation.trace_repo.get_traces(ids))
+    scorer = BudgetedBatchScorer(RunSimulation(repo), template, 1 << 30, fetch_size=3)
+    items = list(scorer.score(ids))
+    assert repo.reads == len(ids)
+    assert [i.report for i in items] == [simulation.execute(i, template=template) for i in ids]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cli_memory_budget(tmp_path, template_path, sampled_traces, workers):
+    traces = tmp_path / "traces.ndjson"
+    traces.write_bytes(b"".join(t.model_dump_json(by_alias=True).encode() + b"\n" for t in sampled_traces(8, seed=4)))
+    budget = str(workers * _cost(6, "tables"))
+    out = tmp_path / "out.ndjson"
+    common = ["score", str(traces), "-t", template_path, "-o", str(out), "--workers", str(workers),
+              "--chunk-size", "2", "--memory-budget", budget, "-q"]
+
+    assert main(common + ["--downgrade"]) == 0
+    rows = [orjson.loads(line) for line in out.read_bytes().splitlines()]
+    assert len(rows) == 8
+    assert all(r["report_detail"] == "tables" and r["Traceability"] == [] and r["StepTable"] for r in rows)
+
+    assert main(common + ["--fail-on-error"]) == 1
+    rows = [orjson.loads(line) for line in out.read_bytes().splitlines()]
+    assert all(r["error"].startswith("MemoryBudgetExceeded") for r in rows)
@@ -0,0 +1,77 @@
+import copy
+
+import numpy as np
+import pytest
+
+from pysimp.benchmarks.generators import SyntheticTemplate, TemplateSpec
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.benchmarks.runner import (
+    BenchmarkConfig, LAYERS, _noise_shapley, compare_results, load_results, run_benchmarks
+)
+from pysimp.cli import main
+from pysimp.domain.services.petri_net import CompiledPetriNet
+from pysimp.infrastructure.adapters.snakes_adapter import SnakesLayerBAdapter
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_generated_cohorts_replay_on_generated_net(tmp_path, concurrency):
+    synthetic = SyntheticTemplate(TemplateSpec(n_surgits=23, surgits_per_step=8, concurrency=concurrency), tmp_path)
+    assert sum(len(step.surgits) for step in synthetic.template.steps.values()) == 23
+    surgits, n_t, e_t = synthetic.sample_cohort(np.random.default_rng(0), 20)
+    assert surgits.shape == (20, 23) and (np.sort(surgits, axis=1) == np.arange(23)).all()
+    if concurrency > 1:
+        assert len({tuple(row) for row in surgits.tolist()}) > 1
+
+    net = CompiledPetriNet.from_template(synthetic.template)
+    adapter = SnakesLayerBAdapter()
+    for trace in synthetic.to_traces((surgits, n_t, e_t)):
+        assert adapter.validate_structure(trace.events, synthetic.template)
+        marking = net.initial_marking
+        for event in trace.events:
+            t = net.transition_index(event.surgit_id)
+            assert net.enabled(marking)[t]
+            marking = net.fire(marking, t)
+
+
+def test_run_and_compare(tmp_path):
+    results = run_benchmarks(BenchmarkConfig(surgits=(10,), concurrency=(1, 2), cohorts=(1, 300), trace_sample=3, repeat=1))
+    assert [c["case"] for c in results["cases"]] == ["s10-c1-n1", "s10-c1-n300", "s10-c2-n1", "s10-c2-n300"]
+    case = results["cases"][1]
+    assert set(case["layers"]) == set(LAYERS)
+    assert case["layers"]["single_pass"]["n"] == 3
+    assert case["layers"]["cohort_kernel"]["items_per_s"] > 0
+
+    assert compare_results(results, results) == []
+    slower = copy.deepcopy(results)
+    slower["cases"][1]["layers"]["shapley"]["mean_s"] *= 2
+    (regression,) = compare_results(results, slower, threshold=0.5)
+    assert (regression.case, regression.layer) == ("s10-c1-n300", "shapley")
+    assert regression.ratio == pytest.approx(2.0)
+
+
+def test_timed_layers_are_execute_steps(template, sampled_traces):
+    trace = sampled_traces(1, seed=0)[0]
+    repo = InMemoryTraceRepository()
+    repo.save_trace(trace)
+    simulation = RunSimulation(repo)
+    res = simulation._run_single_pass(trace.events, template, materialize=False)
+    decomp = simulation._noise_decomposition(trace.events, template, res)
+    assert simulation._assemble_report(trace.procedure_id, template, res, decomp) == simulation.execute(
+        trace.procedure_id, template=template
+    )
+
+    phi = _noise_shapley(simulation, trace.events, template)
+    assert sum(phi.values()) == pytest.approx(res["score"] - decomp.score_ideal)
+
+
+def test_bench_cli(tmp_path):
+    out = tmp_path / "bench.json"
+    args = ["--surgits", "12", "--concurrency", "2", "--cohorts", "5", "--trace-sample", "2", "--repeat", "1", "-q"]
+    assert main(["bench", "run", *args, "-o", str(out)]) == 0
+    baseline = load_results(out)
+    assert baseline["cases"][0]["n_traces"] == 5
+    assert main(["bench", "compare", str(out), str(out)]) == 0
+
+    with pytest.raises(ValueError):
+        run_benchmarks(BenchmarkConfig(layers=("yaml_load", "warp_drive")))
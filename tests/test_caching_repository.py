@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+from pysimp.infrastructure.persistence.caching_repository import CachingTraceRepository, estimate_trace_bytes
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+
+@pytest.fixture(scope="module")
+def traces(sampled_traces):
+    return sampled_traces(10, seed=0)
+
+
+class CountingRepository(InMemoryTraceRepository):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_trace(self, trace_id):
+        self.reads += 1
+        return super().get_trace(trace_id)
+
+    def get_traces(self, trace_ids):
+        trace_ids = list(trace_ids)
+        self.reads += len(trace_ids)
+        return super().get_traces(trace_ids)
+
+
+def _cache(traces, **kwargs):
+    backend = CountingRepository()
+    backend.save_traces(traces)
+    return backend, CachingTraceRepository(backend, **kwargs)
+
+
+def test_read_through_and_byte_bounded_lru(traces):
+    size = estimate_trace_bytes(traces[0])
+    backend, cache = _cache(traces, max_bytes=3 * size)
+    ids = [t.procedure_id for t in traces]
+
+    assert cache.get_trace(ids[0]) is traces[0]
+    assert cache.get_trace(ids[0]) is traces[0]
+    assert backend.reads == 1
+    assert cache.get_traces(ids[:3] + ["missing"]) == traces[:3] + [None]
+    assert backend.reads == 1 + 3  # ids[1], ids[2], missing
+
+    cache.get_trace(ids[0])          # refresh ids[0]
+    cache.get_trace(ids[3])          # evicts ids[1], the least recently used
+    stats = cache.stats
+    assert stats.evictions == 1 and stats.entries == 3 and stats.bytes <= 3 * size
+    reads = backend.reads
+    cache.get_trace(ids[0])
+    assert backend.reads == reads
+    cache.get_trace(ids[1])
+    assert backend.reads == reads + 1
+    assert cache.stats.hits == 4 and cache.stats.misses == 6
+
+
+def test_ttl_and_save_policies(traces):
+    now = [0.0]
+    backend, cache = _cache(traces, ttl=10.0, clock=lambda: now[0])
+    trace_id = traces[0].procedure_id
+    cache.get_trace(trace_id)
+    now[0] = 5.0
+    cache.get_trace(trace_id)
+    now[0] = 20.0
+    cache.get_trace(trace_id)
+    assert backend.reads == 2 and cache.stats.expirations == 1
+
+    updated = traces[0].model_copy(update={"patient_id": "NEW"})
+    cache.save_trace(updated)
+    assert backend.get_trace(trace_id) is updated
+    reads = backend.reads
+    assert cache.get_trace(trace_id) is updated and backend.reads == reads
+
+    backend, cache = _cache(traces, write_through=False)
+    cache.get_trace(trace_id)
+    cache.save_trace(updated)
+    assert cache.get_trace(trace_id) is updated and backend.reads == 2
+    cache.invalidate()
+    assert cache.stats.entries == 0 and cache.stats.bytes == 0
+    assert list(cache.iter_traces()) == [updated] + traces[1:]
+
+
+class BlockingRepository(InMemoryTraceRepository):
+    """
+    Pauses get_trace after reading the stored trace, before returning it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.fetched = threading.Event()
+        self.release = threading.Event()
+
+    def get_trace(self, trace_id):
+        trace = super().get_trace(trace_id)
+        self.fetched.set()
+        self.release.wait(5)
+        return trace
+
+
+@pytest.mark.parametrize("write_through", [True, False])
+def test_miss_racing_a_save_does_not_cache_stale_trace(traces, write_through):
+    backend = BlockingRepository()
+    backend.save_traces(traces)
+    cache = CachingTraceRepository(backend, write_through=write_through)
+    trace_id = traces[0].procedure_id
+    updated = traces[0].model_copy(update={"patient_id": "NEW"})
+
+    reader = threading.Thread(target=cache.get_trace, args=(trace_id,))
+    reader.start()
+    assert backend.fetched.wait(5)   # the miss has read the old trace
+    cache.save_trace(updated)
+    backend.release.set()
+    reader.join(5)
+
+    assert cache.get_trace(trace_id) is updated
+    assert not cache._written
+
+
+def test_miss_racing_a_full_invalidate_is_not_cached(traces):
+    backend = BlockingRepository()
+    backend.save_traces(traces)
+    cache = CachingTraceRepository(backend)
+    reader = threading.Thread(target=cache.get_trace, args=(traces[0].procedure_id,))
+    reader.start()
+    assert backend.fetched.wait(5)
+    cache.invalidate()
+    backend.release.set()
+    reader.join(5)
+    assert cache.stats.entries == 0
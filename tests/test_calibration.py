@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from pysimp.domain.entities.trace import SurgicalTrace, SurgitEvent, PostoperativeOutcome
+from pysimp.domain.services.calibration import CalibrationConvergenceWarning, LayerECalibrator
+from pysimp.domain.services.layer_e import LayerE
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+
+def _synthetic(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0.0, 1.0, size=(n, 4))
+    true = np.array([[-1.0, 1.5, -0.5, 2.0, 0.3],
+                     [0.2, -1.0, 0.8, 0.0, -1.2]])
+    eta = np.hstack([np.ones((n, 1)), X]) @ true.T
+    Y = (rng.uniform(size=eta.shape) < 1.0 / (1.0 + np.exp(-eta))).astype(float)
+    return X, Y, true
+
+
+def test_irls_recovers_coefficients():
+    X, Y, true = _synthetic()
+    coef = LayerECalibrator.fit(X, Y)
+    assert coef.shape == true.shape
+    assert np.max(np.abs(coef - true)) < 0.2
+
+
+def test_streaming_fit_matches_in_memory_fit():
+    X, Y, _ = _synthetic(n=3000, seed=1)
+    batches = lambda: ((X[i:i + 256], Y[i:i + 256]) for i in range(0, len(X), 256))
+    np.testing.assert_allclose(LayerECalibrator.fit_streaming(batches), LayerECalibrator.fit(X, Y), atol=1e-8)
+
+
+def test_calibrate_emits_new_frozen_template_version(template):
+    repo = InMemoryTraceRepository()
+    simulation = RunSimulation(repo)
+    rng = np.random.default_rng(2)
+    reports, traces = [], []
+    now = datetime(2024, 1, 1)
+    for i in range(60):
+        events = [SurgitEvent(surgit_id=s, timestamp_start=now, timestamp_end=now + timedelta(minutes=5),
+                              n_t=float(rng.uniform(1.0, 3.0)))
+                  for s in ["S1", "S2", "S3", "S4", "S5", "S6"]]
+        outcomes = [PostoperativeOutcome(complication_type="Infection", time_window="30-day")] if i % 3 == 0 else []
+        trace = SurgicalTrace(procedure_id=f"T{i}", patient_id="P", events=events, outcomes=outcomes)
+        repo.save_trace(trace)
+        traces.append(trace)
+        reports.append(simulation.execute(trace.procedure_id, template=template))
+
+    with pytest.warns(CalibrationConvergenceWarning):  # Bleeding is never observed
+        calibrated = LayerECalibrator.calibrate(template, reports, traces, version="1.1.0")
+    assert calibrated.version == "1.1.0"
+    assert template.version == "1.0.0"
+    infection = calibrated.calibration_coefficients["Infection"]
+    assert set(infection["gamma_k_t"]) == {"P1", "P2", "P3"}
+    assert infection["xi_k_t"] == {"P1": 0.0, "P2": 0.0, "P3": 0.0}
+    # Bleeding never observed: strongly negative intercept
+    assert calibrated.calibration_coefficients["Bleeding"]["alpha_k"] < infection["alpha_k"]
+    with pytest.raises(ValidationError):
+        calibrated.version = "2.0"
+    with pytest.raises(ValueError):
+        LayerECalibrator.calibrate(template, reports, traces, version="1.0.0")
+
+
+def test_calibrated_template_reproduces_fitted_predictor(template):
+    step_ids = list(template.steps)
+    rng = np.random.default_rng(4)
+    X = rng.uniform(0.0, 1.0, size=(4000, 2 + len(step_ids)))
+    eta_true = -1.0 + X @ np.array([1.0, -0.5, 0.8, 0.3, -0.2])
+    Y = (rng.uniform(size=(len(X), 1)) < 1.0 / (1.0 + np.exp(-eta_true[:, None]))).astype(float)
+    coef = LayerECalibrator.fit(X, Y)
+    calibrated = LayerECalibrator.calibrated_template(template, coef, ["Infection"], step_ids, "1.1.0")
+
+    complications, _, matrix = LayerE.pcp_coefficient_matrix(calibrated)
+    row = complications.index("Infection")
+    delta_t = X[:, 2:]
+    eta, _ = LayerE.predict_pcp_matrix(matrix, X[:, 0], X[:, 1], delta_t, delta_t)  # rho_t == delta_t
+    np.testing.assert_allclose(eta[:, row], np.hstack([np.ones((len(X), 1)), X]) @ coef[0], atol=1e-12)
+
+
+def test_non_convergence_warns():
+    X, Y, _ = _synthetic(n=500, seed=3)
+    with pytest.warns(CalibrationConvergenceWarning):
+        LayerECalibrator.fit(X, Y, max_iter=1)
@@ -0,0 +1,69 @@
+import orjson
+import pytest
+
+from pysimp.cli import main
+
+
+@pytest.fixture
+def traces_file(tmp_path, sampled_traces):
+    path = tmp_path / "traces.ndjson"
+    with open(path, "wb") as f:
+        for trace in sampled_traces(12, seed=3, ce_probability=0.3):
+            f.write(trace.model_dump_json(by_alias=True).encode() + b"\n")
+        f.write(b'{"procedure_id": "BROKEN"}\n')
+    return path
+
+
+def _lines(path):
+    return [orjson.loads(line) for line in path.read_bytes().splitlines()]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_score_ndjson(traces_file, template_path, tmp_path, workers):
+    out = tmp_path / "reports.ndjson"
+    code = main(["score", str(traces_file), "-t", template_path, "-o", str(out),
+                 "--workers", str(workers), "--chunk-size", "5", "--quiet"])
+    assert code == 0
+    rows = _lines(out)
+    assert [r["trace_id"] for r in rows[:12]] == [f"SYN-{i:08d}" for i in range(12)]
+    assert all("Score_SIM" in r["GlobalMetrics"] for r in rows[:12])
+    assert rows[12]["trace_id"] is None and "ValidationError" in rows[12]["error"]
+
+
+def test_score_columnar_matches_ndjson(traces_file, template_path, tmp_path):
+    ndjson, columnar = tmp_path / "a.ndjson", tmp_path / "b.ndjson"
+    main(["score", str(traces_file), "-t", template_path, "-o", str(ndjson), "--quiet"])
+    main(["score", str(traces_file), "-t", template_path, "-o", str(columnar), "--format", "columnar",
+          "--chunk-size", "5", "--quiet"])
+    groups = _lines(columnar)
+    assert len(groups) == 3
+    scores = [s for g in groups for s in g["Score_SIM"]]
+    expected = [r["GlobalMetrics"]["Score_SIM"] for r in _lines(ndjson)[:12]]
+    assert scores[:12] == pytest.approx(expected)
+    assert groups[-1]["error"][-1] is not None
+
+
+def test_resume_skips_scored_traces_and_drops_torn_line(traces_file, template_path, tmp_path, capsys):
+    out = tmp_path / "reports.ndjson"
+    lines = traces_file.read_bytes().splitlines(keepends=True)
+    head = tmp_path / "head.ndjson"
+    head.write_bytes(b"".join(lines[:7]))
+    main(["score", str(head), "-t", template_path, "-o", str(out), "--quiet"])
+    with open(out, "ab") as f:
+        f.write(b'{"trace_id": "SYN-000')  # interrupted write
+
+    main(["score", str(traces_file), "-t", template_path, "-o", str(out), "--resume", "--progress-interval", "0"])
+    rows = _lines(out)
+    assert [r["trace_id"] for r in rows[:12]] == [f"SYN-{i:08d}" for i in range(12)]
+    assert len(rows) == 13
+    assert "traces/s" in capsys.readouterr().err
+
+
+def test_directory_input(traces_file, template_path, tmp_path):
+    directory = tmp_path / "in"
+    directory.mkdir()
+    for n, line in enumerate(traces_file.read_bytes().splitlines()[:3]):
+        (directory / f"{n}.json").write_bytes(line)
+    out = tmp_path / "reports.ndjson"
+    assert main(["score", str(directory), "-t", template_path, "-o", str(out), "--quiet", "--fail-on-error"]) == 0
+    assert len(_lines(out)) == 3
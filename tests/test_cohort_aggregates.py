@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from pysimp.domain.services.cohort_aggregates import CohortAggregator, KLLSketch, MomentSketch
+from pysimp.domain.services.forward_simulator import NoiseDistribution
+from pysimp.domain.services.scoring_kernel import CompiledTemplate
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+
+def test_moment_merge_is_exact():
+    values = np.random.default_rng(0).normal(3.0, 2.0, 10_001)
+    parts = [MomentSketch() for _ in range(4)]
+    for part, chunk in zip(parts, np.array_split(values, 4)):
+        part.update(chunk)
+    merged = MomentSketch()
+    for part in parts:
+        merged.merge(part)
+    assert merged.count == len(values)
+    assert merged.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert merged.variance == pytest.approx(values.var(ddof=1), rel=1e-10)
+    assert (merged.minimum, merged.maximum) == (values.min(), values.max())
+
+
+def test_kll_rank_error_and_constant_memory():
+    rng = np.random.default_rng(1)
+    small, large = KLLSketch(k=200, seed=0), KLLSketch(k=200, seed=0)
+    values = rng.lognormal(0.0, 1.0, 200_000)
+    small.update(values[:20_000])
+    for chunk in np.array_split(values, 50):
+        large.update(chunk)
+
+    qs = np.array([0.01, 0.1, 0.5, 0.9, 0.99])
+    ranks = np.searchsorted(np.sort(values), large.quantiles(qs)) / len(values)
+    assert np.max(np.abs(ranks - qs)) < 0.02
+    assert large.size < 3 * large.k + 2 * len(large.levels)
+    assert large.size < 2 * small.size
+
+    left, right = KLLSketch(k=200, seed=1), KLLSketch(k=200, seed=2)
+    left.update(values[::2])
+    right.update(values[1::2])
+    left.merge(right)
+    assert left.n == len(values)
+    ranks = np.searchsorted(np.sort(values), left.quantiles(qs)) / len(values)
+    assert np.max(np.abs(ranks - qs)) < 0.02
+
+
+def test_reports_and_kernel_arrays_aggregate_alike_and_merge(template, sampled_traces):
+    repo = InMemoryTraceRepository()
+    simulation = RunSimulation(repo)
+    traces = sampled_traces(60, seed=4, n_t=NoiseDistribution("uniform", low=1.0, high=2.0))
+
+    from_reports, first, second = CohortAggregator(seed=0), CohortAggregator(seed=1), CohortAggregator(seed=2)
+    for i, trace in enumerate(traces):
+        repo.save_trace(trace)
+        report = simulation.execute(trace.procedure_id, template=template, lazy=True)
+        from_reports.add_report(report, template.version)
+        (first if i % 2 else second).add_report(report, template.version)
+    first.merge(second)
+
+    from_arrays = CohortAggregator(seed=0)
+    kernel = CompiledTemplate.from_template(template)
+    batch = [kernel.encode_events(t.events) for t in traces]
+    length = max(len(s) for s, _, _ in batch)
+    pad = lambda a, v: np.pad(a, (0, length - len(a)), constant_values=v)
+    result = kernel.score_cohort(np.stack([pad(s, -1) for s, _, _ in batch]),
+                                 np.stack([pad(n, 1.0) for _, n, _ in batch]),
+                                 np.stack([pad(e, 1.0) for _, _, e in batch]))
+    from_arrays.add_kernel_result(result, kernel.step_ids, template.version)
+
+    for metric, step_id in [("Score_SIM", None), ("S_q(SIM)", None), ("s_q_t", "P2"), ("rho_t", "P1")]:
+        a = from_reports.get(template.version, metric, step_id).moments
+        b = from_arrays.get(template.version, metric, step_id).moments
+        c = first.get(template.version, metric, step_id).moments
+        assert a.count == b.count == c.count
+        assert a.mean == pytest.approx(b.mean) and a.mean == pytest.approx(c.mean)
+        assert a.variance == pytest.approx(b.variance) and a.variance == pytest.approx(c.variance)
+
+    rows = {(r["step_id"], r["metric"]): r for r in from_reports.summary()}
+    assert rows[(None, "Score_SIM")]["count"] == len(traces)
+    assert rows[(None, "pcp:Infection")]["q0.05"] <= rows[(None, "pcp:Infection")]["q0.95"]
+    assert (None, "phi_patient") in rows
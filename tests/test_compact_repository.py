@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from pysimp.domain.entities.trace import (
+    DeviationCause, PostoperativeOutcome, SurgicalTrace, SurgitEvent, SurgitType
+)
+from pysimp.domain.services.forward_simulator import NoiseDistribution
+from pysimp.infrastructure.persistence.compact_trace import CompactTraceCodec, EncodedTrace
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+
+@pytest.fixture(scope="module")
+def traces(sampled_traces):
+    return sampled_traces(30, seed=9, n_t=NoiseDistribution("uniform", low=1.0, high=2.0),
+                          pause_probability=0.3, ce_probability=0.3)
+
+
+def _rich_trace():
+    start = datetime(2024, 5, 2, 9, 0, 0, 250, tzinfo=timezone(timedelta(hours=2)))
+    return SurgicalTrace(
+        procedure_id="R1", patient_id="P1",
+        events=[
+            SurgitEvent(surgit_id="S1", timestamp_start=start, timestamp_end=start + timedelta(minutes=4),
+                        surgit_type=SurgitType.CE_ADDITION, n_t=1.3, e_t=1.1, is_deviation=True,
+                        deviation_cause=DeviationCause.DECISION, risk_tags=["bleeding_risk", "infection_risk"],
+                        complexity_weight=0.4),
+            SurgitEvent(surgit_id="S2", timestamp_start=start - timedelta(days=1),
+                        timestamp_end=start, risk_tags=["bleeding_risk"]),
+            SurgitEvent(surgit_id="PAUSE", timestamp_start=start, timestamp_end=start, is_pause=True),
+        ],
+        outcomes=[PostoperativeOutcome(complication_type="Bleeding", time_window="intraop")]
+    )
+
+
+@pytest.mark.parametrize("hot_entries", [None, 4])
+def test_compact_mode_round_trips(traces, hot_entries):
+    repo = InMemoryTraceRepository(compact=True, hot_entries=hot_entries)
+    repo.save_traces(traces + [_rich_trace(), SurgicalTrace(procedure_id="E", patient_id="P")])
+    assert repo.get_trace("R1") == _rich_trace()
+    assert repo.get_trace("E") == SurgicalTrace(procedure_id="E", patient_id="P")
+    assert repo.get_traces([t.procedure_id for t in traces]) == traces
+    assert list(repo.iter_traces(batch_size=7))[:len(traces)] == traces
+    if hot_entries:
+        assert repo.memory_stats()["cold_traces"] == len(traces) + 2 - hot_entries
+
+
+def test_compact_encodings_shrink_memory(traces):
+    plain, compact, cold = (InMemoryTraceRepository(), InMemoryTraceRepository(compact=True),
+                            InMemoryTraceRepository(compact=True, hot_entries=0))
+    for repo in (plain, compact, cold):
+        repo.save_traces(traces)
+    per_event = [r.memory_stats()["bytes_per_event"] for r in (plain, compact, cold)]
+    assert per_event[0] > 5 * per_event[1] > 0
+    assert compact.memory_stats()["events"] == plain.memory_stats()["events"]
+
+    float32 = InMemoryTraceRepository(compact=True, noise_dtype=np.float32)
+    float32.save_traces(traces)
+    assert float32.memory_stats()["bytes"] < compact.memory_stats()["bytes"]
+    decoded = float32.get_trace(traces[0].procedure_id)
+    np.testing.assert_allclose([e.noise_patient for e in decoded.events],
+                               [e.noise_patient for e in traces[0].events], rtol=1e-6)
+
+
+def test_start_deltas_stay_narrow(traces):
+    codec = CompactTraceCodec()
+    encoded = codec.encode(traces[0])
+    assert encoded.start_deltas[0] == 0 and encoded.start_base > np.iinfo(np.int32).max
+    assert encoded.start_deltas.dtype.itemsize <= 4 and encoded.durations.dtype.itemsize <= 4
+    decoded = EncodedTrace.from_bytes(encoded.to_bytes())
+    assert decoded.start_base == encoded.start_base
+    assert codec.decode(decoded) == traces[0]
+
+
+def test_end_offsets_round_trip(traces):
+    cet, cest = timezone(timedelta(hours=1)), timezone(timedelta(hours=2))
+    trace = SurgicalTrace(procedure_id="DST", patient_id="P1", events=[
+        SurgitEvent(surgit_id="S1", timestamp_start=datetime(2024, 3, 31, 1, 30, tzinfo=cet),
+                    timestamp_end=datetime(2024, 3, 31, 3, 10, tzinfo=cest)),
+        SurgitEvent(surgit_id="S2", timestamp_start=datetime(2024, 3, 31, 3, 10, tzinfo=cest),
+                    timestamp_end=datetime(2024, 3, 31, 3, 30)),
+    ])
+    repo = InMemoryTraceRepository(compact=True)
+    repo.save_trace(trace)
+    loaded = repo.get_trace("DST")
+    assert loaded == trace
+    assert loaded.events[0].timestamp_end.utcoffset() == timedelta(hours=2)
+    assert loaded.events[1].timestamp_end.tzinfo is None
+    assert CompactTraceCodec().encode(trace).durations[0] == 40 * 60 * 10 ** 6
+    assert CompactTraceCodec().encode(traces[0]).end_offsets is None
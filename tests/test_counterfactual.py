@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from pysimp.domain.services.counterfactual import (
+    CounterfactualEngine, InsertEvent, OverrideNoise, OverrideSurgit, RemoveEvent, ReplaceEvent
+)
+from pysimp.domain.services.forward_simulator import NoiseDistribution
+from pysimp.domain.entities.trace import SurgicalTrace
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+
+@pytest.fixture(scope="module")
+def traces(sampled_traces):
+    return sampled_traces(
+        4, seed=11, n_t=NoiseDistribution("shifted_gamma", shape=2.0, scale=0.3),
+        e_t=NoiseDistribution("uniform", low=1.0, high=1.5), pause_probability=0.4
+    )
+
+
+@pytest.fixture(scope="module")
+def events(traces):
+    # Sampled traces back to back: a long trace with repeated surgits and pauses
+    return [event for trace in traces for event in trace.events]
+
+
+def _override(template, surgit_id, **update):
+    steps = {
+        s_id: step.model_copy(update={"surgits": {
+            k: surgit.model_copy(update=update) if k == surgit_id else surgit for k, surgit in step.surgits.items()
+        }})
+        for s_id, step in template.steps.items()
+    }
+    return template.model_copy(update={"steps": steps})
+
+
+def _apply(events, edits):
+    edited = list(events)
+    for edit in edits:
+        if isinstance(edit, OverrideNoise):
+            update = {k: v for k, v in (("noise_patient", edit.n_t), ("noise_external", edit.e_t)) if v is not None}
+            edited[edit.position] = edited[edit.position].model_copy(update=update)
+        elif isinstance(edit, ReplaceEvent):
+            edited[edit.position] = edit.event
+    removed = {e.position for e in edits if isinstance(e, RemoveEvent)}
+    out = []
+    for i in range(len(events) + 1):
+        out.extend(e.event for e in edits if isinstance(e, InsertEvent) and e.position == i)
+        if i < len(events) and i not in removed:
+            out.append(edited[i])
+    return out
+
+
+def _engine(simulation, events, template, stride):
+    repo = simulation.trace_repo
+    repo.save_trace(SurgicalTrace(procedure_id="BASE", patient_id="P", events=events))
+    return simulation.counterfactuals("BASE", template, stride=stride)
+
+
+@pytest.mark.parametrize("stride", [1, 4, 32])
+def test_event_edits_match_full_rescoring(template, events, stride):
+    simulation = RunSimulation(InMemoryTraceRepository())
+    engine = _engine(simulation, events, template, stride)
+    assert engine.base.score == pytest.approx(simulation._run_single_pass(events, template)["score"])
+
+    rng = np.random.default_rng(stride)
+    L = len(events)
+    for _ in range(25):
+        positions = rng.choice(L, size=3, replace=False)
+        edits = [
+            RemoveEvent(int(positions[0])),
+            ReplaceEvent(int(positions[1]), events[int(rng.integers(L))]),
+            OverrideNoise(int(positions[2]), n_t=1.0, e_t=float(rng.uniform(1.0, 2.0))),
+            InsertEvent(int(rng.integers(L + 1)), events[int(rng.integers(L))]),
+        ]
+        result = engine.evaluate(edits)
+        edited = _apply(events, edits)
+        expected = simulation._run_single_pass(edited, template)
+        assert result.score == pytest.approx(expected["score"])
+        assert result.rho == pytest.approx(expected["rho"])
+        assert result.entropy == pytest.approx(expected["entropy"])
+        assert result.resumed_at == min(e.position for e in edits)
+        assert result.delta_score == pytest.approx(expected["score"] - engine.base.score)
+        # Layer C resumed from the checkpoint matches a run over the whole edited trace
+        full = CounterfactualEngine(edited, engine.kernel, engine.dynamics).base
+        np.testing.assert_allclose(result.clinical_state, full.clinical_state)
+
+
+def test_parameter_override_matches_edited_template(template, events):
+    simulation = RunSimulation(InMemoryTraceRepository())
+    engine = _engine(simulation, events, template, stride=4)
+    surgit_id = events[len(events) // 2].surgit_id if not events[len(events) // 2].is_pause else events[-1].surgit_id
+    for update in [dict(intrinsic_deviation=0.4), dict(mitigation_factor=0.5, security_scope="res"),
+                   dict(security_scope="pcp")]:
+        result = engine.evaluate([OverrideSurgit(surgit_id, **update)])
+        expected = simulation._run_single_pass(events, _override(template, surgit_id, **update))
+        assert result.score == pytest.approx(expected["score"])
+        first = next(i for i, e in enumerate(events) if e.surgit_id == surgit_id)
+        assert result.resumed_at == first
+        assert result.recomputed == len(events) - first
+
+
+def test_no_edits_and_base_traceability(template, events):
+    simulation = RunSimulation(InMemoryTraceRepository())
+    engine = _engine(simulation, events, template, stride=4)
+    result = engine.evaluate([])
+    assert result.resumed_at == len(events) and result.recomputed == 0
+    assert result.score == engine.base.score and result.delta_score == 0.0
+
+    last = simulation._run_single_pass(events, template)["traceability"][-1]
+    scored_last = max(i for i, e in enumerate(events) if not e.is_pause)
+    tail = engine.evaluate([RemoveEvent(i) for i in range(scored_last + 1, len(events))])
+    assert tail.clinical_state[0] == pytest.approx(last.clinical_state_burden)
+
+
+def test_invalid_edits(template, events):
+    engine = _engine(RunSimulation(InMemoryTraceRepository()), events, template, stride=4)
+    with pytest.raises(IndexError):
+        engine.evaluate([RemoveEvent(len(events))])
+    with pytest.raises(ValueError):
+        engine.evaluate([RemoveEvent(3), ReplaceEvent(3, events[0])])
+    with pytest.raises(ValueError):
+        engine.evaluate([OverrideSurgit("UNKNOWN", intrinsic_deviation=0.1)])
+    with pytest.raises(ValueError):
+        engine.evaluate([OverrideNoise(next(i for i, e in enumerate(events) if not e.is_pause), n_t=0.5)])
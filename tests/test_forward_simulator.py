@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from pysimp.domain.entities.surgit import Surgit
+from pysimp.domain.entities.step import Step
+from pysimp.domain.entities.template import NormativeTemplate
+from pysimp.domain.entities.trace import SurgitType
+from pysimp.domain.services.forward_simulator import (
+    ForwardSimulator, ForwardSimulationConfig, NoiseDistribution
+)
+from pysimp.domain.services.petri_net import CompiledPetriNet
+from pysimp.domain.services.scoring_kernel import CompiledTemplate
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.adapters.snakes_adapter import SnakesLayerBAdapter
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+CONFIG = ForwardSimulationConfig(
+    n_t=NoiseDistribution("shifted_gamma", shape=2.0, scale=0.3),
+    e_t=NoiseDistribution("uniform", low=1.0, high=1.5),
+    pause_probability=0.3,
+    ce_probability=0.2,
+)
+
+
+def _branching_template():
+    surgits = {s: Surgit(id=s, name=s, intrinsic_deviation=d, is_mandatory=False)
+               for s, d in [("A", 0.1), ("B1", 0.3), ("B2", 0.05), ("C", 0.2)]}
+    step = Step(id="P1", name="P1", surgits=surgits)
+    return NormativeTemplate(
+        procedure_type="Branching", version="1.0", steps={"P1": step},
+        forbidden_states=[["p_mid", "p_bad"]],
+        structure_definition={
+            "places": ["p0", "p_mid", "p_end", "p_bad"],
+            "transitions": [
+                {"id": "A", "input": "p0", "output": ["p_mid", "p_end"]},
+                {"id": "B1", "input": "p_end", "output": "p_bad"},
+                {"id": "B2", "input": "p_mid", "output": "p_end"},
+                {"id": "C", "input": ["p_end", "p_end"], "output": "p0"},
+            ],
+            "initial_marking": "p0",
+        },
+    )
+
+
+def _looping_template():
+    # R retries A indefinitely; O skips the mandatory B
+    surgits = {s: Surgit(id=s, name=s, intrinsic_deviation=0.1, is_mandatory=s in ("A", "B"))
+               for s in ("A", "R", "B", "O")}
+    return NormativeTemplate(
+        procedure_type="Looping", version="1.0", steps={"P1": Step(id="P1", name="P1", surgits=surgits)},
+        structure_definition={
+            "places": ["p0", "p1", "p_end"],
+            "transitions": [
+                {"id": "A", "input": "p0", "output": "p1"},
+                {"id": "R", "input": "p1", "output": "p0"},
+                {"id": "B", "input": "p1", "output": "p_end"},
+                {"id": "O", "input": "p0", "output": "p_end"},
+            ],
+            "initial_marking": "p0",
+        },
+    )
+
+
+def test_sampled_traces_are_structurally_valid_and_score_like_run_simulation(template):
+    simulator = ForwardSimulator(template, CONFIG)
+    traces = list(simulator.iter_traces(20, seed=11, batch_size=8))
+
+    repo = InMemoryTraceRepository()
+    simulation = RunSimulation(repo)
+    layer_b = SnakesLayerBAdapter()
+    expected = []
+    for trace in traces:
+        fired = [e for e in trace.events if not e.is_pause]
+        assert [e.surgit_id for e in fired] == ["S1", "S2", "S3", "S4", "S5", "S6"]
+        assert layer_b.validate_structure(fired, template)
+        repo.save_trace(trace)
+        expected.append(simulation.execute(trace.procedure_id, template=template).GlobalMetrics["Score_SIM"])
+
+    streamed = simulator.sample_scores(20, seed=11, batch_size=8)
+    np.testing.assert_allclose(streamed, expected)
+    assert any(e.is_pause for t in traces for e in t.events)
+    assert any(e.surgit_type == SurgitType.CE_SUBSTITUTION for t in traces for e in t.events)
+
+
+def test_kernel_matches_single_pass_on_branching_net():
+    template = _branching_template()
+    simulator = ForwardSimulator(template, ForwardSimulationConfig(max_events=12, n_t=CONFIG.n_t))
+    kernel = CompiledTemplate.from_template(template)
+    simulation = RunSimulation(InMemoryTraceRepository())
+    net = CompiledPetriNet.from_template(template)
+
+    for trace in simulator.iter_traces(30, seed=3):
+        marking = net.initial_marking.copy()
+        for event in trace.events:
+            t = net.transition_index(event.surgit_id)
+            assert net.enabled(marking, avoid_forbidden=True)[t]
+            marking = net.fire(marking, t)
+        single = simulation._run_single_pass(trace.events, template)
+        assert kernel.score_events(trace.events).score[0] == pytest.approx(single["score"])
+
+
+def test_streamed_scores_are_reproducible_across_workers(template):
+    simulator = ForwardSimulator(template, CONFIG)
+    serial = simulator.sample_scores(300, seed=5, batch_size=64)
+    again = simulator.sample_scores(300, seed=5, batch_size=64)
+    parallel = simulator.sample_scores(300, seed=5, batch_size=64, n_workers=2)
+    assert serial.shape == (300,)
+    np.testing.assert_array_equal(serial, again)
+    np.testing.assert_allclose(serial, parallel)
+    assert not np.array_equal(serial, simulator.sample_scores(300, seed=6, batch_size=64))
+
+
+def test_truncated_and_b6_incomplete_walks_are_redrawn():
+    template = _looping_template()
+    config = ForwardSimulationConfig(max_events=6)
+    simulator = ForwardSimulator(template, config)
+    sequences, terminal = simulator.net._walk(np.random.default_rng(0), 200, 6, simulator._weights)
+    assert not terminal.all()  # loops cut at max_events
+    assert not simulator.net.is_complete(sequences, np.ones(200, dtype=bool)).all()  # O skips B
+
+    layer_b = SnakesLayerBAdapter()
+    traces = list(simulator.iter_traces(100, seed=1))
+    assert any(len(t.events) > 2 for t in traces)  # some walks looped through R
+    for trace in traces:
+        assert trace.events[-1].surgit_id == "B"
+        assert layer_b.validate_structure(trace.events, template)
+
+    with pytest.raises(ValueError, match="B6"):
+        next(ForwardSimulator(template, ForwardSimulationConfig(max_events=1, max_attempts=3)).iter_traces(5))
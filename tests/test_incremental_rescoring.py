@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from pysimp.domain.services.forward_simulator import NoiseDistribution
+from pysimp.domain.services.incremental_rescoring import IncrementalCohortScorer, TemplateDiff
+from pysimp.domain.services.scoring_kernel import CompiledTemplate
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+CONFIG = dict(
+    n_t=NoiseDistribution("shifted_gamma", shape=2.0, scale=0.3),
+    e_t=NoiseDistribution("uniform", low=1.0, high=1.5),
+    pause_probability=0.3,
+)
+
+
+@pytest.fixture(scope="module")
+def traces(sampled_traces):
+    # Every sampled trace fires every surgit: drop some so postings differ
+    sampled = sampled_traces(60, seed=5, **CONFIG)
+    return [
+        trace.model_copy(update={"events": [e for e in trace.events if e.surgit_id not in ("S3", "S5")]})
+        if b % 3 == 0 else trace
+        for b, trace in enumerate(sampled)
+    ]
+
+
+def _surgits(template, surgit_id, **update):
+    steps = {
+        s_id: step.model_copy(update={"surgits": {
+            k: surgit.model_copy(update=update) if k == surgit_id else surgit for k, surgit in step.surgits.items()
+        }})
+        for s_id, step in template.steps.items()
+    }
+    return template.model_copy(update={"steps": steps})
+
+
+def _weight(template, step_id, weight_wt):
+    steps = dict(template.steps)
+    steps[step_id] = steps[step_id].model_copy(update={"weight_wt": weight_wt})
+    return template.model_copy(update={"steps": steps})
+
+
+def _move(template, surgit_id, to_step):
+    steps = {s_id: dict(step.surgits) for s_id, step in template.steps.items()}
+    surgit = next(s.pop(surgit_id) for s in steps.values() if surgit_id in s)
+    steps[to_step][surgit_id] = surgit
+    return template.model_copy(update={"steps": {
+        s_id: step.model_copy(update={"surgits": steps[s_id]}) for s_id, step in template.steps.items()
+    }})
+
+
+def _remove(template, surgit_id):
+    return template.model_copy(update={"steps": {
+        s_id: step.model_copy(update={"surgits": {k: v for k, v in step.surgits.items() if k != surgit_id}})
+        for s_id, step in template.steps.items()
+    }})
+
+
+VERSIONS = [
+    lambda t: _surgits(t, "S3", intrinsic_deviation=0.35),
+    lambda t: _weight(t, "P2", 2.5),
+    lambda t: _surgits(t, "S1", mitigation_factor=0.4, security_scope="res"),
+    lambda t: _surgits(t, "S5", security_scope="pcp", mitigation_factor=0.7),
+    lambda t: _move(t, "S2", "P3"),
+    lambda t: _remove(t, "S4"),
+    lambda t: t.model_copy(update={"tsallis_q": 0.7, "weight_beta": 2.0}),
+]
+
+
+@pytest.mark.parametrize("q", [1.0, 2.0])
+def test_versions_match_full_rescoring(template, traces, q):
+    version = template.model_copy(update={"tsallis_q": q})
+    scorer = IncrementalCohortScorer.from_traces(traces, version)
+    for change in VERSIONS:
+        version = change(version)
+        stats = scorer.update(version)
+        assert not stats.full
+        expected = IncrementalCohortScorer.from_traces(traces, version).result
+        for name in ("pi_t", "s_q_t", "executed", "rho", "entropy", "score", "delta_final"):
+            np.testing.assert_allclose(getattr(scorer.result, name), getattr(expected, name), atol=1e-12)
+
+    simulation = RunSimulation(InMemoryTraceRepository())
+    for b in (0, 17):
+        assert scorer.result.score[b] == pytest.approx(
+            simulation._run_single_pass(traces[b].events, version)["score"]
+        )
+
+
+def test_only_traces_and_steps_of_changed_surgits_are_rescored(template, traces):
+    scorer = IncrementalCohortScorer.from_traces(traces, template)
+    stats = scorer.update(_surgits(template, "S3", intrinsic_deviation=0.35))
+    assert set(stats.diff.surgits) == {"S3"} and not stats.diff.carried
+    assert stats.traces == len(scorer.rows(["S3"])) < len(traces)
+    assert stats.cells == stats.traces  # one step per trace
+
+    stats = scorer.update(_weight(_surgits(template, "S3", intrinsic_deviation=0.35), "P2", 2.5))
+    assert stats.diff.weights == {"P2"} and stats.traces == 0 and stats.cells == 0
+
+    rows = scorer.step_rows("P2")
+    assert np.array_equal(rows, np.flatnonzero(scorer.result.executed[:, 1]))
+
+
+def test_template_diff(template):
+    old = CompiledTemplate.from_template(template)
+    assert TemplateDiff.between(old, old).empty
+    diff = TemplateDiff.between(old, CompiledTemplate.from_template(_move(template, "S2", "P3")))
+    assert diff.surgits == {"S2": ("P1", "P3")} and not diff.structural
+    diff = TemplateDiff.between(old, CompiledTemplate.from_template(_remove(template, "S1")))
+    assert "S1" in diff.surgits
+    steps = dict(template.steps)
+    steps.pop("P3")
+    diff = TemplateDiff.between(old, CompiledTemplate.from_template(template.model_copy(update={"steps": steps})))
+    assert diff.structural
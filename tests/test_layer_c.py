@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from pysimp.domain.entities.surgit import Surgit
+from pysimp.domain.entities.step import Step
+from pysimp.domain.entities.template import NormativeTemplate
+from pysimp.domain.entities.trace import SurgicalTrace, SurgitEvent
+from pysimp.domain.services.layer_c import SCAN_BLOCK, LayerC
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+DYNAMICS = {
+    "state_components": ["fatigue", "instrument_wear"],
+    "decay_functions": {"fatigue": "exponential", "instrument_wear": "linear"},
+    "decay_rates": {"fatigue": 0.5, "instrument_wear": 0.05},
+    "update_functions": {"instrument_wear": "constant"},
+    "update_weights": {"instrument_wear": 0.2},
+    "provenance_decay": 0.8,
+}
+
+
+def _template(dynamics):
+    step = Step(id="P1", name="P1", surgits={
+        "S1": Surgit(id="S1", name="S1", intrinsic_deviation=0.3),
+        "S2": Surgit(id="S2", name="S2", intrinsic_deviation=0.1),
+    })
+    return NormativeTemplate(procedure_type="Test", version="1.0", steps={"P1": step},
+                             structure_definition={}, dynamics_definition=dynamics)
+
+
+def _events():
+    now = datetime(2024, 1, 1)
+    ev = lambda s, **kw: SurgitEvent(surgit_id=s, timestamp_start=now, timestamp_end=now + timedelta(minutes=1), **kw)
+    return [ev("S1", n_t=1.5), ev("PAUSE", is_pause=True), ev("S2", e_t=2.0), ev("S1")]
+
+
+def _reference(events, template):
+    """Event-by-event replay with the original LayerC kernels."""
+    decay = template.dynamics_definition.get("provenance_decay", 1.0)
+    z, fatigue, wear, out = LayerC.initialize_state(), 0.0, 0.0, []
+    for event in events:
+        if event.is_pause:
+            z.provenance_vector = LayerC.update_provenance(z.provenance_vector, 0.0, lambda h: h * decay)
+            fatigue, wear = fatigue * 0.5, max(wear - 0.05, 0.0)
+            continue
+        delta = 1.0 - (1.0 - template.get_surgit(event.surgit_id).intrinsic_deviation) ** (event.noise_patient * event.noise_external)
+        z = LayerC.transition_kernel(z, delta, event.noise_patient, event.noise_external, decay_rate=decay)
+        fatigue = fatigue * 0.5 + delta * event.noise_patient * event.noise_external
+        wear = max(wear - 0.05, 0.0) + 0.2
+        out.append((z.clinical_state["general_burden"], list(z.provenance_vector), fatigue, wear))
+    return out
+
+
+def test_compiled_dynamics_match_event_by_event_kernels():
+    template = _template(DYNAMICS)
+    res = RunSimulation(InMemoryTraceRepository())._run_single_pass(_events(), template)
+    reference = _reference(_events(), template)
+
+    assert [e.step_index for e in res["traceability"]] == [0, 2, 3]
+    for entry, (burden, provenance, fatigue, wear) in zip(res["traceability"], reference):
+        assert entry.clinical_state_burden == pytest.approx(burden)
+        assert entry.provenance_vector == pytest.approx(provenance)
+        assert entry.clinical_state["fatigue"] == pytest.approx(fatigue)
+        assert entry.clinical_state["instrument_wear"] == pytest.approx(wear)
+
+
+def test_burden_only_templates_keep_minimal_traceability():
+    res = RunSimulation(InMemoryTraceRepository())._run_single_pass(_events(), _template({}))
+    assert all(e.clinical_state is None for e in res["traceability"])
+    assert res["traceability"][-1].provenance_vector[1] == 0.0
+
+
+def test_cohort_run_matches_single_trace_runs():
+    dynamics = LayerC.compile(DYNAMICS)
+    rng = np.random.default_rng(0)
+    B, L = 5, 12
+    delta, n, e = rng.uniform(0, 0.3, (B, L)), rng.uniform(1, 2, (B, L)), rng.uniform(1, 2, (B, L))
+    pause = rng.uniform(size=(B, L)) < 0.2
+    cohort = dynamics.run_cohort(delta, n, e, pause)
+    assert cohort.shape == (B, L, 3)
+    for b in range(B):
+        np.testing.assert_allclose(cohort[b], dynamics.run(delta[b], n[b], e[b], pause[b]))
+
+
+def test_scans_match_position_loop_across_blocks():
+    dynamics = LayerC.compile(DYNAMICS)
+    rng = np.random.default_rng(1)
+    B, L = 3, 3 * SCAN_BLOCK + 5
+    delta, n, e = rng.uniform(0, 0.3, (B, L)), rng.uniform(1, 2, (B, L)), rng.uniform(1, 2, (B, L))
+    pause = rng.uniform(size=(B, L)) < 0.3
+    initial = rng.uniform(0, 1, (B, 3))
+    states = dynamics.run_cohort(delta, n, e, pause, initial)
+
+    fatigue, wear = initial[:, 1], initial[:, 2]
+    for pos in range(L):
+        event = ~pause[:, pos]
+        fatigue = fatigue * 0.5 + np.where(event, delta[:, pos] * n[:, pos] * e[:, pos], 0.0)
+        wear = np.maximum(wear - 0.05, 0.0) + np.where(event, 0.2, 0.0)
+        np.testing.assert_allclose(states[:, pos, 1], fatigue, atol=1e-12)
+        np.testing.assert_allclose(states[:, pos, 2], wear, atol=1e-12)
+
+
+def test_per_template_caches_are_bounded():
+    template = _template(DYNAMICS)
+    simulation = RunSimulation(InMemoryTraceRepository())
+    trace = SurgicalTrace(procedure_id="T0", patient_id="P", events=_events())
+    n = 3 * simulation.TEMPLATE_CACHE_SIZE
+    versions = [template.model_copy(update={"weight_alpha": 1.0 + i}) for i in range(n)]
+    keys = {simulation.cache_key(trace, t) for t in versions}
+    for version in versions:
+        simulation._compiled_dynamics(version)
+    assert len(keys) == len(versions)
+    assert len(simulation._fingerprint_cache) == len(simulation._dynamics_cache) == simulation.TEMPLATE_CACHE_SIZE
+    assert simulation._fingerprint_cache[id(versions[-1])][0] is versions[-1]
+    assert id(versions[0]) not in simulation._dynamics_cache  # all versions alive: ids are distinct
+
+
+def test_unknown_decay_function_is_rejected():
+    with pytest.raises(ValueError):
+        LayerC.compile({"state_components": ["edema"], "decay_functions": {"edema": "sigmoid"}})
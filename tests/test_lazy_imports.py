@@ -0,0 +1,55 @@
+import json
+import subprocess
+import sys
+
+import pysimp
+
+IMPORT_BUDGET_SECONDS = 0.1
+HEAVY = ["numpy", "pydantic", "snakes", "snakes.nets", "loguru", "yaml", "networkx"]
+
+
+def _probe(code):
+    """
+    Runs code in a fresh interpreter and returns the JSON it prints.
+    """
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_top_level_import_is_within_budget_and_loads_nothing_heavy():
+    result = _probe(
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import pysimp\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {HEAVY!r} if m in sys.modules]}}))"
+    )
+    assert result["loaded"] == []
+    assert result["elapsed"] < IMPORT_BUDGET_SECONDS
+
+
+def test_snakes_loads_on_first_validation_only(template_path):
+    result = _probe(
+        "import json, sys\n"
+        "import pysimp\n"
+        "adapter = pysimp.SnakesLayerBAdapter()\n"
+        "before = 'snakes.nets' in sys.modules\n"
+        f"template = pysimp.YamlTemplateLoader.load({template_path!r})\n"
+        "trace = [pysimp.SurgitEvent(surgit_id=s, timestamp_start='2024-01-01T00:00:00',\n"
+        "         timestamp_end='2024-01-01T00:01:00') for s in ['S1', 'S2', 'S3', 'S4', 'S5', 'S6']]\n"
+        "valid = adapter.validate_structure(trace, template)\n"
+        "print(json.dumps({'before': before, 'after': 'snakes.nets' in sys.modules, 'valid': valid}))"
+    )
+    assert result == {"before": False, "after": True, "valid": True}
+
+
+def test_facade_resolves_every_export():
+    for name in pysimp.__all__:
+        assert getattr(pysimp, name).__name__ == name
+    assert "RunSimulation" in dir(pysimp)
+    try:
+        pysimp.NotExported
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("unknown attribute resolved")
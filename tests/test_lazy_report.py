@@ -0,0 +1,67 @@
+import pickle
+
+import pytest
+from pydantic import ValidationError
+
+from pysimp.domain.entities.report import LazySimulationReport, SimulationReport
+from pysimp.domain.services.forward_simulator import NoiseDistribution
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+from pysimp.infrastructure.persistence.report_serializer import ReportSerializer
+
+
+@pytest.fixture
+def simulation(sampled_traces):
+    repo = InMemoryTraceRepository()
+    ids = []
+    for trace in sampled_traces(4, seed=2, n_t=NoiseDistribution("uniform", low=1.0, high=2.0),
+                                pause_probability=0.3, ce_probability=0.3):
+        repo.save_trace(trace)
+        ids.append(trace.procedure_id)
+    return RunSimulation(repo), ids
+
+
+def test_lazy_report_matches_eager_report(template, simulation):
+    simulation, ids = simulation
+    for trace_id in ids:
+        eager = simulation.execute(trace_id, template=template)
+        lazy = simulation.execute(trace_id, template=template, lazy=True)
+
+        assert isinstance(lazy, LazySimulationReport) and isinstance(lazy, SimulationReport)
+        assert lazy.GlobalMetrics == eager.GlobalMetrics
+        assert not lazy.is_materialized
+        assert "NoiseTable" not in lazy.__dict__
+
+        assert lazy.NoiseTable == eager.NoiseTable
+        assert "Traceability" not in lazy.__dict__
+        assert lazy.Traceability == eager.Traceability
+        assert lazy.NoiseTable is lazy.NoiseTable
+        assert lazy == eager
+        assert lazy.is_materialized
+
+
+def test_lazy_report_dumps_and_stays_frozen(template, simulation):
+    simulation, ids = simulation
+    eager = simulation.execute(ids[0], template=template)
+
+    assert simulation.execute(ids[0], template=template, lazy=True).model_dump() == eager.model_dump()
+    assert simulation.execute(ids[0], template=template, lazy=True).model_dump_json() == eager.model_dump_json()
+    assert ReportSerializer.loads(ReportSerializer.dumps(
+        simulation.execute(ids[0], template=template, lazy=True))) == eager
+    assert pickle.loads(pickle.dumps(simulation.execute(ids[0], template=template, lazy=True))) == eager
+
+    lazy = simulation.execute(ids[0], template=template, lazy=True)
+    with pytest.raises(ValidationError):
+        lazy.StepTable = []
+    with pytest.raises(AttributeError):
+        lazy.NotATable
+
+
+@pytest.mark.parametrize("detail", ["full", "summary"])
+def test_lazy_report_keeps_fields_set(template, simulation, detail):
+    simulation, ids = simulation
+    eager = simulation.execute(ids[0], template=template, detail=detail)
+    lazy = simulation.execute(ids[0], template=template, lazy=True, detail=detail)
+    assert lazy.model_fields_set == eager.model_fields_set
+    assert lazy.model_dump(exclude_unset=True) == eager.model_dump(exclude_unset=True)
+    assert lazy.model_dump_json(exclude_unset=True) == eager.model_dump_json(exclude_unset=True)
@@ -0,0 +1,60 @@
+import pytest
+
+from pysimp.application.interfaces.observer import NULL_OBSERVER
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.adapters.latency_observer import LatencyHistogram, LatencyHistogramObserver
+from pysimp.infrastructure.adapters.snakes_adapter import SnakesLayerBAdapter
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+from pysimp.infrastructure.persistence.sqlite_report_cache import SQLiteReportCache
+
+
+def test_spans_and_counters_per_layer(tmp_path, template, sampled_traces):
+    observer = LatencyHistogramObserver()
+    repo = InMemoryTraceRepository()
+    simulation = RunSimulation(repo, layer_b_adapter=SnakesLayerBAdapter(observer),
+                               report_cache=SQLiteReportCache(tmp_path / "reports.db"), observer=observer)
+    traces = sampled_traces(4, seed=0)
+    repo.save_traces(traces)
+    for trace in traces:
+        simulation.execute(trace.procedure_id, template=template, hierarchical_attribution=True)
+    simulation.execute(traces[0].procedure_id, template=template, hierarchical_attribution=True)
+
+    summary = observer.summary()
+    spans, counters = summary["spans"], summary["counters"]
+    assert spans["execute"]["n"] == 5
+    for name in ("layer_b", "layer_b.build_net", "layer_b.replay", "pass.actual", "pass.ideal",
+                 "pass.patient", "pass.external", "pcp", "attribution", "report", "report_cache.put"):
+        assert spans[name]["n"] == 4, name
+    events = sum(len(t.events) for t in traces)
+    assert counters["events_processed"] == events
+    assert counters["transitions_fired"] == events
+    assert counters["report_cache.hits"] == 1 and counters["report_cache.misses"] == 4
+    assert counters["coalitions_evaluated"] > 0
+
+    execute = observer.histogram("execute")
+    assert execute.quantile(0.5) <= execute.quantile(0.99) <= execute.max_ns / 1e9
+    assert sum(count for _, count in spans["execute"]["buckets"]) == 5
+    assert spans["pass.actual"]["mean_s"] < spans["execute"]["mean_s"]
+
+
+def test_histogram_quantiles_and_merge():
+    histogram = LatencyHistogram()
+    for micros in (1, 3, 3, 3, 100):
+        histogram.record(micros * 1000)
+    assert histogram.quantile(0.5) == pytest.approx(4e-6)
+    assert histogram.quantile(1.0) == pytest.approx(100e-6)
+
+    a, b = LatencyHistogramObserver(), LatencyHistogramObserver()
+    a.record("x", 1000)
+    a.count("c", 2)
+    b.record("x", 5000)
+    b.count("c")
+    a.merge(b)
+    assert a.histogram("x").n == 2 and a.counters == {"c": 3}
+    a.reset()
+    assert a.summary() == {"spans": {}, "counters": {}}
+
+
+def test_null_observer_allocates_nothing():
+    assert RunSimulation(InMemoryTraceRepository()).observer is NULL_OBSERVER
+    assert NULL_OBSERVER.span("a") is NULL_OBSERVER.span("b")
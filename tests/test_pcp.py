@@ -0,0 +1,54 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from pysimp.domain.entities.trace import SurgicalTrace, SurgitEvent
+from pysimp.domain.services.layer_e import LayerE
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+
+def _cohort(n=4):
+    repo = InMemoryTraceRepository()
+    now = datetime(2024, 1, 1)
+    for i in range(n):
+        events = [SurgitEvent(surgit_id=s, timestamp_start=now, timestamp_end=now + timedelta(minutes=5),
+                              n_t=1.0 + 0.5 * i)
+                  for s in ["S1", "S2", "S3", "S4", "S5", "S6"]]
+        repo.save_trace(SurgicalTrace(procedure_id=f"T{i}", patient_id="P", events=events))
+    return RunSimulation(repo)
+
+
+def test_pcp_table_uses_full_e4_for_every_complication(template):
+    report = _cohort(1).execute("T0", template=template)
+
+    assert [row.complication_type for row in report.PCPTable] == ["Infection", "Bleeding"]
+    steps = {row.step_id: row for row in report.StepTable}
+    for row in report.PCPTable:
+        c = template.calibration_coefficients[row.complication_type]
+        eta = (c["alpha_k"] + c["beta_k_delta"] * report.GlobalMetrics["rho_SIM"]
+               + c["beta_k_s"] * report.GlobalMetrics["S_q(SIM)"]
+               + sum(c["gamma_k_t"][t] * steps[t].delta_t + c["xi_k_t"][t] * steps[t].rho_t for t in steps))
+        assert row.eta_k == pytest.approx(eta)
+        assert row.p_k_sim == pytest.approx(1.0 / (1.0 + math.exp(-eta)))
+
+
+def test_cohort_pcp_matrix_matches_per_report_tables(template):
+    simulation = _cohort(4)
+    reports = [simulation.execute(f"T{i}", template=template) for i in range(4)]
+
+    complications, eta, prob = RunSimulation.pcp_matrix_from_reports(reports, template)
+    assert complications == ["Infection", "Bleeding"]
+    assert prob.shape == (4, 2)
+    for i, report in enumerate(reports):
+        np.testing.assert_allclose(prob[i], [row.p_k_sim for row in report.PCPTable])
+    # Higher patient noise -> higher predicted risk
+    assert np.all(np.diff(prob[:, 0]) > 0)
+
+
+def test_uncalibrated_template_has_empty_pcp_table(template):
+    template = template.model_copy(update={"calibration_coefficients": {}})
+    assert _cohort(1).execute("T0", template=template).PCPTable == []
+    assert LayerE.pcp_coefficient_matrix(template)[2].shape == (0, 9)
@@ -0,0 +1,88 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from pysimp.domain.services.forward_simulator import NoiseDistribution
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+from pysimp.infrastructure.persistence.sqlite_report_cache import SQLiteReportCache
+
+
+@pytest.fixture
+def traces(sampled_traces):
+    return sampled_traces(6, seed=1, n_t=NoiseDistribution("uniform", low=1.0, high=2.0), pause_probability=0.3)
+
+
+def _simulation(cache_path, traces, max_bytes=1 << 30):
+    repo = InMemoryTraceRepository()
+    repo.save_traces(traces)
+    return RunSimulation(repo, report_cache=SQLiteReportCache(cache_path, max_bytes=max_bytes))
+
+
+def _score_all(cache_path, template, traces):
+    simulation = _simulation(cache_path, traces)
+    return [simulation.execute(t.procedure_id, template=template).GlobalMetrics["Score_SIM"] for t in traces]
+
+
+def test_unchanged_inputs_are_not_scored_twice(template, traces, tmp_path, monkeypatch):
+    simulation = _simulation(tmp_path / "reports.db", traces)
+    trace_id = traces[0].procedure_id
+    first = simulation.execute(trace_id, template=template)
+
+    calls = []
+    original = simulation._run_single_pass
+    monkeypatch.setattr(simulation, "_run_single_pass", lambda *a, **k: calls.append(1) or original(*a, **k))
+    assert simulation.execute(trace_id, template=template) == first
+    assert calls == []
+
+    # Any change to the trace, template or options is a new key
+    simulation.trace_repo.save_trace(traces[0].model_copy(update={"events": traces[0].events[:-1]}))
+    simulation.execute(trace_id, template=template)
+    assert calls
+    changed = template.model_copy(update={"weight_alpha": template.weight_alpha / 2})
+    keys = {simulation.cache_key(traces[1], t, h) for t in (template, changed) for h in (False, True)}
+    assert len(keys) == 4
+    assert simulation.cache_key(traces[1], template) == simulation.cache_key(traces[1].model_copy(), template)
+
+
+def test_size_bound_evicts_least_recently_read(template, traces, tmp_path):
+    simulation = _simulation(tmp_path / "reports.db", traces)
+    cache = simulation.report_cache
+    simulation.execute(traces[0].procedure_id, template=template)
+    one = cache.size_bytes()
+
+    bounded = SQLiteReportCache(tmp_path / "bounded.db", max_bytes=int(2.5 * one))
+    keys = [simulation.cache_key(t, template) for t in traces[:3]]
+    report = cache.get(simulation.cache_key(traces[0], template))
+    bounded.put(keys[0], report)
+    bounded.put(keys[1], report)
+    assert bounded.get(keys[0]) == report   # keys[1] is now least recently read
+    bounded.put(keys[2], report)
+    assert len(bounded) == 2 and bounded.size_bytes() <= 2.5 * one
+    assert bounded.get(keys[1]) is None and bounded.get(keys[0]) == report
+
+
+def test_reads_are_buffered_not_written(template, traces, tmp_path):
+    simulation = _simulation(tmp_path / "reports.db", traces)
+    report = simulation.execute(traces[0].procedure_id, template=template)
+    cache = SQLiteReportCache(tmp_path / "buffered.db", flush_reads=2)
+    cache.put("a", report)
+    cache.put("b", report)
+    connection = cache._connection()
+    last_access = lambda key: connection.execute(
+        "SELECT last_access FROM reports WHERE key = ?", (key,)).fetchone()[0]
+    before = last_access("a"), connection.total_changes
+
+    assert cache.get("a") == report
+    assert (last_access("a"), connection.total_changes) == before
+    assert cache.get("b") == report   # second distinct key: one batched write
+    assert last_access("a") > before[0] and last_access("b") > before[0]
+    assert not cache._reads
+
+
+def test_concurrent_worker_processes_share_the_cache(template, traces, tmp_path):
+    path = tmp_path / "reports.db"
+    with ProcessPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(_score_all, [path] * 3, [template] * 3, [traces] * 3))
+    assert results[0] == results[1] == results[2]
+    assert len(SQLiteReportCache(path)) == 6
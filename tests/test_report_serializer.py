@@ -0,0 +1,59 @@
+import orjson
+import pytest
+
+from pysimp.domain.entities.report import LazySimulationReport, SimulationReport
+from pysimp.domain.services.forward_simulator import NoiseDistribution
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+from pysimp.infrastructure.persistence.report_serializer import ReportSerializer
+
+
+@pytest.fixture(scope="module")
+def traces(sampled_traces):
+    return sampled_traces(5, seed=1, n_t=NoiseDistribution("uniform", low=1.0, high=2.0),
+                          pause_probability=0.3, ce_probability=0.3)
+
+
+def _reports(template, traces, hierarchical_attribution):
+    repo = InMemoryTraceRepository()
+    simulation = RunSimulation(repo)
+    reports = []
+    for trace in traces:
+        repo.save_trace(trace)
+        reports.append(simulation.execute(trace.procedure_id, template=template,
+                                          hierarchical_attribution=hierarchical_attribution))
+    return reports
+
+
+@pytest.mark.parametrize("hierarchical_attribution", [False, True])
+def test_round_trip_matches_pydantic_path(template, traces, hierarchical_attribution):
+    for report in _reports(template, traces, hierarchical_attribution):
+        payload = ReportSerializer.dumps(report)
+        decoded = ReportSerializer.loads(payload)
+        assert not decoded.is_materialized  # trusted payload: rows built on first read
+        validated = ReportSerializer.loads(payload, validate=True)
+        via_pydantic = SimulationReport.model_validate_json(report.model_dump_json())
+
+        assert decoded == report == validated
+        assert decoded == via_pydantic
+        assert decoded.model_dump() == report.model_dump() == validated.model_dump()
+        assert decoded.model_dump_json() == report.model_dump_json()
+        assert type(decoded.StepTable[0]) is type(report.StepTable[0])
+        assert type(validated) is SimulationReport and isinstance(decoded, LazySimulationReport)
+
+
+def test_columnar_layout(template, traces):
+    report = _reports(template, traces, False)[0]
+    columns = orjson.loads(ReportSerializer.dumps(report))
+    assert columns["StepTable"]["step_id"] == [row.step_id for row in report.StepTable]
+    assert columns["Traceability"]["provenance_vector"][-1] == report.Traceability[-1].provenance_vector
+    assert columns["StepAttributionTable"] is None
+    with pytest.raises(ValueError):
+        ReportSerializer.from_columnar({**columns, "format": "other"})
+
+
+def test_validate_rejects_untrusted_payload(template, traces):
+    columns = orjson.loads(ReportSerializer.dumps(_reports(template, traces, False)[0]))
+    columns["StepTable"]["pi_t"][0] = "not a number"
+    with pytest.raises(ValueError):
+        ReportSerializer.from_columnar(columns, validate=True)
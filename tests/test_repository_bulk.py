@@ -0,0 +1,64 @@
+import pytest
+
+from pysimp.application.interfaces.repository import TraceRepository
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+from pysimp.infrastructure.persistence.sqlite_repository import SQLiteTraceRepository
+
+
+@pytest.fixture(scope="module")
+def traces(sampled_traces):
+    return sampled_traces(25, seed=3, pause_probability=0.5)
+
+
+class DictRepository(TraceRepository):
+    """
+    Only the single-item methods (plus trace_ids): exercises the ABC defaults.
+    """
+    def __init__(self):
+        self.traces, self.gets = {}, 0
+
+    def get_trace(self, trace_id):
+        self.gets += 1
+        return self.traces.get(trace_id)
+
+    def save_trace(self, trace):
+        self.traces[trace.procedure_id] = trace
+
+    def trace_ids(self):
+        return list(self.traces)
+
+
+@pytest.fixture(params=["default", "memory", "sqlite"])
+def repo(request, tmp_path):
+    if request.param == "default":
+        return DictRepository()
+    if request.param == "memory":
+        return InMemoryTraceRepository()
+    return SQLiteTraceRepository(tmp_path / "traces.db", batch_size=7)
+
+
+def test_bulk_methods_agree_with_single_item_methods(traces, repo):
+    repo.save_traces(iter(traces))
+    ids = [traces[3].procedure_id, "missing", traces[0].procedure_id]
+    assert repo.get_traces(ids) == [traces[3], None, traces[0]]
+    assert [repo.get_trace(t.procedure_id) for t in traces] == traces
+
+    assert list(repo.iter_traces(batch_size=4)) == traces
+    has_pause = lambda t: any(e.is_pause for e in t.events)
+    assert list(repo.iter_traces(filter=has_pause, batch_size=4)) == [t for t in traces if has_pause(t)]
+
+
+def test_default_iteration_fetches_in_batches(traces):
+    repo = DictRepository()
+    repo.save_traces(traces)
+    stream = repo.iter_traces(batch_size=10)
+    next(stream)
+    assert repo.gets == 10
+
+
+def test_iteration_requires_trace_ids():
+    class Minimal(TraceRepository):
+        get_trace = save_trace = lambda self, *_: None
+
+    with pytest.raises(NotImplementedError):
+        list(Minimal().iter_traces())
@@ -0,0 +1,80 @@
+import pytest
+from datetime import datetime, timedelta
+
+from pysimp.domain.entities.surgit import Surgit
+from pysimp.domain.entities.step import Step
+from pysimp.domain.entities.template import NormativeTemplate
+from pysimp.domain.entities.trace import SurgitEvent
+from pysimp.domain.services.score_gradient import ScoreGradient
+from pysimp.application.use_cases.run_simulation import RunSimulation
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+
+
+def _template(q=1.0, surgit_overrides=None, step_overrides=None, **kwargs):
+    surgit_overrides = surgit_overrides or {}
+    step_overrides = step_overrides or {}
+    defs = {
+        "P1": {"S1": dict(intrinsic_deviation=0.0, mitigation_factor=0.6, security_scope="res"),
+               "S2": dict(intrinsic_deviation=0.2, mitigation_factor=0.8, security_scope="imm")},
+        "P2": {"S3": dict(intrinsic_deviation=0.3, mitigation_factor=0.9, security_scope="pcp"),
+               "S4": dict(intrinsic_deviation=0.15, mitigation_factor=0.7, security_scope="res")},
+    }
+    steps = {}
+    for step_id, surgits in defs.items():
+        built = {}
+        for s_id, params in surgits.items():
+            params = {**params, **surgit_overrides.get(s_id, {})}
+            built[s_id] = Surgit(id=s_id, name=s_id, **params)
+        steps[step_id] = Step(id=step_id, name=step_id, surgits=built,
+                              weight_wt=step_overrides.get(step_id, 1.0 if step_id == "P1" else 1.3))
+    params = dict(weight_alpha=0.7, weight_beta=1.4)
+    params.update(kwargs)
+    return NormativeTemplate(procedure_type="Test", version="1.0", steps=steps,
+                             structure_definition={}, tsallis_q=q, **params)
+
+
+def _events():
+    now = datetime(2024, 1, 1)
+    spec = [("S1", 1.0, 1.0), ("S2", 1.5, 1.2), ("S3", 1.0, 2.0), ("S4", 1.3, 1.0), ("S2", 1.1, 1.0)]
+    events = [SurgitEvent(surgit_id=s, timestamp_start=now, timestamp_end=now + timedelta(minutes=1),
+                          n_t=n, e_t=e) for s, n, e in spec]
+    events.insert(2, SurgitEvent(surgit_id="PAUSE", timestamp_start=now,
+                                 timestamp_end=now + timedelta(minutes=3), is_pause=True))
+    return events
+
+
+def _score(template):
+    return RunSimulation(InMemoryTraceRepository())._run_single_pass(_events(), template)["score"]
+
+
+@pytest.mark.parametrize("q", [1.0, 2.0, 0.6])
+def test_gradient_matches_finite_differences(q):
+    h = 1e-6
+    grad = ScoreGradient.compute(_events(), _template(q))
+    assert grad.score == pytest.approx(_score(_template(q)))
+
+    for s_id in ["S1", "S2", "S3", "S4"]:
+        for attr, analytic in [("intrinsic_deviation", grad.d_intrinsic_deviation[s_id]),
+                               ("mitigation_factor", grad.d_mitigation_factor[s_id])]:
+            base = _template(q).get_surgit(s_id)
+            value = getattr(base, attr)
+            lo, hi = max(value - h, 0.0), min(value + h, 1.0)
+            numeric = (_score(_template(q, {s_id: {attr: hi}})) -
+                       _score(_template(q, {s_id: {attr: lo}}))) / (hi - lo)
+            assert analytic == pytest.approx(numeric, rel=1e-4, abs=1e-6), (s_id, attr)
+
+    for step_id in ["P1", "P2"]:
+        w = _template(q).steps[step_id].weight_wt
+        numeric = (_score(_template(q, step_overrides={step_id: w + h})) -
+                   _score(_template(q, step_overrides={step_id: w - h}))) / (2 * h)
+        assert grad.d_weight_wt[step_id] == pytest.approx(numeric, rel=1e-4, abs=1e-6)
+
+    for name, analytic in [("weight_alpha", grad.d_alpha), ("weight_beta", grad.d_beta)]:
+        value = getattr(_template(q), name)
+        numeric = (_score(_template(q, **{name: value + h})) -
+                   _score(_template(q, **{name: value - h}))) / (2 * h)
+        assert analytic == pytest.approx(numeric, rel=1e-4, abs=1e-6)
+
+    # Central difference across q=1 is fine: the entropy is smooth through the Shannon limit
+    numeric = (_score(_template(q + 1e-5)) - _score(_template(q - 1e-5))) / 2e-5
+    assert grad.d_q == pytest.approx(numeric, rel=1e-3, abs=1e-6)
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from pysimp.domain.services.forward_simulator import NoiseDistribution
+from pysimp.infrastructure.persistence.segmented_repository import SegmentedTraceRepository
+
+
+@pytest.fixture(scope="module")
+def traces(sampled_traces):
+    return sampled_traces(40, seed=5, n_t=NoiseDistribution("uniform", low=1.0, high=2.0), pause_probability=0.3)
+
+
+def _version(trace, v):
+    return trace.model_copy(update={"patient_id": f"{trace.patient_id}-v{v}"})
+
+
+def test_append_rotate_and_recover(traces, tmp_path):
+    repo = SegmentedTraceRepository(tmp_path, segment_bytes=8 * 1024)
+    repo.save_traces(traces)
+    repo.save_trace(_version(traces[0], 2))
+    assert repo.segment_count > 2
+    assert repo.get_trace(traces[0].procedure_id) == _version(traces[0], 2)
+    assert repo.get_trace(traces[5].procedure_id) == traces[5]
+    assert repo.get_trace("missing") is None
+    repo.close()
+
+    # A torn write at the tail is dropped on reopen
+    last = sorted(tmp_path.iterdir())[-1]
+    with open(last, "ab") as f:
+        f.write(b"\x54\x53\x05\x00garbage")
+    reopened = SegmentedTraceRepository(tmp_path, segment_bytes=8 * 1024)
+    assert len(reopened) == 40
+    assert reopened.get_traces([t.procedure_id for t in traces[1:]]) == traces[1:]
+    assert reopened.get_trace(traces[0].procedure_id) == _version(traces[0], 2)
+    reopened.save_trace(_version(traces[1], 2))
+    assert reopened.get_trace(traces[1].procedure_id) == _version(traces[1], 2)
+    reopened.close()
+
+
+def test_compaction_drops_superseded_versions(traces, tmp_path):
+    repo = SegmentedTraceRepository(tmp_path, segment_bytes=8 * 1024)
+    for v in range(4):
+        repo.save_traces(_version(t, v) for t in traces)
+    before = sum(p.stat().st_size for p in tmp_path.iterdir())
+    assert repo.compact(min_garbage_ratio=0.5) > 0
+    after = sum(p.stat().st_size for p in tmp_path.iterdir())
+    assert after < before / 2
+    assert all(repo.get_trace(t.procedure_id) == _version(t, 3) for t in traces)
+    repo.close()
+
+    reopened = SegmentedTraceRepository(tmp_path)
+    assert all(reopened.get_trace(t.procedure_id) == _version(t, 3) for t in traces)
+    reopened.close()
+
+
+def test_background_compaction_with_concurrent_ingest_and_reads(traces, tmp_path):
+    repo = SegmentedTraceRepository(tmp_path, segment_bytes=4 * 1024)
+    repo.save_traces(traces)
+    repo.start_compaction(interval=0.001, min_garbage_ratio=0.1)
+    errors = []
+
+    def read():
+        for _ in range(20):
+            for t in traces[::7]:
+                trace = repo.get_trace(t.procedure_id)
+                if trace is None or trace.events != t.events:
+                    errors.append(t.procedure_id)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+    for v in range(1, 15):
+        repo.save_traces(_version(t, v) for t in traces)
+    for thread in readers:
+        thread.join()
+    repo.close()
+
+    assert errors == []
+    reopened = SegmentedTraceRepository(tmp_path)
+    assert all(reopened.get_trace(t.procedure_id) == _version(t, 14) for t in traces)
+    reopened.close()
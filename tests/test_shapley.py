@@ -0,0 +1,135 @@
+import math
+import threading
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from pysimp.domain.services import layer_e
+from pysimp.domain.services.layer_e import CoalitionCache, LayerE
+
+
+def _reference_shapley(elements, v):
+    n = len(elements)
+    out = {}
+    for e in elements:
+        others = [o for o in elements if o != e]
+        total = 0.0
+        for k in range(n):
+            w = math.factorial(k) * math.factorial(n - k - 1) / math.factorial(n)
+            for subset in combinations(others, k):
+                total += w * (v(list(subset) + [e]) - v(list(subset)))
+        out[e] = total
+    return out
+
+
+WEIGHTS = {"A": 0.3, "B": 1.1, "C": 0.5, "D": 2.0, "E": 0.05}
+
+
+def _game(coalition):
+    # Non-additive: saturating sum plus a pairwise synergy
+    s = sum(WEIGHTS[e] for e in coalition)
+    return 1.0 - math.exp(-s) + (0.4 if {"A", "D"} <= set(coalition) else 0.0)
+
+
+def test_exact_matches_reference_and_evaluates_each_coalition_once():
+    elements = list(WEIGHTS)
+    calls = []
+
+    def counted(coalition):
+        calls.append(frozenset(coalition))
+        return _game(coalition)
+
+    phi = LayerE.calculate_shapley_values(elements, counted)
+    reference = _reference_shapley(elements, _game)
+
+    assert len(calls) == 2 ** len(elements)
+    assert len(set(calls)) == len(calls)
+    for e in elements:
+        assert phi[e] == pytest.approx(reference[e])
+    assert sum(phi.values()) == pytest.approx(_game(elements) - _game([]))
+
+
+def test_exact_batch_value_function():
+    elements = list(WEIGHTS)
+    w = np.array([WEIGHTS[e] for e in elements])
+
+    def batch(membership):
+        synergy = 0.4 * (membership[:, 0] & membership[:, 3])
+        return 1.0 - np.exp(-(membership @ w)) + synergy
+
+    phi = LayerE.calculate_shapley_values(elements, batch_value_function=batch)
+    reference = _reference_shapley(elements, _game)
+    for e in elements:
+        assert phi[e] == pytest.approx(reference[e])
+
+
+def test_exact_scales_to_twenty_elements():
+    elements = [f"F{i}" for i in range(20)]
+    w = np.linspace(0.1, 2.0, 20)
+    phi = LayerE.calculate_shapley_values(
+        elements, batch_value_function=lambda m: (m @ w) ** 2
+    )
+    assert sum(phi.values()) == pytest.approx(w.sum() ** 2)
+    assert phi["F19"] > phi["F0"]
+
+
+def test_exact_refuses_oversized_games_before_evaluating():
+    elements = [f"F{i}" for i in range(LayerE.EXACT_SHAPLEY_MAX_ELEMENTS + 1)]
+
+    def never(membership):
+        raise AssertionError("value function must not run")
+
+    with pytest.raises(ValueError, match="estimate_shapley_values"):
+        LayerE.calculate_shapley_values(elements, batch_value_function=never)
+
+
+def _batch_game(membership):
+    w = np.array([WEIGHTS[e] for e in WEIGHTS])
+    synergy = 0.4 * (membership[:, 0] & membership[:, 3])
+    return 1.0 - np.exp(-(membership @ w)) + synergy
+
+
+@pytest.mark.parametrize("antithetic,stratified", [(False, False), (True, False), (True, True)])
+def test_permutation_estimate_converges_to_exact(antithetic, stratified):
+    elements = list(WEIGHTS)
+    exact = LayerE.calculate_shapley_values(elements, _game)
+    estimates = LayerE.estimate_shapley_values(
+        elements, batch_value_function=_batch_game, seed=7,
+        antithetic=antithetic, stratified=stratified, max_permutations=4000
+    )
+    for e in elements:
+        est = estimates[e]
+        assert est.ci_low <= est.value <= est.ci_high
+        assert est.value == pytest.approx(exact[e], abs=max(5 * est.std_error, 1e-9))
+    # Every permutation telescopes to v(N) - v(empty)
+    assert sum(est.value for est in estimates.values()) == pytest.approx(_game(elements) - _game([]))
+
+
+def test_permutation_estimate_is_reproducible_and_stops_on_std_error():
+    elements = list(WEIGHTS)
+    kwargs = dict(batch_value_function=_batch_game, seed=123, target_std_error=0.01, max_permutations=100000)
+    first = LayerE.estimate_shapley_values(elements, **kwargs)
+    second = LayerE.estimate_shapley_values(elements, **kwargs)
+    assert first == second
+    assert all(est.std_error <= 0.01 for est in first.values())
+    assert first["A"].n_permutations < 100000
+
+
+def test_permutation_estimate_parallel_matches_serial():
+    elements = list(WEIGHTS)
+    kwargs = dict(batch_value_function=_batch_game, seed=5, max_permutations=256, units_per_batch=16)
+    serial = LayerE.estimate_shapley_values(elements, **kwargs)
+    parallel = LayerE.estimate_shapley_values(elements, n_workers=2, **kwargs)
+    for e in elements:
+        assert parallel[e].value == pytest.approx(serial[e].value)
+
+
+def test_batches_return_early_once_stop_is_set(monkeypatch):
+    stop = threading.Event()
+    monkeypatch.setattr(layer_e, "_stop_event", stop)
+    cache = CoalitionCache(list(WEIGHTS), batch_value_function=_batch_game)
+    seed = np.random.SeedSequence(0)
+    assert layer_e._permutation_batch(seed, 4, cache, True, False).shape == (4, len(WEIGHTS))
+    stop.set()
+    assert layer_e._permutation_batch(seed, 4, cache, True, False).shape == (0, len(WEIGHTS))
@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from pysimp.domain.entities.trace import (
+    DeviationCause, PostoperativeOutcome, SurgicalTrace, SurgitEvent, SurgitType
+)
+from pysimp.domain.services.forward_simulator import NoiseDistribution
+from pysimp.infrastructure.persistence.sqlite_repository import MAX_VARIABLES, SQLiteTraceRepository
+
+CONFIG = dict(n_t=NoiseDistribution("uniform", low=1.0, high=2.0), pause_probability=0.3, ce_probability=0.3)
+
+
+def test_round_trip_preserves_every_field(tmp_path):
+    start = datetime(2024, 3, 1, 8, 30, 0, 123456, tzinfo=timezone(timedelta(hours=-6)))
+    trace = SurgicalTrace(
+        procedure_id="T1", patient_id="P1",
+        events=[
+            SurgitEvent(surgit_id="S1", timestamp_start=start, timestamp_end=start + timedelta(minutes=3),
+                        surgit_type=SurgitType.SAFETY, n_t=1.25, e_t=1.5, is_deviation=True,
+                        deviation_cause=DeviationCause.PATIENT, risk_tags=["bleeding_risk"], complexity_weight=0.7),
+            SurgitEvent(surgit_id="PAUSE", timestamp_start=start, timestamp_end=start + timedelta(seconds=90),
+                        is_pause=True),
+        ],
+        outcomes=[PostoperativeOutcome(complication_type="Infection", time_window="30-day", severity_grade="II")]
+    )
+    repo = SQLiteTraceRepository(tmp_path / "traces.db")
+    repo.save_trace(trace)
+    assert repo.get_trace("T1") == trace
+    assert repo.get_trace("missing") is None
+
+    replaced = trace.model_copy(update={"events": trace.events[:1], "patient_id": "P2"})
+    repo.save_trace(replaced)
+    assert repo.get_trace("T1") == replaced
+    assert len(repo) == 1
+
+
+def test_bulk_save_indexes_and_reopen(sampled_traces, tmp_path):
+    traces = sampled_traces(50, seed=8, **CONFIG)
+    path = tmp_path / "traces.db"
+    repo = SQLiteTraceRepository(path, batch_size=16)
+    repo.save_traces(iter(traces))
+    repo.close()
+
+    reopened = SQLiteTraceRepository(path)
+    assert len(reopened) == 50
+    assert all(reopened.get_trace(t.procedure_id) == t for t in traces)
+    assert reopened.trace_ids_for_patient(traces[7].patient_id) == [traces[7].procedure_id]
+    assert reopened.trace_ids_with_surgit("S3") == [t.procedure_id for t in traces]
+    assert reopened.trace_ids_with_surgit("unknown") == []
+    assert reopened._connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_threads_use_their_own_connections(sampled_traces, tmp_path):
+    traces = sampled_traces(20, seed=8, **CONFIG)
+    repo = SQLiteTraceRepository(tmp_path / "traces.db")
+    repo.save_traces(traces[:10])
+    results, connections = {}, {}
+
+    def work(i):
+        connections[i] = repo._connection()
+        assert repo._connection() is connections[i]
+        if i == 0:
+            repo.save_traces(traces[10:])
+        results[i] = [repo.get_trace(t.procedure_id) for t in traces[:10]]
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(c) for c in connections.values()}) == 4
+    assert all(r == traces[:10] for r in results.values())
+    assert len(repo) == 20
+    repo.close()
+
+
+def test_batches_fit_the_legacy_variable_limit(sampled_traces, tmp_path):
+    connection = sqlite3.connect(":memory:")
+    if not hasattr(connection, "setlimit"):
+        pytest.skip("Connection.setlimit needs Python 3.11")
+    traces = sampled_traces(1001, seed=8, **CONFIG)
+    repo = SQLiteTraceRepository(tmp_path / "traces.db", batch_size=1000)
+    repo._connection().setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, MAX_VARIABLES)
+    repo.save_traces(traces)
+    assert repo.get_traces([t.procedure_id for t in traces]) == traces
+    assert list(repo.iter_traces(batch_size=1001)) == traces
+
+
+def test_round_trip_keeps_end_offsets(tmp_path):
+    cet, cest = timezone(timedelta(hours=1)), timezone(timedelta(hours=2))
+    start = datetime(2024, 3, 31, 1, 30, tzinfo=cet)
+    trace = SurgicalTrace(
+        procedure_id="DST", patient_id="P1",
+        events=[
+            SurgitEvent(surgit_id="S1", timestamp_start=start, timestamp_end=datetime(2024, 3, 31, 3, 10, tzinfo=cest)),
+            SurgitEvent(surgit_id="S2", timestamp_start=datetime(2024, 3, 31, 3, 10, tzinfo=cest),
+                        timestamp_end=datetime(2024, 3, 31, 1, 20, tzinfo=timezone.utc)),
+            SurgitEvent(surgit_id="S3", timestamp_start=datetime(2024, 3, 31, 1, 20, tzinfo=timezone.utc),
+                        timestamp_end=datetime(2024, 3, 31, 1, 25)),
+        ],
+    )
+    repo = SQLiteTraceRepository(tmp_path / "traces.db")
+    repo.save_trace(trace)
+    loaded = repo.get_trace("DST")
+    assert loaded == trace
+    assert [e.timestamp_end.utcoffset() for e in loaded.events[:2]] == [timedelta(hours=2), timedelta(0)]
+    assert loaded.events[0].timestamp_end - loaded.events[0].timestamp_start == timedelta(minutes=40)
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from pysimp.domain.entities.trace import DeviationCause, PostoperativeOutcome, SurgitType
+from pysimp.infrastructure.persistence.in_memory_repository import InMemoryTraceRepository
+from pysimp.infrastructure.persistence.indexed_repository import IndexedTraceRepository
+from pysimp.infrastructure.persistence.trace_index import Term, TraceIndex
+
+TAGS = ["bleeding_risk", "infection_risk", "anatomy"]
+CAUSES = list(DeviationCause)
+
+
+def _decorate(trace, rng):
+    events = []
+    for event in trace.events:
+        update = {}
+        if not event.is_pause and rng.random() < 0.2:
+            update["risk_tags"] = list(rng.choice(TAGS, size=rng.integers(1, 3), replace=False))
+        if not event.is_pause and rng.random() < 0.1:
+            update["is_deviation"] = True
+            update["deviation_cause"] = CAUSES[rng.integers(len(CAUSES))]
+        events.append(event.model_copy(update=update))
+    outcomes = [PostoperativeOutcome(complication_type=k, time_window="30-day")
+                for k in ("Infection", "Bleeding") if rng.random() < 0.15]
+    if rng.random() < 0.3:
+        events = [e for e in events if e.surgit_id != "S4"]
+    return trace.model_copy(update={"events": events, "outcomes": outcomes})
+
+
+@pytest.fixture(scope="module")
+def traces(sampled_traces):
+    rng = np.random.default_rng(3)
+    sampled = sampled_traces(300, seed=9, pause_probability=0.2, ce_probability=0.1)
+    return [_decorate(trace, rng) for trace in sampled]
+
+
+def _has(trace, predicate):
+    return any(predicate(e) for e in trace.events)
+
+
+QUERIES = [
+    (Term("surgit", "S4"), lambda t: _has(t, lambda e: e.surgit_id == "S4" and not e.is_pause)),
+    (Term("ce"), lambda t: _has(t, lambda e: e.surgit_type in (SurgitType.CE_SUBSTITUTION, SurgitType.CE_ADDITION))),
+    (Term("ce", "ce_addition") & ~Term("pause"),
+     lambda t: _has(t, lambda e: e.surgit_type == SurgitType.CE_ADDITION) and not _has(t, lambda e: e.is_pause)),
+    (Term("risk_tag", "bleeding_risk") | Term("outcome", "Bleeding"),
+     lambda t: _has(t, lambda e: "bleeding_risk" in e.risk_tags)
+     or any(o.complication_type == "Bleeding" for o in t.outcomes)),
+    (Term("deviation_cause", "pat") & Term("outcome") & ~Term("surgit", "S4"),
+     lambda t: _has(t, lambda e: e.deviation_cause == DeviationCause.PATIENT) and bool(t.outcomes)
+     and not _has(t, lambda e: e.surgit_id == "S4")),
+    (~Term("outcome"), lambda t: not t.outcomes),
+]
+
+
+@pytest.mark.parametrize("query, predicate", QUERIES)
+def test_queries_match_full_scan(traces, query, predicate):
+    index = TraceIndex()
+    index.add_many(traces)
+    expected = {t.procedure_id for t in traces if predicate(t)}
+    assert expected and len(expected) < len(traces)
+    assert index.query(query) == expected
+    assert index.count(query) == len(expected)
+
+
+def test_resave_updates_postings_and_compacts(traces):
+    index = TraceIndex(compact_ratio=0.5)
+    index.add_many(traces[:100])
+    target = next(t for t in traces[:100] if _has(t, lambda e: e.surgit_id == "S4"))
+    assert target.procedure_id in index.query(Term("surgit", "S4"))
+
+    stripped = target.model_copy(update={"events": [e for e in target.events if e.surgit_id != "S4"]})
+    index.add(stripped)
+    assert target.procedure_id not in index.query(Term("surgit", "S4"))
+    assert target.procedure_id in index.query(Term("surgit", "S1"))
+    assert len(index) == 100
+
+    index.add_many(traces[:60])  # retires more than half: compacts
+    expected = {t.procedure_id for t in traces[:100] if _has(t, lambda e: e.surgit_id == "S1")}
+    assert index.query(Term("surgit", "S1")) == expected
+    assert len(index._doc_ids) == len(index) == 100
+
+
+def test_indexed_repository_updates_on_save(traces):
+    backend = InMemoryTraceRepository()
+    backend.save_traces(traces[:50])
+    repo = IndexedTraceRepository(backend)
+    assert len(repo.index) == 50
+
+    for trace in traces[50:]:
+        repo.save_trace(trace)
+    query = Term("ce") & Term("risk_tag")
+    found = list(repo.find(query, batch_size=7))
+    expected = [t for t in traces if _has(t, lambda e: e.surgit_type != SurgitType.NORMAL and not e.is_pause
+                                          and e.surgit_type != SurgitType.SAFETY)
+                and _has(t, lambda e: bool(e.risk_tags))]
+    assert [t.procedure_id for t in found] == [t.procedure_id for t in expected]
+    assert repo.query(query) == [t.procedure_id for t in expected]
+    assert "bleeding_risk" in repo.index.values("risk_tag")
+
+
+def test_unknown_field():
+    with pytest.raises(ValueError):
+        Term("surgeon")